@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+
+"""
+Measure the import time of the Lurawi modules, to track the cold start of the
+workflow service.
+
+Each module is imported in a fresh interpreter with `python -X importtime`, and the
+modules taking the most cumulative time are reported, so that a dependency pulled
+in at import time by mistake shows up at the top of the list.
+
+Usage, from the repository root:
+    python benchmarks/import_time.py --top 20 --json import_time.json
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+from typing import Dict, List
+
+import simplejson as json
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+DEFAULT_MODULES = ["lurawi.workflow_engine", "lurawi.workflow_service"]
+
+
+def measure_import(module: str) -> List[Dict]:
+    """
+    Import a module in a fresh interpreter and collect its import times.
+
+    Args:
+        module (str): The module to import.
+
+    Returns:
+        List[Dict]: The imported modules with their self and cumulative
+            microseconds, in import order.
+    """
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        path for path in (REPO_ROOT, env.get("PYTHONPATH")) if path
+    )
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"unable to import {module}:\n{proc.stderr[-2000:]}")
+
+    imports = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:") :].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # the header line
+        imports.append(
+            {
+                "module": fields[2].strip(),
+                "self_us": int(fields[0]),
+                "cumulative_us": int(fields[1]),
+            }
+        )
+    return imports
+
+
+def summarise(module: str, imports: List[Dict], top: int) -> Dict:
+    """
+    Summarise the import times of a module.
+
+    Args:
+        module (str): The imported module.
+        imports (List[Dict]): The import times from measure_import.
+        top (int): The number of slowest modules to keep.
+
+    Returns:
+        Dict: The total time, module count and slowest modules.
+    """
+    total = next(
+        (entry["cumulative_us"] for entry in imports if entry["module"] == module), 0
+    )
+    slowest = sorted(imports, key=lambda entry: entry["cumulative_us"], reverse=True)
+    return {
+        "module": module,
+        "total_ms": round(total / 1000, 1),
+        "modules_imported": len(imports),
+        "slowest": slowest[:top],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure Lurawi import times")
+    parser.add_argument(
+        "modules",
+        nargs="*",
+        default=DEFAULT_MODULES,
+        help=f"The modules to import (default: {' '.join(DEFAULT_MODULES)}).",
+    )
+    parser.add_argument(
+        "--top", type=int, default=15, help="Show the N slowest modules."
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=3,
+        help="Import each module N times and keep the fastest run.",
+    )
+    parser.add_argument(
+        "--json", dest="json_output", help="Also write the results to a JSON file."
+    )
+    args = parser.parse_args()
+
+    results = []
+    for module in args.modules:
+        runs = [
+            summarise(module, measure_import(module), args.top)
+            for _ in range(max(args.repeat, 1))
+        ]
+        result = min(runs, key=lambda run: run["total_ms"])
+        results.append(result)
+
+        print(
+            f"{module}: {result['total_ms']} ms, "
+            f"{result['modules_imported']} modules imported"
+        )
+        for entry in result["slowest"]:
+            print(
+                f"  {entry['cumulative_us'] / 1000:>9.1f} ms "
+                f"{entry['self_us'] / 1000:>8.1f} ms self  {entry['module']}"
+            )
+
+    if args.json_output:
+        with open(args.json_output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,535 @@
+#!/usr/bin/env python3
+
+"""
+A load-test harness for the Lurawi workflow service.
+
+The harness starts a stub OpenAI-compatible LLM server with deterministic timing,
+points every invoke_llm action of a workflow at it, starts the workflow service as
+a subprocess (or in-process with --in-process), and drives /{project}/message with
+concurrent virtual users. Each virtual user is a conversation member that sends a
+message, reads the whole response and sends the next one.
+
+It reports throughput, latency percentiles, the error and 429 (busy) rates, and
+the memory growth of the service over the run.
+
+Usage, from the repository root:
+    python benchmarks/load_test.py --users 50 --duration 30
+    lurawi bench --users 50 --requests 5000 --llm-latency 0.5
+"""
+
+import argparse
+import asyncio
+import contextlib
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+import aiohttp
+import simplejson as json
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.stub_llm_server import (  # noqa: E402 pylint: disable=wrong-import-position
+    StubLLMServer,
+    add_stub_arguments,
+    start_stub_server,
+)
+
+DEFAULT_WORKFLOW = os.path.join(REPO_ROOT, "lurawi_example.json")
+
+
+def _free_port() -> int:
+    """
+    Returns:
+        int: A TCP port that is free on localhost.
+    """
+    with socket.socket() as sock:
+        sock.bind(("localhost", 0))
+        return sock.getsockname()[1]
+
+
+def _point_llm_calls(node, base_url: str) -> int:
+    """
+    Point every invoke_llm action of a workflow at the stub LLM server.
+
+    Args:
+        node: The workflow, or a part of it.
+        base_url (str): The stub server URL.
+
+    Returns:
+        int: The number of invoke_llm actions changed.
+    """
+    changed = 0
+    if isinstance(node, dict):
+        if node.get("name") == "invoke_llm" and isinstance(node.get("args"), dict):
+            node["args"]["base_url"] = base_url
+            changed += 1
+        for value in node.values():
+            changed += _point_llm_calls(value, base_url)
+    elif isinstance(node, list):
+        for value in node:
+            changed += _point_llm_calls(value, base_url)
+    return changed
+
+
+def rss_mb(pid: int) -> Optional[float]:
+    """
+    Args:
+        pid (int): The process id.
+
+    Returns:
+        Optional[float]: The resident memory of the process in MB, or None if it
+            cannot be read.
+    """
+    try:
+        with open(f"/proc/{pid}/status", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import psutil  # pylint: disable=import-outside-toplevel
+
+        return psutil.Process(pid).memory_info().rss / (1024 * 1024)
+    except Exception:  # pylint: disable=broad-exception-caught
+        return None
+
+
+def _percentile(values: List[float], percent: float) -> float:
+    """
+    Args:
+        values (List[float]): The sorted values.
+        percent (float): The percentile, from 0 to 100.
+
+    Returns:
+        float: The nearest-rank percentile, or 0 if there are no values.
+    """
+    if not values:
+        return 0.0
+    rank = max(0, min(len(values) - 1, int(round(percent / 100 * len(values))) - 1))
+    return values[rank]
+
+
+def latency_summary(latencies: List[float]) -> Dict[str, float]:
+    """
+    Args:
+        latencies (List[float]): The sorted latencies in seconds.
+
+    Returns:
+        Dict[str, float]: The p50, p95, p99 and max latencies in milliseconds.
+    """
+    return {
+        "p50": round(_percentile(latencies, 50) * 1000, 2),
+        "p95": round(_percentile(latencies, 95) * 1000, 2),
+        "p99": round(_percentile(latencies, 99) * 1000, 2),
+        "max": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+    }
+
+
+def serve(behaviour: str, port: int):
+    """
+    Run the workflow service until interrupted; the service side of the harness.
+
+    Args:
+        behaviour (str): The workflow path, without the .json extension.
+        port (int): The port to listen on.
+    """
+    import uvicorn  # pylint: disable=import-outside-toplevel
+    from lurawi import utils  # pylint: disable=import-outside-toplevel
+    from lurawi.workflow_service import (  # pylint: disable=import-outside-toplevel
+        WorkflowService,
+    )
+
+    utils.no_auth = True
+    if not utils.get_project_settings():
+        sys.exit(-1)
+    app = WorkflowService(behaviour).create_app()
+    try:
+        uvicorn.run(app, host="localhost", port=port, log_level="warning")
+    except KeyboardInterrupt:
+        pass
+
+
+@contextlib.asynccontextmanager
+async def bench_service(
+    args: argparse.Namespace,
+) -> AsyncIterator[Tuple[aiohttp.ClientSession, str, int]]:
+    """
+    Start the stub LLM server and the workflow service, and wait until it is ready.
+
+    Args:
+        args (argparse.Namespace): The command line arguments, see
+            add_service_arguments.
+
+    Yields:
+        Tuple[aiohttp.ClientSession, str, int]: A client session, the URL of the
+            message endpoint, and the process id of the service.
+    """
+    port = args.port or _free_port()
+    stub_port = args.llm_port or _free_port()
+    stub_runner = await start_stub_server(
+        StubLLMServer(args.llm_latency, args.llm_token_rate, args.llm_tokens),
+        port=stub_port,
+    )
+
+    with open(args.workflow, encoding="utf-8") as f:
+        workflow = json.load(f)
+    if not _point_llm_calls(workflow, f"http://localhost:{stub_port}"):
+        print("warning: the workflow has no invoke_llm action", file=sys.stderr)
+    workdir = tempfile.TemporaryDirectory(prefix="lurawi_bench_")
+    behaviour = os.path.join(workdir.name, "bench_workflow")
+    with open(behaviour + ".json", "w", encoding="utf-8") as f:
+        json.dump(workflow, f)
+
+    proc = None
+    server = server_task = None
+    service_pid = os.getpid()
+    if args.in_process:
+        import uvicorn  # pylint: disable=import-outside-toplevel
+        from lurawi import utils  # pylint: disable=import-outside-toplevel
+        from lurawi.workflow_service import (  # pylint: disable=import-outside-toplevel
+            WorkflowService,
+        )
+
+        utils.no_auth = True
+        utils.get_project_settings()
+        server = uvicorn.Server(
+            uvicorn.Config(
+                WorkflowService(behaviour).create_app(),
+                host="localhost",
+                port=port,
+                log_level="warning",
+            )
+        )
+        server_task = asyncio.create_task(server.serve())
+    else:
+        proc = subprocess.Popen(  # pylint: disable=consider-using-with
+            [
+                sys.executable,
+                os.path.realpath(__file__),
+                "--serve",
+                behaviour,
+                "--port",
+                str(port),
+            ],
+            cwd=REPO_ROOT,
+            stdout=None if args.verbose else subprocess.DEVNULL,
+            stderr=None if args.verbose else subprocess.DEVNULL,
+        )
+        service_pid = proc.pid
+
+    connector = aiohttp.TCPConnector(limit=0)
+    timeout = aiohttp.ClientTimeout(total=args.timeout)
+    try:
+        async with aiohttp.ClientSession(
+            connector=connector, timeout=timeout
+        ) as session:
+            await _wait_ready(session, port, args.startup_timeout, proc)
+            yield (
+                session,
+                f"http://localhost:{port}/{os.environ['PROJECT_NAME']}/message",
+                service_pid,
+            )
+    finally:
+        if proc is not None:
+            proc.send_signal(signal.SIGINT)
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+        if server is not None:
+            server.should_exit = True
+            await server_task
+        await stub_runner.cleanup()
+        workdir.cleanup()
+
+
+async def _wait_ready(
+    session: aiohttp.ClientSession, port: int, startup_timeout: float, proc=None
+):
+    """
+    Wait for the service to answer its health check.
+    """
+    deadline = time.monotonic() + startup_timeout
+    while time.monotonic() < deadline:
+        if proc is not None and proc.poll() is not None:
+            raise RuntimeError(f"service exited with code {proc.returncode}")
+        try:
+            async with session.get(f"http://localhost:{port}/healthcheck") as resp:
+                if resp.status == 200:
+                    return
+        except aiohttp.ClientError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("service did not become ready in time")
+
+
+def add_service_arguments(parser: argparse.ArgumentParser):
+    """
+    Add the arguments of the service under test to a command line parser.
+
+    Args:
+        parser (argparse.ArgumentParser): The parser.
+    """
+    parser.add_argument(
+        "--workflow",
+        default=DEFAULT_WORKFLOW,
+        help="The workflow JSON to run (default: lurawi_example.json).",
+    )
+    parser.add_argument(
+        "--in-process",
+        action="store_true",
+        help="Run the service in the harness process instead of a subprocess.",
+    )
+    parser.add_argument(
+        "--port", type=int, default=0, help="Service port (default: a free port)."
+    )
+    parser.add_argument(
+        "--llm-port", type=int, default=0, help="Stub LLM port (default: a free port)."
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=60,
+        help="Seconds before a message counts as an error (default: 60).",
+    )
+    parser.add_argument(
+        "--startup-timeout",
+        type=float,
+        default=60,
+        help="Seconds to wait for the service to start (default: 60).",
+    )
+    parser.add_argument(
+        "--verbose", action="store_true", help="Show the service output."
+    )
+    parser.add_argument("--serve", help=argparse.SUPPRESS)
+    add_stub_arguments(parser)
+
+
+def prepare_service(args: argparse.Namespace) -> bool:
+    """
+    Set up the environment of the service under test, or run it when the harness
+    was started as the service subprocess.
+
+    Args:
+        args (argparse.Namespace): The command line arguments.
+
+    Returns:
+        bool: True if the harness should go on, False if it ran the service.
+    """
+    os.environ.setdefault("PROJECT_NAME", "lurawi")
+    os.environ.setdefault("PROJECT_ACCESS_KEY", "bench")
+
+    if args.serve:
+        serve(args.serve, args.port)
+        return False
+
+    # handlers and customs are discovered relative to the working directory, so
+    # paths given on the command line are resolved before changing to the repo root
+    args.workflow = os.path.abspath(args.workflow)
+    if getattr(args, "json_output", None):
+        args.json_output = os.path.abspath(args.json_output)
+    os.chdir(REPO_ROOT)
+    return True
+
+
+class LoadTest:
+    """
+    Drives the workflow service with concurrent virtual users.
+    """
+
+    def __init__(self, args: argparse.Namespace):
+        """
+        Initializes a new LoadTest.
+
+        Args:
+            args (argparse.Namespace): The command line arguments.
+        """
+        self.args = args
+        self.url = ""
+        self.latencies: List[float] = []
+        self.statuses: Dict[int, int] = {}
+        self.exceptions = 0
+        self.sent = 0
+
+    async def _send(self, session: aiohttp.ClientSession, uid: str, record: bool):
+        """
+        Send a message and read the whole response.
+        """
+        payload = {"uid": uid, "name": uid, "data": {"message": self.args.message}}
+        started = time.perf_counter()
+        try:
+            async with session.post(self.url, json=payload) as resp:
+                await resp.read()
+                status = resp.status
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            if record:
+                self.exceptions += 1
+            return
+        if record:
+            self.latencies.append(time.perf_counter() - started)
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    async def _virtual_user(
+        self, session: aiohttp.ClientSession, index: int, deadline: float
+    ):
+        """
+        Send messages as one conversation member until the run ends.
+        """
+        uid = f"bench{index}"
+        while time.monotonic() < deadline:
+            if self.args.requests:
+                if self.sent >= self.args.requests:
+                    return
+                self.sent += 1
+            await self._send(session, uid, record=True)
+            if self.args.think_time:
+                await asyncio.sleep(self.args.think_time)
+
+    async def run(self) -> Dict:
+        """
+        Start the stub LLM server and the service, run the virtual users and
+        summarise the results.
+
+        Returns:
+            Dict: The results.
+        """
+        async with bench_service(self.args) as (session, self.url, service_pid):
+            # create the conversation members before the baseline memory is read
+            for _ in range(self.args.warmup):
+                await asyncio.gather(
+                    *(
+                        self._send(session, f"bench{index}", record=False)
+                        for index in range(self.args.users)
+                    )
+                )
+            rss_start = rss_mb(service_pid)
+            started = time.monotonic()
+            deadline = started + (self.args.duration or float("inf"))
+            await asyncio.gather(
+                *(
+                    self._virtual_user(session, index, deadline)
+                    for index in range(self.args.users)
+                )
+            )
+            elapsed = time.monotonic() - started
+            rss_end = rss_mb(service_pid)
+
+        latencies = sorted(self.latencies)
+        total = len(latencies) + self.exceptions
+        busy = self.statuses.get(429, 0)
+        errors = self.exceptions + sum(
+            count
+            for status, count in self.statuses.items()
+            if status >= 400 and status != 429
+        )
+        return {
+            "users": self.args.users,
+            "requests": total,
+            "elapsed_s": round(elapsed, 3),
+            "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+            "latency_ms": latency_summary(latencies),
+            "errors": errors,
+            "error_rate": round(errors / total, 4) if total else 0.0,
+            "busy_429": busy,
+            "busy_rate": round(busy / total, 4) if total else 0.0,
+            "statuses": {str(k): v for k, v in sorted(self.statuses.items())},
+            "rss_mb": {
+                "start": round(rss_start, 1) if rss_start is not None else None,
+                "end": round(rss_end, 1) if rss_end is not None else None,
+                "growth": (
+                    round(rss_end - rss_start, 1)
+                    if rss_start is not None and rss_end is not None
+                    else None
+                ),
+            },
+        }
+
+
+def print_report(results: Dict):
+    """
+    Print the results of a load test.
+
+    Args:
+        results (Dict): The results.
+    """
+    latency = results["latency_ms"]
+    rss = results["rss_mb"]
+    print(
+        f"users: {results['users']}  requests: {results['requests']}  "
+        f"elapsed: {results['elapsed_s']}s  "
+        f"throughput: {results['throughput_rps']} req/s"
+    )
+    print(
+        f"latency ms: p50 {latency['p50']}  p95 {latency['p95']}  "
+        f"p99 {latency['p99']}  max {latency['max']}"
+    )
+    print(
+        f"errors: {results['errors']} ({results['error_rate']:.2%})  "
+        f"429 busy: {results['busy_429']} ({results['busy_rate']:.2%})  "
+        f"statuses: {results['statuses']}"
+    )
+    if rss["growth"] is not None:
+        print(f"rss MB: start {rss['start']}  end {rss['end']}  growth {rss['growth']}")
+    else:
+        print("rss MB: unavailable")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lurawi load-test harness")
+    parser.add_argument(
+        "--users", type=int, default=10, help="Concurrent virtual users (default: 10)."
+    )
+    parser.add_argument(
+        "--duration",
+        type=float,
+        default=0,
+        help="Seconds to run; 0 runs until --requests are sent (default: 10 "
+        "if neither is given).",
+    )
+    parser.add_argument(
+        "--requests", type=int, default=0, help="Total messages to send."
+    )
+    parser.add_argument(
+        "--warmup",
+        type=int,
+        default=1,
+        help="Unrecorded messages per user before the run (default: 1).",
+    )
+    parser.add_argument(
+        "--think-time",
+        type=float,
+        default=0,
+        help="Seconds a user waits between messages (default: 0).",
+    )
+    parser.add_argument(
+        "--message", default="What is Lurawi?", help="The message text sent."
+    )
+    parser.add_argument(
+        "--json", dest="json_output", help="Also write the results to a JSON file."
+    )
+    add_service_arguments(parser)
+    args = parser.parse_args()
+
+    if not prepare_service(args):
+        return
+
+    if not args.duration and not args.requests:
+        args.duration = 10
+
+    results = asyncio.run(LoadTest(args).run())
+    print_report(results)
+    if args.json_output:
+        with open(args.json_output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,441 @@
+#!/usr/bin/env python3
+
+"""
+Micro-benchmarks of the Lurawi action runner.
+
+Two suites are run:
+
+- primitives: the time to play each primitive (`text`, `knowledge`, `calculate`,
+  `compare`, `random`, `play_behaviour`, `select_behaviour` and a no-op `custom`)
+  through ActivityManager.play_action.
+- scaling: synthetic behaviour files of increasing size, as behaviours x actions x
+  chain depth, measuring the time to load the file, to create a conversation
+  member and to run a turn.
+
+The results are written as JSON with the commit they were measured on, so a run
+can be compared with a baseline from another commit:
+
+    python benchmarks/micro_benchmarks.py --json baseline.json
+    git checkout my-branch
+    python benchmarks/micro_benchmarks.py --compare baseline.json
+
+With --compare, the exit code is 1 if any benchmark is slower than the baseline by
+more than --threshold.
+"""
+
+import argparse
+import asyncio
+import gc
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import types
+from typing import Callable, Dict, List, Tuple
+
+import simplejson as json
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+# pylint: disable=wrong-import-position
+from lurawi.activity_manager import ActivityManager  # noqa: E402
+from lurawi.custom_behaviour import CustomBehaviour  # noqa: E402
+from lurawi.custom_registry import CUSTOM_MODULE_PREFIX  # noqa: E402
+from lurawi.utils import logger  # noqa: E402
+
+# behaviours x actions x chain depth
+DEFAULT_SIZES = (
+    (10, 10, 1),
+    (10, 10, 10),
+    (100, 10, 10),
+    (100, 100, 10),
+    (1000, 10, 10),
+)
+
+PRIMITIVES = {
+    "text": ["text", "hello"],
+    "knowledge": ["knowledge", {"RESULT": "X"}],
+    "calculate": ["calculate", ["RESULT", "X*2+Y"]],
+    "compare": [
+        "compare",
+        {"operand1": "X", "comparison_operator": "<", "operand2": "Y+1"},
+    ],
+    "random": ["random", ["RESULT", [1, 2, 3]]],
+    "play_behaviour": ["play_behaviour", "other"],
+    "select_behaviour": ["select_behaviour", "other"],
+    "custom": ["custom", {"name": "bench_noop"}],
+}
+
+PRIMITIVE_BEHAVIOURS = {
+    "default": "main",
+    "behaviours": [
+        {"name": "main", "actions": [[["name", "idle"]]]},
+        {"name": "other", "actions": [[["name", "idle"]]]},
+    ],
+}
+
+
+class bench_noop(CustomBehaviour):
+    """!@brief a custom behaviour that succeeds immediately, to time the custom
+    behaviour overhead of the action runner.
+    """
+
+    async def run(self):
+        await self.succeeded()
+
+
+def _register_noop_custom():
+    """
+    Make the no-op custom behaviour resolvable by the custom registry.
+    """
+    module_name = f"{CUSTOM_MODULE_PREFIX}bench_noop"
+    module = types.ModuleType(module_name)
+    module.bench_noop = bench_noop
+    sys.modules[module_name] = module
+
+
+def _git_commit() -> str:
+    """
+    Returns:
+        str: The commit of the repository, or an empty string if unknown.
+    """
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=REPO_ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+async def _time_async(func: Callable, iterations: int, repeat: int) -> Dict:
+    """
+    Time an async function, with the garbage collector disabled.
+
+    Args:
+        func (Callable): The coroutine function to time.
+        iterations (int): Calls per sample.
+        repeat (int): Number of samples.
+
+    Returns:
+        Dict: The best and median time per call, in microseconds.
+    """
+    samples = []
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            for _ in range(iterations):
+                await func()
+            samples.append((time.perf_counter() - started) / iterations)
+    finally:
+        gc.enable()
+    return {
+        "best_us": round(min(samples) * 1e6, 3),
+        "median_us": round(statistics.median(samples) * 1e6, 3),
+        "iterations": iterations,
+        "repeat": repeat,
+    }
+
+
+async def bench_primitives(iterations: int, repeat: int) -> Dict[str, Dict]:
+    """
+    Time each primitive through ActivityManager.play_action.
+
+    Args:
+        iterations (int): Calls per sample.
+        repeat (int): Number of samples.
+
+    Returns:
+        Dict[str, Dict]: The timings per primitive.
+    """
+    results = {}
+    for name, alet in PRIMITIVES.items():
+        manager = ActivityManager(
+            "bench", "bench", PRIMITIVE_BEHAVIOURS, {"X": 2, "Y": 3}
+        )
+        await manager.init()
+
+        async def play(manager=manager, alet=alet):
+            await manager.play_action("bench", [alet])
+            manager.response = None
+
+        await play()
+        if manager.is_busy():
+            raise RuntimeError(f"primitive {name} did not complete")
+        results[name] = await _time_async(play, iterations, repeat)
+    return results
+
+
+def generate_behaviours(behaviours: int, actions: int, depth: int) -> Dict:
+    """
+    Generate a synthetic behaviours definition.
+
+    Each behaviour has `actions` actions of one alet chaining `depth` knowledge
+    alets and a text alet. A turn plays the behaviour named by NEXT_BEHAVIOUR,
+    whose chain points NEXT_BEHAVIOUR at the following behaviour, so consecutive
+    turns visit every behaviour.
+
+    Args:
+        behaviours (int): The number of behaviours, besides the default one.
+        actions (int): The number of actions per behaviour.
+        depth (int): The number of chained alets per action.
+
+    Returns:
+        Dict: The behaviours definition.
+    """
+    definitions = [
+        {
+            "name": "main",
+            "actions": [
+                [
+                    [
+                        "workflow_interaction",
+                        {"engagement": ["play_behaviour", "NEXT_BEHAVIOUR"]},
+                    ]
+                ]
+            ],
+        }
+    ]
+    for index in range(behaviours):
+        actions_list = []
+        for action in range(actions):
+            chain = []
+            for step in range(depth - 1):
+                chain += ["knowledge", {"STEP": f"{index}.{action}.{step}"}]
+            chain += ["knowledge", {"NEXT_BEHAVIOUR": f"b{(index + 1) % behaviours}"}]
+            chain += ["text", ["step {} of b{}", ["STEP", str(index)]]]
+            actions_list.append([chain])
+        definitions.append({"name": f"b{index}", "actions": actions_list})
+    return {"default": "main", "behaviours": definitions}
+
+
+async def bench_scaling(
+    sizes: List[Tuple[int, int, int]], iterations: int, repeat: int
+) -> List[Dict]:
+    """
+    Measure how load, member creation and turn times scale with behaviour size.
+
+    Args:
+        sizes (List[Tuple[int, int, int]]): The behaviours x actions x depth sizes.
+        iterations (int): Calls per sample.
+        repeat (int): Number of samples.
+
+    Returns:
+        List[Dict]: The timings per size.
+    """
+    results = []
+    with tempfile.TemporaryDirectory(prefix="lurawi_bench_") as workdir:
+        for behaviours, actions, depth in sizes:
+            definition = generate_behaviours(behaviours, actions, depth)
+            knowledge = {"NEXT_BEHAVIOUR": "b0"}
+            knowledge.update({f"KEY_{i}": f"value {i}" for i in range(behaviours)})
+            path = os.path.join(workdir, f"bench_{behaviours}_{actions}_{depth}.json")
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(definition, f)
+
+            async def load(path=path):
+                with open(path, encoding="utf-8") as f:
+                    json.load(f)
+
+            async def create_member(definition=definition, knowledge=knowledge):
+                manager = ActivityManager("bench", "bench", definition, knowledge)
+                await manager.init()
+
+            manager = ActivityManager("bench", "bench", definition, knowledge)
+            await manager.init()
+
+            async def turn(manager=manager):
+                await manager.run_turn(manager.start_user_workflow(data={}))
+                manager.get_response()
+
+            await turn()
+            if manager.is_busy() or manager.knowledge["NEXT_BEHAVIOUR"] != (
+                f"b{1 % behaviours}"
+            ):
+                raise RuntimeError(f"synthetic turn of size {path} did not complete")
+
+            # large files are slow to load, so fewer iterations suffice
+            scaled = max(1, iterations // max(1, behaviours * actions // 100))
+            results.append(
+                {
+                    "behaviours": behaviours,
+                    "actions": actions,
+                    "depth": depth,
+                    "file_bytes": os.path.getsize(path),
+                    "load": await _time_async(load, scaled, repeat),
+                    "create_member": await _time_async(create_member, scaled, repeat),
+                    "turn": await _time_async(turn, iterations, repeat),
+                }
+            )
+    return results
+
+
+def _flatten(results: Dict) -> Dict[str, float]:
+    """
+    Returns:
+        Dict[str, float]: The best time of each benchmark, keyed by a stable name.
+    """
+    flat = {}
+    for name, timing in results["primitives"].items():
+        flat[f"primitive.{name}"] = timing["best_us"]
+    for entry in results["scaling"]:
+        size = f"{entry['behaviours']}x{entry['actions']}x{entry['depth']}"
+        for phase in ("load", "create_member", "turn"):
+            flat[f"scaling.{size}.{phase}"] = entry[phase]["best_us"]
+    return flat
+
+
+def compare_results(results: Dict, baseline: Dict, threshold: float) -> bool:
+    """
+    Print the change of each benchmark against a baseline.
+
+    Args:
+        results (Dict): The current results.
+        baseline (Dict): The baseline results.
+        threshold (float): The relative slowdown counted as a regression.
+
+    Returns:
+        bool: True if no benchmark regressed.
+    """
+    current = _flatten(results)
+    previous = _flatten(baseline)
+    print(
+        f"\ncompared with {baseline.get('commit') or 'baseline'} "
+        f"(regression threshold {threshold:.0%})"
+    )
+    passed = True
+    for name, value in current.items():
+        if name not in previous or not previous[name]:
+            continue
+        change = value / previous[name] - 1
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            passed = False
+        print(
+            f"{name:45} {previous[name]:12.2f} -> {value:12.2f} us {change:+7.1%}{flag}"
+        )
+    return passed
+
+
+def print_results(results: Dict):
+    """
+    Print the results as tables.
+
+    Args:
+        results (Dict): The results.
+    """
+    print(f"{'primitive':20} {'best us':>10} {'median us':>10}")
+    for name, timing in results["primitives"].items():
+        print(f"{name:20} {timing['best_us']:10.2f} {timing['median_us']:10.2f}")
+    print(
+        f"\n{'behaviours x actions x depth':30} {'file KB':>9} {'load us':>12} "
+        f"{'member us':>12} {'turn us':>10}"
+    )
+    for entry in results["scaling"]:
+        size = f"{entry['behaviours']} x {entry['actions']} x {entry['depth']}"
+        print(
+            f"{size:30} {entry['file_bytes'] / 1024:9.1f} "
+            f"{entry['load']['best_us']:12.2f} "
+            f"{entry['create_member']['best_us']:12.2f} "
+            f"{entry['turn']['best_us']:10.2f}"
+        )
+
+
+def _parse_size(value: str) -> Tuple[int, int, int]:
+    """
+    Parse a behaviours x actions x depth size, e.g. 100x10x5.
+    """
+    try:
+        behaviours, actions, depth = (int(part) for part in value.lower().split("x"))
+    except ValueError as err:
+        raise argparse.ArgumentTypeError(
+            f"size {value} should look like 100x10x5"
+        ) from err
+    if min(behaviours, actions, depth) < 1:
+        raise argparse.ArgumentTypeError(f"size {value} should be positive")
+    return behaviours, actions, depth
+
+
+async def run(args: argparse.Namespace) -> Dict:
+    """
+    Run the selected suites.
+
+    Args:
+        args (argparse.Namespace): The command line arguments.
+
+    Returns:
+        Dict: The results, with the environment they were measured in.
+    """
+    results = {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "primitives": {},
+        "scaling": [],
+    }
+    if args.suite in ("all", "primitives"):
+        results["primitives"] = await bench_primitives(args.iterations, args.repeat)
+    if args.suite in ("all", "scaling"):
+        results["scaling"] = await bench_scaling(
+            args.sizes or list(DEFAULT_SIZES), args.iterations, args.repeat
+        )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lurawi action runner benchmarks")
+    parser.add_argument(
+        "--suite", choices=("all", "primitives", "scaling"), default="all"
+    )
+    parser.add_argument(
+        "--iterations", type=int, default=1000, help="Calls per sample (default: 1000)."
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=5, help="Samples per benchmark (default: 5)."
+    )
+    parser.add_argument(
+        "--size",
+        dest="sizes",
+        type=_parse_size,
+        action="append",
+        help="A behaviours x actions x depth size, e.g. 100x10x5; repeatable.",
+    )
+    parser.add_argument("--json", dest="json_output", help="Write the results here.")
+    parser.add_argument("--compare", help="A results JSON file to compare with.")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="Relative slowdown counted as a regression (default: 0.1).",
+    )
+    args = parser.parse_args()
+
+    logger.setLevel("ERROR")
+    _register_noop_custom()
+    results = asyncio.run(run(args))
+    print_results(results)
+
+    if args.json_output:
+        with open(args.json_output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if not compare_results(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+
+"""
+Replay captured /message traffic against a local workflow service.
+
+The service records its /message traffic to JSONL files when TrafficCaptureFile is
+set (see lurawi/traffic_capture.py). This tool re-sends the captured requests to
+a local service running against the stub LLM server, as the load test does, at the
+original pacing or faster, and compares the replayed latency distribution and
+statuses with the captured ones.
+
+Requests are sent at their captured time offsets divided by --speed; --speed 0
+sends them as fast as possible. The requests of a user are always sent in order,
+each after the response to the previous one, as a client would.
+
+Usage, from the repository root:
+    python benchmarks/replay.py capture.jsonl capture.jsonl.1 --speed 4
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from typing import Dict, List
+
+import aiohttp
+import simplejson as json
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+# pylint: disable=wrong-import-position
+from benchmarks.load_test import (  # noqa: E402
+    add_service_arguments,
+    bench_service,
+    latency_summary,
+    prepare_service,
+)
+
+
+def load_capture(paths: List[str], limit: int = 0) -> List[Dict]:
+    """
+    Load captured requests, in arrival order.
+
+    Args:
+        paths (List[str]): The capture files, e.g. a file and its rotated files.
+        limit (int): The maximum number of requests, 0 for all.
+
+    Returns:
+        List[Dict]: The captured requests with a payload.
+    """
+    records = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    print(f"warning: skipping invalid line in {path}", file=sys.stderr)
+                    continue
+                if isinstance(record.get("payload"), dict):
+                    records.append(record)
+    records.sort(key=lambda record: record["ts"])
+    return records[:limit] if limit else records
+
+
+def _summarise(latencies: List[float], statuses: Dict[int, int], elapsed: float):
+    """
+    Summarise the latencies and statuses of a set of requests.
+    """
+    total = sum(statuses.values())
+    busy = statuses.get(429, 0)
+    errors = sum(
+        count for status, count in statuses.items() if status >= 400 and status != 429
+    )
+    return {
+        "requests": total,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": latency_summary(sorted(latencies)),
+        "errors": errors,
+        "error_rate": round(errors / total, 4) if total else 0.0,
+        "busy_429": busy,
+        "busy_rate": round(busy / total, 4) if total else 0.0,
+        "statuses": {str(k): v for k, v in sorted(statuses.items())},
+    }
+
+
+class Replay:
+    """
+    Re-sends captured requests with their original pacing and user ordering.
+    """
+
+    def __init__(self, args: argparse.Namespace, records: List[Dict]):
+        """
+        Initializes a new Replay.
+
+        Args:
+            args (argparse.Namespace): The command line arguments.
+            records (List[Dict]): The captured requests, in arrival order.
+        """
+        self.args = args
+        self.records = records
+        self.latencies: List[float] = []
+        self.statuses: Dict[int, int] = {}
+        self.max_send_lag = 0.0
+        self._user_locks: Dict[str, asyncio.Lock] = {}
+
+    async def _replay_request(
+        self,
+        session: aiohttp.ClientSession,
+        url: str,
+        record: Dict,
+        send_at: float,
+    ):
+        """
+        Send a captured request at its scheduled time, after the previous request
+        of its user has been answered.
+        """
+        delay = send_at - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        uid = str(record["payload"].get("uid", ""))
+        lock = self._user_locks.setdefault(uid, asyncio.Lock())
+        async with lock:
+            self.max_send_lag = max(self.max_send_lag, time.monotonic() - send_at)
+            started = time.perf_counter()
+            try:
+                async with session.post(url, json=record["payload"]) as resp:
+                    await resp.read()
+                    status = resp.status
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                status = 599
+            self.latencies.append(time.perf_counter() - started)
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    async def run(self) -> Dict:
+        """
+        Start the stub LLM server and the service, replay the captured requests,
+        and compare the results with the captured ones.
+
+        Returns:
+            Dict: The captured and replayed summaries.
+        """
+        first = self.records[0]["ts"]
+        captured_elapsed = self.records[-1]["ts"] - first
+        captured_statuses: Dict[int, int] = {}
+        for record in self.records:
+            status = record.get("status", 0)
+            captured_statuses[status] = captured_statuses.get(status, 0) + 1
+
+        async with bench_service(self.args) as (session, url, _):
+            started = time.monotonic()
+            await asyncio.gather(
+                *(
+                    self._replay_request(
+                        session,
+                        url,
+                        record,
+                        started
+                        + (
+                            (record["ts"] - first) / self.args.speed
+                            if self.args.speed
+                            else 0
+                        ),
+                    )
+                    for record in self.records
+                )
+            )
+            elapsed = time.monotonic() - started
+
+        return {
+            "speed": self.args.speed,
+            "captured": _summarise(
+                [record.get("latency_ms", 0) / 1000 for record in self.records],
+                captured_statuses,
+                captured_elapsed,
+            ),
+            "replayed": {
+                **_summarise(self.latencies, self.statuses, elapsed),
+                "max_send_lag_ms": round(self.max_send_lag * 1000, 2),
+            },
+        }
+
+
+def print_comparison(results: Dict):
+    """
+    Print the captured and replayed summaries side by side.
+
+    Args:
+        results (Dict): The replay results.
+    """
+    captured = results["captured"]
+    replayed = results["replayed"]
+    rows = [
+        ("requests", "requests"),
+        ("elapsed s", "elapsed_s"),
+        ("throughput req/s", "throughput_rps"),
+    ]
+    rows += [
+        (f"latency {name} ms", ("latency_ms", name))
+        for name in ("p50", "p95", "p99", "max")
+    ]
+    rows += [("errors", "errors"), ("429 busy", "busy_429")]
+
+    print(f"replay speed: {results['speed'] or 'as fast as possible'}")
+    print(f"{'':20} {'captured':>12} {'replayed':>12}")
+    for label, key in rows:
+        if isinstance(key, tuple):
+            values = (captured[key[0]][key[1]], replayed[key[0]][key[1]])
+        else:
+            values = (captured[key], replayed[key])
+        print(f"{label:20} {values[0]:>12} {values[1]:>12}")
+    print(f"statuses: captured {captured['statuses']}  replayed {replayed['statuses']}")
+    print(f"max send lag: {replayed['max_send_lag_ms']} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay captured Lurawi traffic")
+    parser.add_argument("capture", nargs="*", help="The capture JSONL files.")
+    parser.add_argument(
+        "--speed",
+        type=float,
+        default=1.0,
+        help="Pacing speed-up, e.g. 4 replays 4 times faster; 0 sends as fast as "
+        "possible (default: 1).",
+    )
+    parser.add_argument(
+        "--limit", type=int, default=0, help="Replay the first N requests only."
+    )
+    parser.add_argument(
+        "--json", dest="json_output", help="Also write the results to a JSON file."
+    )
+    add_service_arguments(parser)
+    args = parser.parse_args()
+
+    args.capture = [os.path.abspath(path) for path in args.capture]
+    if not prepare_service(args):
+        return
+    if not args.capture:
+        parser.error("no capture file given")
+    for path in args.capture:
+        if not os.path.isfile(path):
+            parser.error(f"capture file {path} not found")
+    if args.speed < 0:
+        parser.error("--speed must not be negative")
+
+    records = load_capture(args.capture, args.limit)
+    if not records:
+        print("no captured requests to replay", file=sys.stderr)
+        sys.exit(-1)
+
+    results = asyncio.run(Replay(args, records).run())
+    print_comparison(results)
+    if args.json_output:
+        with open(args.json_output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+
+"""
+A local OpenAI-compatible chat completion server for benchmarking Lurawi.
+
+The server answers /chat/completions and /v1/chat/completions with a fixed number
+of generated tokens after a configurable latency, at a configurable token rate,
+streamed or not as requested, so load tests measure the Lurawi engine rather than
+the variance of a real LLM.
+
+Usage:
+    python benchmarks/stub_llm_server.py --port 8080 --llm-latency 0.2 --llm-token-rate 200
+"""
+
+import argparse
+import asyncio
+import time
+import uuid
+
+import simplejson as json
+from aiohttp import web
+
+DEFAULT_TOKENS = 64
+
+
+class StubLLMServer:
+    """
+    An OpenAI-compatible chat completion endpoint with deterministic timing.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        token_rate: float = 0.0,
+        tokens: int = DEFAULT_TOKENS,
+    ):
+        """
+        Initializes a new StubLLMServer.
+
+        Args:
+            latency (float): Seconds before the first token.
+            token_rate (float): Tokens generated per second, 0 for no delay.
+            tokens (int): Tokens generated per completion, capped by max_tokens.
+        """
+        self.latency = latency
+        self.token_rate = token_rate
+        self.tokens = tokens
+        self.requests = 0
+
+    def create_app(self) -> web.Application:
+        """
+        Returns:
+            web.Application: The stub server application.
+        """
+        app = web.Application()
+        app.router.add_post("/chat/completions", self.chat_completions)
+        app.router.add_post("/v1/chat/completions", self.chat_completions)
+        return app
+
+    async def chat_completions(self, request: web.Request) -> web.StreamResponse:
+        """
+        Answer a chat completion request.
+
+        Args:
+            request (web.Request): The chat completion request.
+
+        Returns:
+            web.StreamResponse: The completion, or its SSE stream.
+        """
+        self.requests += 1
+        body = await request.json()
+        model = body.get("model", "stub")
+        tokens = min(self.tokens, body.get("max_tokens") or self.tokens)
+        prompt_tokens = sum(
+            len(str(message.get("content", "")).split())
+            for message in body.get("messages", [])
+        )
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+        token_delay = 1 / self.token_rate if self.token_rate > 0 else 0
+
+        await asyncio.sleep(self.latency)
+
+        if not body.get("stream"):
+            await asyncio.sleep(token_delay * tokens)
+            return web.json_response(
+                {
+                    "id": completion_id,
+                    "object": "chat.completion",
+                    "created": created,
+                    "model": model,
+                    "choices": [
+                        {
+                            "index": 0,
+                            "message": {
+                                "role": "assistant",
+                                "content": " ".join(["token"] * tokens),
+                            },
+                            "finish_reason": "stop",
+                        }
+                    ],
+                    "usage": {
+                        "prompt_tokens": prompt_tokens,
+                        "completion_tokens": tokens,
+                        "total_tokens": prompt_tokens + tokens,
+                    },
+                }
+            )
+
+        response = web.StreamResponse(
+            headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"}
+        )
+        await response.prepare(request)
+
+        def chunk(delta, finish_reason=None):
+            return {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [
+                    {"index": 0, "delta": delta, "finish_reason": finish_reason}
+                ],
+            }
+
+        async def send(data):
+            await response.write(f"data: {json.dumps(data)}\n\n".encode())
+
+        await send(chunk({"role": "assistant", "content": ""}))
+        for index in range(tokens):
+            if token_delay and index:
+                await asyncio.sleep(token_delay)
+            await send(chunk({"content": "token "}))
+        await send(chunk({}, "stop"))
+        if (body.get("stream_options") or {}).get("include_usage"):
+            usage_chunk = chunk({})
+            usage_chunk["choices"] = []
+            usage_chunk["usage"] = {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": tokens,
+                "total_tokens": prompt_tokens + tokens,
+            }
+            await send(usage_chunk)
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+
+async def start_stub_server(
+    stub: StubLLMServer, host: str = "localhost", port: int = 8080
+) -> web.AppRunner:
+    """
+    Start a stub server on the running event loop.
+
+    Args:
+        stub (StubLLMServer): The stub server.
+        host (str): The host to listen on.
+        port (int): The port to listen on.
+
+    Returns:
+        web.AppRunner: The runner, to clean up once done.
+    """
+    runner = web.AppRunner(stub.create_app(), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
+
+
+def add_stub_arguments(parser: argparse.ArgumentParser):
+    """
+    Add the stub server timing arguments to a command line parser.
+
+    Args:
+        parser (argparse.ArgumentParser): The parser.
+    """
+    parser.add_argument(
+        "--llm-latency",
+        type=float,
+        default=0.1,
+        help="Stub LLM seconds before the first token (default: 0.1).",
+    )
+    parser.add_argument(
+        "--llm-token-rate",
+        type=float,
+        default=500.0,
+        help="Stub LLM tokens per second, 0 for no delay (default: 500).",
+    )
+    parser.add_argument(
+        "--llm-tokens",
+        type=int,
+        default=DEFAULT_TOKENS,
+        help=f"Stub LLM tokens per completion (default: {DEFAULT_TOKENS}).",
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI-compatible stub LLM server")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=8080)
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+
+    web.run_app(
+        StubLLMServer(
+            args.llm_latency, args.llm_token_rate, args.llm_tokens
+        ).create_app(),
+        host=args.host,
+        port=args.port,
+        access_log=None,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,13 @@
 # pylint: disable=dangerous-default-value, too-many-lines
 
-import os
-import sys
 import asyncio
-import importlib
 import random
 import re
+import sys
 import time
 import uuid
-from typing import Dict, Any
+from collections import deque
+from typing import Dict, Any, Awaitable
 from threading import Lock as mutex
 import simplejson as json
 
@@ -18,8 +17,54 @@ from .calculate import calculate
 from .callbackmsg_manager import RemoteCallbackMessageUpdateManager
 from .compare import compare
 from .custom_behaviour import CustomBehaviour, DataStreamHandler
+from .custom_registry import customRegistry
+from .hooks import hookRegistry
+from .load_monitor import loadMonitor
+from .message_channel import CallbackURLChannel, MessageChannel
+from .server_timing import TurnTimings
+from .timer_manager import timerManager
 from .usermsg_manager import UserMessageUpdateManager
-from .utils import write_http_response, logger, is_indev
+from .utils import write_http_response, logger
+
+
+class RunQueue:
+    """
+    Queue of action runner steps of a single task.
+
+    Steps queued while a step is running are run right after it, in the order they
+    were queued and ahead of the steps queued earlier. The steps therefore run in
+    the same order as nested calls would, while the await stack stays flat.
+    """
+
+    __slots__ = ("_steps", "_next")
+
+    def __init__(self):
+        self._steps = deque()
+        self._next = 0
+
+    def push(self, step, args):
+        """
+        Queue a step to run after the current step.
+
+        Args:
+            step: The coroutine function to run
+            args: The arguments of the step
+        """
+        self._steps.insert(self._next, (step, args))
+        self._next += 1
+
+    def pop(self):
+        """
+        Take the next step to run.
+
+        Returns:
+            tuple: The coroutine function and its arguments
+        """
+        self._next = 0
+        return self._steps.popleft()
+
+    def __len__(self):
+        return len(self._steps)
 
 
 class ActivityManager:
@@ -51,6 +96,8 @@ class ActivityManager:
         self.knowledge["CURRENT_SESSION_ID"] = ""
         self.knowledge["MODULES"] = {}
         self.knowledge["LURAWI_SYSTEM_SERVICES"] = system_service
+        # members run on a single event loop, so lurawi no longer locks the knowledge;
+        # the mutex is kept for custom behaviours that still use it.
         self.knowledge["__MUTEX__"] = mutex()
         self.access_time = -1
         self._agent_mode = uid.startswith("agent_")
@@ -62,6 +109,12 @@ class ActivityManager:
         self.activity_index = -1
         self.chained_actions = {}
         self.running_actions = {}
+        # instrumentation hooks of the action runner
+        self.hooks = hookRegistry
+        # phase timings of the running turn, if Server-Timing is enabled
+        self._turn_timings: TurnTimings | None = None
+        # run queues of the tasks currently running chained actions
+        self._run_queues: Dict[asyncio.Task, list[RunQueue]] = {}
         self.pending_actions = []
         self.suspended_actions = {}  # suspended actions are all expected to be custom
         self.action_complete_cb = None
@@ -95,8 +148,19 @@ class ActivityManager:
         self.pending_knowledge = {}
         self.on_pending_complete = None
         self.response = None
-        self._discord_message = None
+        # event loop of the discord client, which owns the connection of its messages
+        self.discord_loop: asyncio.AbstractEventLoop | None = None
         self._is_initialised = False
+        # early response flush: set when a response is ready during a turn
+        self._response_ready: asyncio.Event | None = None
+        # the remainder of a flushed turn still running after the HTTP reply
+        self._background_turn: asyncio.Task | None = None
+        # outbound message channel that receives every message of a turn
+        self.channel: MessageChannel | None = None
+        # timer of a delay alet whose continuation has been deferred
+        self._delay_timer: int | None = None
+        # futures of parallel branches, resolved when their alet completes
+        self._action_waiters: Dict[str, asyncio.Future] = {}
 
     @property
     def is_initialised(self):
@@ -170,6 +234,182 @@ class ActivityManager:
 
         return await self.continue_workflow(data=data)
 
+    async def run_turn(
+        self,
+        turn: Awaitable[bool],
+        timings: TurnTimings | None = None,
+        callback_url: str = "",
+    ) -> bool:
+        """
+        Run a user turn, optionally returning as soon as its response is ready.
+
+        Any background continuation of the previous turn is awaited first. When
+        EARLY_RESPONSE_FLUSH is set in the knowledge, the turn returns as soon as a
+        `text`/`http_response` alet or `send_message` sets the response, and the
+        remaining chained actions continue as a tracked background task. Early
+        flush is not used while a message channel is attached, as every message
+        is already delivered through the channel. When TURN_TIMEOUT is set in the
+        knowledge, a turn running longer is cancelled and answered with a 504.
+
+        Args:
+            turn: The turn coroutine, e.g. from start_user_workflow or continue_workflow.
+            timings: Phase timings of the turn for the Server-Timing header, added
+                     to the response by get_response.
+            callback_url: The callback URL of this turn, set as ASYNC_CALLBACK_URL
+                          in the knowledge while the turn runs.
+
+        Returns:
+            bool: The turn result, or True if the turn was flushed early.
+        """
+        queued = time.perf_counter()
+        loadMonitor.turns_queued += 1
+        try:
+            await self.wait_for_background_turn()
+        finally:
+            loadMonitor.turns_queued -= 1
+
+        self._turn_timings = timings
+        if timings is not None:
+            timings.add("queue", time.perf_counter() - queued)
+            self.knowledge["MODULES"]["TurnTimings"] = timings
+        else:
+            self.knowledge["MODULES"].pop("TurnTimings", None)
+
+        turn = self._track_turn(turn, callback_url)
+        turn_timeout = self.knowledge.get("TURN_TIMEOUT")
+        if isinstance(turn_timeout, (int, float)) and turn_timeout > 0:
+            turn = self._run_with_deadline(turn, turn_timeout)
+
+        if self.channel is not None or not self.knowledge.get("EARLY_RESPONSE_FLUSH"):
+            return await turn
+
+        self._response_ready = asyncio.Event()
+        turn_task = asyncio.ensure_future(turn)
+        ready_task = asyncio.ensure_future(self._response_ready.wait())
+        try:
+            await asyncio.wait(
+                {turn_task, ready_task}, return_when=asyncio.FIRST_COMPLETED
+            )
+        finally:
+            ready_task.cancel()
+            self._response_ready = None
+
+        if turn_task.done():
+            return turn_task.result()
+
+        logger.debug(
+            "run_turn: response flushed early, continue turn %s in background",
+            self.knowledge["CURRENT_TURN_CONTEXT"],
+        )
+        self._background_turn = turn_task
+        turn_task.add_done_callback(self._on_background_turn_done)
+        return True
+
+    async def _track_turn(self, turn: Awaitable[bool], callback_url: str = "") -> bool:
+        """
+        Run a turn counted as in flight by the load monitor until it completes,
+        emitting the before_turn and after_turn hooks.
+
+        The callback URL of the turn is only kept in the knowledge while the turn
+        runs, so it never applies to the later turns of the member.
+
+        Args:
+            turn: The turn coroutine
+            callback_url: The callback URL of the turn, if any
+
+        Returns:
+            bool: The turn result
+        """
+        if callback_url:
+            self.knowledge["ASYNC_CALLBACK_URL"] = callback_url
+        else:
+            self.knowledge.pop("ASYNC_CALLBACK_URL", None)
+        loadMonitor.turns_in_flight += 1
+        if hookRegistry.before_turn:
+            hookRegistry.emit("before_turn", manager=self)
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            result = await turn
+            outcome = "completed" if result else "busy"
+            return result
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
+        finally:
+            self.knowledge.pop("ASYNC_CALLBACK_URL", None)
+            loadMonitor.turns_in_flight -= 1
+            if hookRegistry.after_turn:
+                hookRegistry.emit(
+                    "after_turn",
+                    manager=self,
+                    outcome=outcome,
+                    elapsed=time.perf_counter() - started,
+                )
+
+    async def _run_with_deadline(self, turn: Awaitable[bool], timeout: float) -> bool:
+        """
+        Run a turn, cancelling it and its running actions if it exceeds its deadline.
+
+        Args:
+            turn: The turn coroutine
+            timeout: The turn deadline in seconds
+
+        Returns:
+            bool: The turn result, or True if the turn timed out and a 504
+                  response has been sent.
+        """
+        try:
+            return await asyncio.wait_for(turn, timeout)
+        except asyncio.TimeoutError:
+            logger.error(
+                "turn %s for user %s timed out after %ss, running actions %s",
+                self.knowledge["CURRENT_TURN_CONTEXT"],
+                self.knowledge["USER_ID"],
+                timeout,
+                list(self.running_actions.keys()),
+            )
+            self.cancel_running_actions("turn timeout")
+            await self.send_raw_message(
+                504, {"status": "failed", "message": "Request timed out."}
+            )
+            return True
+
+    async def wait_for_background_turn(self):
+        """
+        Wait for the background continuation of an early flushed turn to finish.
+        """
+        if self._background_turn is None or self._background_turn.done():
+            return
+        try:
+            await asyncio.shield(self._background_turn)
+        except Exception as _:  # already logged in _on_background_turn_done
+            pass
+
+    def _on_background_turn_done(self, task: asyncio.Task):
+        """
+        Clean up after the background continuation of a flushed turn.
+
+        Args:
+            task: The completed background turn task
+        """
+        if self._background_turn is task:
+            self._background_turn = None
+        if task.cancelled():
+            return
+        if task.exception() is not None:
+            logger.error(
+                "background turn for user %s failed: %s",
+                self.knowledge["USER_ID"],
+                task.exception(),
+            )
+        if self.response is not None:
+            logger.warning(
+                "drop response sent after early flush of turn for user %s",
+                self.knowledge["USER_ID"],
+            )
+            self.response = None
+
     async def stop_user_workflow(self):
         """
         Stop the current user workflow.
@@ -387,7 +627,7 @@ class ActivityManager:
             return self.set_activity_index(int(active_section) - 1)
         elif ":" in active_section:  # "queensland_demo:2"
             if len(active_section.split(":")) == 2:
-                (behave, index) = active_section.split(":")
+                behave, index = active_section.split(":")
                 if (
                     self.set_active_behaviour(behave.strip())
                     and index.strip().isdigit()
@@ -421,9 +661,7 @@ class ActivityManager:
                 self.active_behaviour = beh["actions"]
                 self.activity_index = -1
                 if "USER_INPUTS_CACHE" in self.knowledge:
-                    self.knowledge["__MUTEX__"].acquire()
                     self.knowledge["USER_INPUTS_CACHE"] = []  # reset cache
-                    self.knowledge["__MUTEX__"].release()
                 logger.debug("Active behaviour set to %s", name)
                 return True
         logger.error("Cannot find %s behaviour", name)
@@ -535,9 +773,14 @@ class ActivityManager:
         Check if the ActivityManager is currently busy.
 
         Returns:
-            bool: True if there are running actions or actions lined up, False otherwise
+            bool: True if there are running actions, actions lined up or queued
+                  action steps, False otherwise
         """
-        return len(self.running_actions) > 0 or self.actions_lined_up
+        return (
+            len(self.running_actions) > 0
+            or self.actions_lined_up
+            or any(queue for queues in self._run_queues.values() for queue in queues)
+        )
 
     def is_busy_after_suspension(self):
         """
@@ -823,17 +1066,75 @@ class ActivityManager:
         self.current_action_id = action_id
         logger.debug("Playing action with id - %s", self.current_action_id)
         for index, alet in enumerate(action):
-            self.actions_lined_up = index != len(action) - 1
-            if alet[0] == "name":
-                logger.debug("Playing action %s(%s)", alet[1], action_id)
-                # if the action_list is just [['name','ALIVE']], action_complete_cb will be called
-                if index == len(action) - 1 and len(self.running_actions) == 0:
-                    await self.on_action_completed(self.current_action_id)
-            else:
-                await self.play_action_let(alet, ignore_moves)
+            await self.run_step(
+                self._play_action_step, alet, index == len(action) - 1, ignore_moves
+            )
 
         return True
 
+    async def _play_action_step(self, alet, is_last: bool, ignore_moves=[]):
+        """
+        Play an action element of the current action.
+
+        Args:
+            alet: Action element to execute
+            is_last: Whether this is the last element of the action
+            ignore_moves: List of action types to ignore
+        """
+        self.actions_lined_up = not is_last
+        if alet[0] == "name":
+            logger.debug("Playing action %s(%s)", alet[1], self.current_action_id)
+            # if the action_list is just [['name','ALIVE']], action_complete_cb will be called
+            if is_last and len(self.running_actions) == 0:
+                await self.on_action_completed(self.current_action_id)
+        else:
+            await self.play_action_let(alet, ignore_moves)
+
+    async def run_step(self, step, *args):
+        """
+        Run a step of the action runner, such as playing a chained alet.
+
+        Completion callbacks run inside the step that played the completed action.
+        Rather than awaiting the next alet from there, which nests a further await
+        frame for every chained alet, the next step is queued on the run queue of
+        the current task and run once the current step has returned. Outside of a
+        running step, the step and every step it queues are run here.
+
+        Args:
+            step: The coroutine function to run
+            *args: The arguments of the step
+        """
+        queues = self._run_queues.get(asyncio.current_task())
+        if queues:
+            queues[-1].push(step, args)
+            return
+        await self.run_nested_steps(step, *args)
+
+    async def run_nested_steps(self, step, *args):
+        """
+        Run a step and every step it queues to completion before returning.
+
+        Used where the caller relies on the step having completed, e.g. a failure
+        action that reads ERROR_MESSAGE before the failed custom behaviour clears it.
+
+        Args:
+            step: The coroutine function to run
+            *args: The arguments of the step
+        """
+        task = asyncio.current_task()
+        queue = RunQueue()
+        queue.push(step, args)
+        queues = self._run_queues.setdefault(task, [])
+        queues.append(queue)
+        try:
+            while queue:
+                step, args = queue.pop()
+                await step(*args)
+        finally:
+            queues.pop()
+            if not queues:
+                del self._run_queues[task]
+
     async def play_action_let(
         self, alet, ignore_moves=[]
     ):  # pylint: disable=too-many-return-statements
@@ -849,6 +1150,7 @@ class ActivityManager:
         - compare: Compare values
         - random: Select a random value
         - delay: Wait for a specified time
+        - parallel: Run independent alets concurrently and join them
         - custom: Execute a custom behaviour
         - workflow_interaction: Set up workflow interaction actions
         - select_behaviour: Select a behaviour
@@ -867,11 +1169,7 @@ class ActivityManager:
 
         arg = alet[1]
         cmd = alet[0]
-
-        if cmd == "custom":
-            tag = arg["name"] if isinstance(arg, dict) else arg
-        else:
-            tag = cmd
+        tag = self._get_alet_tag(alet)
 
         try:
             # if already running ignore
@@ -886,6 +1184,10 @@ class ActivityManager:
                 self.running_actions[tag] = (
                     arg.copy() if isinstance(arg, dict) else {"name": arg}
                 )
+                if hookRegistry.after_alet:
+                    self.running_actions[tag]["_started"] = (cmd, time.perf_counter())
+                if hookRegistry.before_alet:
+                    hookRegistry.emit("before_alet", manager=self, tag=tag, cmd=cmd)
         except Exception as _:
             logger.error(
                 "Not running %s, Something wrong with the args. Got %s", cmd, tag
@@ -908,7 +1210,7 @@ class ActivityManager:
         )
 
         if ignore_moves and cmd in ignore_moves:
-            await self.actionFailHandler(cmd)
+            await self.actionFailHandler(tag)
         elif cmd == "text":
             # there may be collision in key string with normal string
             # should enforce upcase for dict key.
@@ -1065,11 +1367,48 @@ class ActivityManager:
                 await self.actionFailHandler(cmd)
         elif cmd == "delay":
             if isinstance(arg, int) or isinstance(arg, float) and arg > 0:
+                if await self.defer_delay(arg):
+                    return
                 await asyncio.sleep(arg)
                 await self.actionHandler(cmd)
             else:
                 logger.error("Invalid arg(%s) for delay, expected int/float > 0", arg)
                 await self.actionFailHandler(cmd)
+        elif cmd == "parallel":
+            branches = arg.get("branches") if isinstance(arg, dict) else arg
+            if (
+                isinstance(branches, list)
+                and branches
+                and all(isinstance(b, list) and len(b) >= 2 for b in branches)
+            ):
+                branch_tags = [self._get_alet_tag(b) for b in branches]
+                duplicates = {t for t in branch_tags if branch_tags.count(t) > 1}
+                if duplicates:
+                    logger.error(
+                        "parallel: branches %s run the same action, give each custom "
+                        "branch a unique id",
+                        sorted(duplicates),
+                    )
+                    await self.actionFailHandler(
+                        cmd, arg.get("failed_action") if isinstance(arg, dict) else None
+                    )
+                    return
+                results = await asyncio.gather(
+                    *(self._play_parallel_branch(b) for b in branches)
+                )
+                if cmd not in self.running_actions:  # running actions have been cleared
+                    return
+                if all(results):
+                    await self.actionHandler(cmd)
+                else:
+                    await self.actionFailHandler(
+                        cmd, arg.get("failed_action") if isinstance(arg, dict) else None
+                    )
+            else:
+                logger.error(
+                    "Invalid arg(%s) for parallel, expected a list of alets", arg
+                )
+                await self.actionFailHandler(cmd)
         elif cmd == "custom":
             if isinstance(arg, dict):
                 module_name = arg["name"]
@@ -1080,7 +1419,7 @@ class ActivityManager:
                             "Invalid alet(%s). Action arguments must be a dictionary",
                             alet,
                         )
-                        await self.actionFailHandler(cmd)
+                        await self.actionFailHandler(tag)
                         return
                 else:
                     module_arg = {}
@@ -1088,67 +1427,19 @@ class ActivityManager:
                 module_name = arg
                 module_arg = None
 
-            module = None
-            full_module_name = f"lurawi.custom.{module_name}"
-            if full_module_name in sys.modules:
-                module = sys.modules[full_module_name]
-                if is_indev():
-                    logger.debug("reloading module %s", module_name)
-                    importlib.reload(module)
-            else:
-                if "LURAWI_WORKSPACE" in self.knowledge:
-                    module_path = os.path.join(
-                        self.knowledge["LURAWI_WORKSPACE"],
-                        "custom",
-                        f"{module_name}.py",
-                    )
-                    if os.path.exists(module_path):
-                        try:
-                            spec = importlib.util.spec_from_file_location(
-                                module_name, module_path
-                            )
-                            if spec is None or spec.loader is None:
-                                logger.error(
-                                    "Cannot find spec for module %s at %s",
-                                    module_name,
-                                    module_path,
-                                )
-                                await self.actionFailHandler(cmd)
-                                return
-                            module = importlib.util.module_from_spec(spec)
-                            spec.loader.exec_module(module)
-                            sys.modules[full_module_name] = module
-                        except Exception as err:
-                            logger.error(
-                                "Failed to load custom module %s: %s", module_name, err
-                            )
-                            await self.actionFailHandler(cmd)
-                            return
-                if module is None:
-                    try:
-                        module = importlib.import_module(full_module_name)
-                    except Exception as err:
-                        logger.error(
-                            "Failed to load custom module %s: %s", module_name, err
-                        )
-                        await self.actionFailHandler(cmd)
-                        return
-
-            tclass = getattr(module, module_name)
-            if issubclass(tclass, CustomBehaviour):
-                self.custom_behaviours[module_name] = tclass(self.knowledge, module_arg)
-                self.running_actions[module_name]["_custom_obj"] = (
-                    self.custom_behaviours[module_name]
-                )
-                self.custom_behaviours[module_name].on_success = self.actionHandler
-                self.custom_behaviours[module_name].on_failure = self.actionFailHandler
-                await self.custom_behaviours[module_name].run()
+            tclass = customRegistry.resolve(
+                module_name, self.knowledge.get("LURAWI_WORKSPACE")
+            )
+            if tclass is not None:
+                custom_obj = tclass(self.knowledge, module_arg)
+                custom_obj.action_tag = tag
+                self.custom_behaviours[tag] = custom_obj
+                self.running_actions[tag]["_custom_obj"] = custom_obj
+                custom_obj.on_success = self.actionHandler
+                custom_obj.on_failure = self.actionFailHandler
+                await self.run_custom_behaviour(tag, custom_obj)
             else:
-                logger.error(
-                    "Custom script has to be an instance of CustomBehaviour. Ignoring %s",
-                    alet,
-                )
-                await self.actionFailHandler(cmd)
+                await self.actionFailHandler(tag)
         elif cmd == "workflow_interaction":
             if isinstance(arg, dict):
                 if "engagement" in arg:
@@ -1171,8 +1462,8 @@ class ActivityManager:
                 for let in arg:
                     if let[0] == "name":
                         continue
-                    await self.play_action_let(let)
-                await self.actionHandler(cmd)
+                    await self.run_step(self.play_action_let, let)
+                await self.run_step(self.actionHandler, cmd)
             else:
                 if self.select_activity(arg):
                     # we will close down all suspended actions when we jump behaviour regardless
@@ -1223,6 +1514,185 @@ class ActivityManager:
             logger.error("unknown action - %s", alet)
             await self.actionFailHandler(cmd)
 
+    @staticmethod
+    def _get_alet_tag(alet) -> str:
+        """
+        Get the running action tag of an alet.
+
+        The tag is the primitive name, or the module name for custom alets. A
+        custom alet with an `id` is tagged `name#id`, so several instances of the
+        same custom behaviour can run at once, e.g. as parallel branches.
+
+        Args:
+            alet: The alet
+
+        Returns:
+            str: The running action tag
+        """
+        cmd, arg = alet[0], alet[1]
+        if cmd != "custom":
+            return cmd
+        if not isinstance(arg, dict):
+            return arg
+        if arg.get("id"):
+            return f"{arg['name']}#{arg['id']}"
+        return arg["name"]
+
+    async def _play_parallel_branch(self, alet) -> bool:
+        """
+        Play a branch alet of a parallel alet and wait for it to complete.
+
+        A branch is complete when its alet has succeeded or failed, including the
+        chained alets it plays on completion. Branches run under the normal
+        running action bookkeeping, so each branch must use a different tag.
+
+        Args:
+            alet: The branch alet
+
+        Returns:
+            bool: True if the branch succeeded, False otherwise
+        """
+        tag = self._get_alet_tag(alet)
+
+        if tag in self.running_actions or tag in self._action_waiters:
+            logger.error("parallel: branch %s is already running, ignoring", tag)
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._action_waiters[tag] = waiter
+        try:
+            await self.play_action_let(alet)
+            if not waiter.done() and tag not in self.running_actions:
+                return False  # rejected without completing
+            return await waiter
+        finally:
+            if self._action_waiters.get(tag) is waiter:
+                del self._action_waiters[tag]
+
+    def _notify_action_waiter(self, action, succeeded: bool):
+        """
+        Resolve the parallel branch waiter of a completed action, if any.
+
+        Args:
+            action: The completed action tag
+            succeeded: Whether the action succeeded
+        """
+        waiter = self._action_waiters.get(action)
+        if waiter is not None and not waiter.done():
+            waiter.set_result(succeeded)
+
+    async def run_custom_behaviour(self, tag: str, custom_obj: CustomBehaviour):
+        """
+        Run a custom behaviour under its deadline.
+
+        The deadline is the `timeout` argument of the custom alet in seconds, or
+        ACTION_TIMEOUT in the knowledge. It covers the whole custom action, including
+        work that completes after `run` returns. When it expires, the custom
+        behaviour's cancel token is cancelled, a pending `run` is cancelled, and the
+        action fails with its `fallback_action`, or else its `failed_action`.
+
+        Args:
+            tag: The running action tag of the custom behaviour
+            custom_obj: The custom behaviour to run
+        """
+        if hookRegistry.custom_start:
+            hookRegistry.emit("custom_start", manager=self, tag=tag, custom=custom_obj)
+        started = time.perf_counter()
+
+        timeout = custom_obj.details.get(
+            "timeout", self.knowledge.get("ACTION_TIMEOUT")
+        )
+        try:
+            if not isinstance(timeout, (int, float)) or timeout <= 0:
+                await custom_obj.run()
+                return
+
+            run_task = asyncio.ensure_future(custom_obj.run())
+            self.running_actions[tag]["_deadline_timer"] = timerManager.call_later(
+                timeout, self._on_action_deadline, tag, custom_obj, run_task
+            )
+            try:
+                await run_task
+            except asyncio.CancelledError:
+                if not custom_obj.cancel_token.cancelled:
+                    raise
+                await self._fail_timed_out_action(tag, custom_obj)
+        finally:
+            if hookRegistry.custom_end:
+                hookRegistry.emit(
+                    "custom_end",
+                    manager=self,
+                    tag=tag,
+                    custom=custom_obj,
+                    elapsed=time.perf_counter() - started,
+                )
+
+    async def _on_action_deadline(
+        self, tag: str, custom_obj: CustomBehaviour, run_task: asyncio.Future
+    ):
+        """
+        Cancel a custom behaviour whose deadline has expired.
+
+        Args:
+            tag: The running action tag of the custom behaviour
+            custom_obj: The custom behaviour
+            run_task: The task running the custom behaviour's `run`
+        """
+        if self.running_actions.get(tag, {}).get("_custom_obj") is not custom_obj:
+            return
+
+        self.running_actions[tag].pop("_deadline_timer", None)
+        logger.error("%s: deadline expired, cancelling", tag)
+        custom_obj.cancel_token.cancel("timeout")
+        if not run_task.done():
+            run_task.cancel()  # failure is routed by run_custom_behaviour
+            return
+        await self._fail_timed_out_action(tag, custom_obj)
+
+    async def _fail_timed_out_action(self, tag: str, custom_obj: CustomBehaviour):
+        """
+        Fail a timed out custom behaviour with its fallback or failed action.
+
+        Args:
+            tag: The running action tag of the custom behaviour
+            custom_obj: The timed out custom behaviour
+        """
+        if self.running_actions.get(tag, {}).get("_custom_obj") is not custom_obj:
+            return
+
+        # a late succeeded()/failed() of the cancelled custom must not chain again
+        custom_obj.on_success = None
+        custom_obj.on_failure = None
+        self.knowledge["ERROR_MESSAGE"] = f"{tag} timed out"
+        await self.actionFailHandler(
+            tag,
+            custom_obj.details.get("fallback_action")
+            or custom_obj.details.get("failed_action"),
+        )
+        self.knowledge["ERROR_MESSAGE"] = ""
+
+    def _clear_action_deadline(self, action):
+        """
+        Cancel the deadline timer of a running action, if any.
+
+        Args:
+            action: The running action tag
+        """
+        timer_id = self.running_actions.get(action, {}).pop("_deadline_timer", None)
+        if timer_id is not None:
+            timerManager.del_timer(timer_id)
+
+    def cancel_running_actions(self, reason: str = ""):
+        """
+        Cancel all running custom behaviours and clear the running actions.
+
+        Args:
+            reason: The cancellation reason passed to the custom behaviours
+        """
+        for beh in self.custom_behaviours.values():
+            beh.cancel_token.cancel(reason)
+        self.clear_running_actions()
+
     async def actionHandler(self, action, data=None):
         """
         Handle the completion of an action.
@@ -1245,6 +1715,8 @@ class ActivityManager:
             self.custom_behaviours[action].fini()
             del self.custom_behaviours[action]
 
+        self._clear_action_deadline(action)
+        self._emit_after_alet(action, True)
         del self.running_actions[action]
         logger.debug(
             "Completed(succeeded) %s, running actions = %s",
@@ -1261,12 +1733,9 @@ class ActivityManager:
         if action in self.chained_actions:
             queued_action = self.chained_actions[action]
             del self.chained_actions[action]
-            await self.play_action_let(queued_action)
+            await self.run_step(self.play_action_let, queued_action)
 
-        if not self.is_busy():
-            logger.debug("Completed action with id - %s", self.current_action_id)
-            self.chained_actions = {}
-            await self.on_action_completed(self.current_action_id)
+        await self.run_step(self._on_action_finished, action, True)
 
     async def actionFailHandler(self, action, data=None):
         """
@@ -1289,6 +1758,8 @@ class ActivityManager:
             self.custom_behaviours[action].fini()
             del self.custom_behaviours[action]
 
+        self._clear_action_deadline(action)
+        self._emit_after_alet(action, False)
         del self.running_actions[action]
         logger.error(
             "Completed(failed) %s, running actions = %s",
@@ -1302,12 +1773,50 @@ class ActivityManager:
 
         # if any custom failure handling, run it
         if data is not None:
-            await self.play_action_let(data)
+            await self.run_nested_steps(self.play_action_let, data)
+
+        await self.run_step(self._on_action_finished, action, False)
+
+    def _emit_after_alet(self, action, succeeded: bool):
+        """
+        Emit the after_alet hook of a finished running action.
+
+        Args:
+            action: The finished action tag
+            succeeded: Whether the action succeeded
+        """
+        if not hookRegistry.after_alet:
+            return
+        started = self.running_actions[action].get("_started")
+        if started is None:  # started before the hook was subscribed
+            return
+        cmd, start_time = started
+        hookRegistry.emit(
+            "after_alet",
+            manager=self,
+            tag=action,
+            cmd=cmd,
+            succeeded=succeeded,
+            elapsed=time.perf_counter() - start_time,
+        )
+
+    async def _on_action_finished(self, action, succeeded: bool):
+        """
+        Complete the current action once an alet and its chained alets have finished.
+
+        Args:
+            action: The finished action tag
+            succeeded: Whether the action succeeded
+        """
+        self._notify_action_waiter(action, succeeded)
 
         if not self.is_busy():
-            logger.error(
-                "Completed(failed) action with id - %s", self.current_action_id
-            )
+            if succeeded:
+                logger.debug("Completed action with id - %s", self.current_action_id)
+            else:
+                logger.error(
+                    "Completed(failed) action with id - %s", self.current_action_id
+                )
             self.chained_actions = {}
             await self.on_action_completed(self.current_action_id)
 
@@ -1327,6 +1836,9 @@ class ActivityManager:
         """
         for beh in self.custom_behaviours.values():
             beh.fini()
+        for action in list(self.running_actions):
+            self._clear_action_deadline(action)
+            self._notify_action_waiter(action, False)
         self.custom_behaviours = {}
         self.running_actions = {}
         self.chained_actions = {}
@@ -1479,9 +1991,19 @@ class ActivityManager:
             method: Method name for the callback
             data: Dictionary containing callback data
         """
-        await self.callbackmessage_manager.process_remote_callback_messages(
-            method=method, message=data
-        )
+        started = time.perf_counter()
+        try:
+            await self.callbackmessage_manager.process_remote_callback_messages(
+                method=method, message=data
+            )
+        finally:
+            if hookRegistry.remote_callback:
+                hookRegistry.emit(
+                    "remote_callback",
+                    manager=self,
+                    method=method,
+                    elapsed=time.perf_counter() - started,
+                )
 
     async def send_message(
         self, status: int = 200, data: Dict | DataStreamHandler = {}, headers: Dict = {}
@@ -1502,31 +2024,29 @@ class ActivityManager:
         context = self.knowledge["CURRENT_TURN_CONTEXT"]
         if not self._agent_mode:
             if isinstance(data, DataStreamHandler):
+                if self.channel is not None:
+                    await self.channel.push_stream(data, activity_id=context)
+                    return
                 headers.update({"X-Accel-Buffering": "no"})
                 self.response = StreamingResponse(
                     data.stream_generator(),
                     headers=headers,
                     media_type="text/event-stream",
                 )
+                self._notify_response_ready()
                 return
 
-            if self._discord_message is None:
-                try:
-                    from discord import (  # pylint: disable=import-outside-toplevel
-                        Message as DiscordMessage,
-                    )
-
-                    self._discord_message = DiscordMessage
-                except ImportError:
-                    logger.error("Unable to import DiscordMessage")
-            if isinstance(context, self._discord_message):
+            # only discord turns pass a discord message as context, and those
+            # have imported discord already
+            discord_message = getattr(sys.modules.get("discord"), "Message", None)
+            if discord_message is not None and isinstance(context, discord_message):
                 # a single discord message cannot be longer than 2000
                 out_text = data["response"]
                 while len(out_text) > 1800:
-                    await context.channel.send(out_text[:1800])
+                    await self._send_discord_text(context, out_text[:1800])
                     await asyncio.sleep(0.01)
                     out_text = out_text[1801:]
-                await context.channel.send(out_text)
+                await self._send_discord_text(context, out_text)
                 return
 
         status_msg = "success"
@@ -1542,7 +2062,27 @@ class ActivityManager:
         if self.knowledge["CURRENT_SESSION_ID"]:
             payload["session_id"] = self.knowledge["CURRENT_SESSION_ID"]
 
-        self.response = write_http_response(status, payload, headers=headers)
+        if self.channel is not None:
+            await self.channel.push_message(status, payload)
+            return
+
+        self._write_response(status, payload, headers)
+
+    async def _send_discord_text(self, context, text: str):
+        """
+        Send a text reply to a Discord message on the Discord client loop.
+
+        Args:
+            context: The Discord message being replied to
+            text: The reply text
+        """
+        loop = self.discord_loop
+        if loop is None or loop is asyncio.get_running_loop():
+            await context.channel.send(text)
+            return
+        await asyncio.wrap_future(
+            asyncio.run_coroutine_threadsafe(context.channel.send(text), loop)
+        )
 
     async def send_raw_message(self, status, payload, headers: Dict = {}):
         """
@@ -1556,7 +2096,114 @@ class ActivityManager:
             headers: HTTP headers
         """
         payload["activity_id"] = self.knowledge["CURRENT_TURN_CONTEXT"]
+        if self.channel is not None:
+            await self.channel.push_message(status, payload)
+            return
+
+        self._write_response(status, payload, headers)
+
+    def _write_response(self, status, payload, headers: Dict):
+        """
+        Encode the HTTP response of the turn and notify that it is ready.
+
+        Args:
+            status: HTTP status code
+            payload: Response payload
+            headers: HTTP headers
+        """
+        started = time.perf_counter()
         self.response = write_http_response(status, payload, headers=headers)
+        if self._turn_timings is not None:
+            self._turn_timings.add("serialize", time.perf_counter() - started)
+        self._notify_response_ready()
+
+    async def defer_delay(self, delay: float) -> bool:
+        """
+        Defer the continuation of a delay alet to a timer.
+
+        The delay is deferred only if its continuation can reach the user after the
+        current turn has ended, i.e. through an attached persistent channel such as
+        a WebSocket, or through ASYNC_CALLBACK_URL in the knowledge. The delay stays
+        a running action until the continuation has been played.
+
+        Args:
+            delay: Delay in seconds
+
+        Returns:
+            bool: True if the continuation has been deferred, False if the caller
+                  has to wait for the delay.
+        """
+        channel = self.channel
+        if channel is None or not channel.persistent:
+            callback_url = self.knowledge.get("ASYNC_CALLBACK_URL")
+            if not callback_url or not CallbackURLChannel.is_allowed(callback_url):
+                return False
+            channel = CallbackURLChannel(callback_url)
+
+        if self.channel is None and self.response is None:
+            await self.send_raw_message(
+                202,
+                {"status": "success", "message": "Response continues asynchronously."},
+            )
+
+        self._delay_timer = timerManager.call_later(
+            delay, self._continue_after_delay, channel
+        )
+        return True
+
+    async def _continue_after_delay(self, channel: MessageChannel):
+        """
+        Play the chained actions of a deferred delay alet.
+
+        Args:
+            channel: The channel that receives the messages of the continuation
+        """
+        self._delay_timer = None
+        if "delay" not in self.running_actions:  # running actions have been cleared
+            return
+
+        attached = self.channel is None
+        if attached:
+            self.attach_channel(channel)
+        try:
+            await self.actionHandler("delay")
+        finally:
+            if attached:
+                self.detach_channel(channel)
+
+    def attach_channel(self, channel: MessageChannel):
+        """
+        Attach an outbound message channel.
+
+        While a channel is attached, every message sent by send_message and
+        send_raw_message is pushed to the channel instead of being kept as the
+        turn response.
+
+        Args:
+            channel: The message channel to attach
+        """
+        self.channel = channel
+        self.knowledge["MODULES"]["MessageChannel"] = channel
+
+    def detach_channel(self, channel: MessageChannel | None = None):
+        """
+        Detach the outbound message channel.
+
+        Args:
+            channel: Only detach if this is the attached channel. Detach any
+                     channel if None.
+        """
+        if channel is not None and self.channel is not channel:
+            return
+        self.channel = None
+        self.knowledge["MODULES"].pop("MessageChannel", None)
+
+    def _notify_response_ready(self):
+        """
+        Signal an early flushing turn that its response is ready to be returned.
+        """
+        if self._response_ready is not None:
+            self._response_ready.set()
 
     async def execute_behaviour(self, behaviour, knowledge={}):
         """
@@ -1581,15 +2228,16 @@ class ActivityManager:
         Get the current response.
 
         Resets the in_user_interaction flag and returns the response.
-        If no response is available, returns a 406 error.
+        If no response is available, returns a 406 error. If the turn was run
+        with phase timings, they are added to the response.
 
         Returns:
             The current response or a 406 error response
         """
         response = None
-        self.in_user_interaction = False
+        self.finish_turn()
         if self.response is None:
-            return JSONResponse(
+            response = JSONResponse(
                 status_code=406,
                 content={
                     "status": "failed",
@@ -1600,8 +2248,21 @@ class ActivityManager:
         else:
             response = self.response
             self.response = None
+
+        if self._turn_timings is not None:
+            response = self._turn_timings.apply(response)
+            self._turn_timings = None
+            self.knowledge["MODULES"].pop("TurnTimings", None)
         return response
 
+    def finish_turn(self):
+        """
+        Mark the end of the current user turn.
+
+        Resets the in_user_interaction flag so that the next turn can start.
+        """
+        self.in_user_interaction = False
+
     def idleTime(self):
         """
         Get the idle time of the ActivityManager.
@@ -1617,6 +2278,11 @@ class ActivityManager:
 
         Cleans up running actions and finalizes message managers.
         """
+        if self._background_turn is not None and not self._background_turn.done():
+            self._background_turn.cancel()
+        if self._delay_timer is not None:
+            timerManager.del_timer(self._delay_timer)
+            self._delay_timer = None
         self.clear_running_actions()
         self.usermessage_manager.fini()
         self.callbackmessage_manager.fini()
@@ -3,13 +3,39 @@ Custom behaviour for dynamically routing and playing selected behaviours.
 
 This module defines the `behaviour_router` class, which allows for the
 dynamic selection and execution of other behaviours based on specified
-criteria, including random selection or selection from a restricted list.
+criteria, including random selection, selection from a restricted list,
+or semantic selection by embedding similarity to example utterances.
 """
 
+import asyncio
+import hashlib
+import os
 import random
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+import numpy as np
+import simplejson as json
+
+from openai import AsyncOpenAI
 from lurawi.custom_behaviour import CustomBehaviour
 from lurawi.utils import logger
 
+# precomputed utterance embedding matrices shared by all router instances,
+# keyed by embedding endpoint, model and utterance set, in least recently used order.
+_utterance_indices: OrderedDict = OrderedDict()
+_utterance_index_builds: Dict[str, asyncio.Task] = {}
+try:
+    _utterance_index_cache_size = max(
+        int(os.environ.get("SemanticIndexCacheSize", 32)), 1
+    )
+except ValueError:
+    _utterance_index_cache_size = 32
+
+# embedding API clients shared by all router instances, keyed by (api_key, base_url),
+# so their connection pools are reused between turns.
+_embedding_clients: Dict[Tuple[str, str | None], AsyncOpenAI] = {}
+
 
 class behaviour_router(CustomBehaviour):
     """!@brief Dynamically routes and plays a selected behaviour.
@@ -20,8 +46,10 @@ class behaviour_router(CustomBehaviour):
 
     Args:
         select (str): Specifies the selection method. Can be "random" to pick
-                      a behaviour randomly, or the exact name of a behaviour
-                      to play. If a knowledge base key, its value is used.
+                      a behaviour randomly, "semantic" to pick the behaviour
+                      whose example utterances are closest to `query`, or
+                      the exact name of a behaviour to play. If a knowledge
+                      base key, its value is used.
         behaviours (list, optional): A list of behaviour names (strings) to
                                      restrict the selection. If provided,
                                      selection will only occur from this list.
@@ -34,6 +62,27 @@ class behaviour_router(CustomBehaviour):
         failed_action (list, optional): An action to execute if the behaviour
                                         fails (e.g., `["play_behaviour", "next"]`).
 
+    Semantic selection args:
+        utterances (dict): A mapping of behaviour name to a list of example
+                           utterances, or a knowledge base key whose value is
+                           such a mapping. The utterances are embedded once
+                           into a normalised matrix shared by all users; the
+                           SemanticIndexCacheSize most recently used matrices
+                           are kept (defaults to 32).
+        query (str, optional): The text to route. Defaults to the "message"
+                               field of the current user data.
+        base_url (str): The base URL of an OpenAI-compatible embedding API.
+        api_key (str): The API key for the embedding API.
+        embedding_model (str): The name of the embedding model.
+        threshold (float, optional): The minimum cosine similarity for a
+                                     match. Defaults to 0.5.
+        fallback (str, optional): The behaviour to play when no utterance
+                                  scores above the threshold, or the best
+                                  match is not an active behaviour. If not
+                                  given, the router fails.
+        score (str, optional): The knowledge base key under which the best
+                               similarity score will be stored.
+
     Example: Randomly select from a restricted list:
     ["custom", { "name": "behaviour_router",
                  "args": {
@@ -44,6 +93,24 @@ class behaviour_router(CustomBehaviour):
                          }
                }
     ]
+
+    Example: Semantically route the user message:
+    ["custom", { "name": "behaviour_router",
+                 "args": {
+                            "select": "semantic",
+                            "utterances": {
+                                "weather": ["what is the weather like", "will it rain today"],
+                                "story": ["tell me a story", "I want to hear a tale"]
+                            },
+                            "base_url": "https://api.openai.com/v1",
+                            "api_key": "OPENAI_API_KEY",
+                            "embedding_model": "text-embedding-3-small",
+                            "threshold": 0.6,
+                            "fallback": "general_chat",
+                            "failed_action": ["play_behaviour", "next"]
+                         }
+               }
+    ]
     """
 
     def __init__(self, kb, details):
@@ -76,6 +143,10 @@ class behaviour_router(CustomBehaviour):
             if isinstance(selection, str) and selection in self.kb:
                 selection = self.kb[selection]
 
+            if selection == "semantic":
+                await self._route_semantically()
+                return
+
             is_restricted = "restricted" in self.details and self.details["restricted"]
 
             if "behaviours" in self.details:
@@ -149,6 +220,217 @@ class behaviour_router(CustomBehaviour):
             )
             await self.failed()
 
+    async def _route_semantically(self):
+        """
+        Routes to the behaviour whose example utterances are most similar to the query.
+
+        The query is embedded with a single embedding call and scored against the
+        precomputed utterance matrix by cosine similarity. The top-1 behaviour is
+        played if its score reaches the threshold and it is an active behaviour,
+        otherwise the fallback behaviour.
+        """
+        utterances = self.parse_simple_input(key="utterances", check_for_type="dict")
+
+        if not utterances or not all(
+            isinstance(v, list) and v for v in utterances.values()
+        ):
+            logger.error(
+                "behaviour_router: 'utterances' expected to be a dict of non-empty lists. Got %s. Aborting",
+                self.details,
+            )
+            await self.failed()
+            return
+
+        query = self.parse_simple_input(key="query", check_for_type="str")
+
+        if query is None:
+            user_data = self.kb.get("USER_DATA")
+            if isinstance(user_data, dict) and isinstance(
+                user_data.get("message"), str
+            ):
+                query = user_data["message"]
+
+        if not query:
+            logger.error("behaviour_router: missing or invalid query(str). Aborting")
+            await self.failed()
+            return
+
+        base_url = self.parse_simple_input(key="base_url", check_for_type="str")
+        api_key = self.parse_simple_input(key="api_key", check_for_type="str")
+        embedding_model = self.parse_simple_input(
+            key="embedding_model", check_for_type="str"
+        )
+
+        if api_key is None or embedding_model is None:
+            logger.error(
+                "behaviour_router: missing or invalid api_key(str) or embedding_model(str). Aborting"
+            )
+            await self.failed()
+            return
+
+        threshold = self.parse_simple_input(
+            key="threshold", check_for_type="(int, float)"
+        )
+
+        if threshold is None or isinstance(threshold, bool):
+            if self.details.get("threshold") is not None:
+                logger.warning(
+                    "behaviour_router: invalid threshold(float) %s, using 0.5",
+                    self.details["threshold"],
+                )
+            threshold = 0.5
+
+        fallback = self.parse_simple_input(key="fallback", check_for_type="str")
+
+        client = _embedding_clients.get((api_key, base_url))
+        if client is None:
+            client = AsyncOpenAI(api_key=api_key, base_url=base_url)
+            _embedding_clients[(api_key, base_url)] = client
+
+        try:
+            labels, matrix = await self._get_utterance_index(
+                client, base_url, embedding_model, utterances
+            )
+            response = await client.embeddings.create(
+                model=embedding_model, input=[query]
+            )
+        except Exception as err:  # pylint: disable=broad-exception-caught
+            logger.error("behaviour_router: unable to embed utterances: %s", err)
+            self.kb["ERROR_MESSAGE"] = str(err)
+            await self.failed()
+            self.kb["ERROR_MESSAGE"] = ""
+            return
+
+        query_vector = _normalise(
+            np.asarray([response.data[0].embedding], dtype=np.float32)
+        )[0]
+        scores = matrix @ query_vector
+        best = int(np.argmax(scores))
+        best_score = float(scores[best])
+
+        score_key = self.details.get("score")
+        if isinstance(score_key, str):
+            self.kb[score_key] = best_score
+
+        logger.debug(
+            "behaviour_router: best match %s with score %.3f", labels[best], best_score
+        )
+        selection = fallback
+        if best_score >= threshold:
+            if self._check_if_exists(labels[best]):
+                selection = labels[best]
+            else:
+                logger.warning(
+                    "behaviour_router: best match %s is not an active behaviour, using fallback %s",
+                    labels[best],
+                    fallback,
+                )
+
+        if not selection or not self._check_if_exists(selection):
+            logger.error(
+                "behaviour_router: no behaviour matched (best score %.3f) and fallback %s is unavailable. Aborting",
+                best_score,
+                fallback,
+            )
+            await self.failed()
+            return
+
+        logger.info(
+            "behaviour_router: play semantically selected behaviour %s", selection
+        )
+        await self.succeeded(action=["play_behaviour", f"{selection}"])
+
+    async def _get_utterance_index(
+        self,
+        client: AsyncOpenAI,
+        base_url: str | None,
+        embedding_model: str,
+        utterances: Dict[str, List[str]],
+    ) -> Tuple[List[str], np.ndarray]:
+        """
+        Returns the normalised utterance embedding matrix, building it on first use.
+
+        Concurrent first turns share a single build so the utterances are only
+        embedded once per process. Only the SemanticIndexCacheSize most recently
+        used matrices are kept, so utterances built from knowledge cannot grow the
+        cache without limit.
+
+        Args:
+            client (AsyncOpenAI): The embedding API client.
+            base_url (str | None): The embedding API base URL, part of the cache key.
+            embedding_model (str): The embedding model name, part of the cache key.
+            utterances (dict): Behaviour name to example utterances mapping.
+
+        Returns:
+            tuple: The behaviour label of each matrix row and the matrix itself.
+        """
+        digest = hashlib.sha1(
+            json.dumps(utterances, sort_keys=True).encode("utf-8")
+        ).hexdigest()
+        index_key = f"{base_url}|{embedding_model}|{digest}"
+
+        index = _utterance_indices.get(index_key)
+        if index is not None:
+            _utterance_indices.move_to_end(index_key)
+            return index
+
+        build = _utterance_index_builds.get(index_key)
+        if build is None:
+            build = asyncio.ensure_future(
+                self._build_utterance_index(client, embedding_model, utterances)
+            )
+            _utterance_index_builds[index_key] = build
+        try:
+            index = await asyncio.shield(build)
+        finally:
+            if build.done():
+                _utterance_index_builds.pop(index_key, None)
+
+        _utterance_indices[index_key] = index
+        while len(_utterance_indices) > _utterance_index_cache_size:
+            _utterance_indices.popitem(last=False)
+        return index
+
+    async def _build_utterance_index(
+        self,
+        client: AsyncOpenAI,
+        embedding_model: str,
+        utterances: Dict[str, List[str]],
+    ) -> Tuple[List[str], np.ndarray]:
+        """
+        Embeds all example utterances in one batch into a normalised matrix.
+
+        Args:
+            client (AsyncOpenAI): The embedding API client.
+            embedding_model (str): The embedding model name.
+            utterances (dict): Behaviour name to example utterances mapping.
+
+        Returns:
+            tuple: The behaviour label of each matrix row and the matrix itself.
+        """
+        labels = []
+        texts = []
+        for behaviour, examples in utterances.items():
+            if not self._check_if_exists(behaviour):
+                logger.warning(
+                    "behaviour_router: utterances given for unknown behaviour %s",
+                    behaviour,
+                )
+            for example in examples:
+                labels.append(behaviour)
+                texts.append(str(example))
+
+        response = await client.embeddings.create(model=embedding_model, input=texts)
+        embeddings = [
+            item.embedding for item in sorted(response.data, key=lambda d: d.index)
+        ]
+        logger.info(
+            "behaviour_router: built semantic index of %d utterances for %d behaviours",
+            len(texts),
+            len(utterances),
+        )
+        return labels, _normalise(np.asarray(embeddings, dtype=np.float32))
+
     def _check_if_exists(self, behaviour: str) -> bool:
         """
         Checks if a given behaviour name exists in the list of active behaviours.
@@ -163,3 +445,18 @@ class behaviour_router(CustomBehaviour):
             if behaviour == beh["name"]:
                 return True
         return False
+
+
+def _normalise(vectors: np.ndarray) -> np.ndarray:
+    """
+    Scales each row vector to unit length so dot products are cosine similarities.
+
+    Args:
+        vectors (np.ndarray): A 2D array of row vectors.
+
+    Returns:
+        np.ndarray: The row-normalised array.
+    """
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
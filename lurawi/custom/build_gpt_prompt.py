@@ -6,7 +6,8 @@ creation of structured prompts by combining system instructions, user queries,
 conversation history, and relevant documents, while managing token limits.
 """
 
-from lurawi.utils import cut_string, calc_token_size, logger
+from lurawi.token_counter import cut_string, calc_token_size
+from lurawi.utils import logger
 from lurawi.custom_behaviour import CustomBehaviour
 
 
@@ -40,6 +41,10 @@ class build_gpt_prompt(CustomBehaviour):
                                     entire constructed prompt. If exceeded,
                                     history and documents will be truncated.
                                     Defaults to -1 (no limit).
+        tokenizer (str, optional): The model or tiktoken encoding name used
+                                   to count tokens, e.g. `gpt-4o` or `o200k_base`.
+                                   Defaults to the TokenizerEncoding environment
+                                   variable, or `cl100k_base`.
         output (str, optional): The knowledge base key under which the final
                                 constructed prompt (as a list of message dictionaries)
                                 will be stored. Defaults to "BUILD_GPT_PROMPT_OUTPUT".
@@ -102,6 +107,8 @@ class build_gpt_prompt(CustomBehaviour):
         if max_tokens is None:
             max_tokens = -1
 
+        tokenizer = self.parse_simple_input(key="tokenizer", check_for_type="str")
+
         system_content = []
         if system_prompt:
             system_content = [{"role": "system", "content": system_prompt}]
@@ -133,22 +140,24 @@ class build_gpt_prompt(CustomBehaviour):
         outmesg = system_content + history + user_content
 
         if max_tokens > 0:
-            mesg_token_size = calc_token_size(str(outmesg))
+            mesg_token_size = calc_token_size(str(outmesg), model=tokenizer)
             while history and mesg_token_size > max_tokens:
                 history = history[2:]  # gradually purge history
                 outmesg = system_content + history + user_content
-                mesg_token_size = calc_token_size(str(outmesg))
+                mesg_token_size = calc_token_size(str(outmesg), model=tokenizer)
 
             if mesg_token_size > max_tokens:
                 if documents:
-                    doc_token_size = calc_token_size(documents)
+                    doc_token_size = calc_token_size(documents, model=tokenizer)
                     doc_token_size -= mesg_token_size - max_tokens
                     logger.warning(
                         "build_gpt_prompt: total prompt token size %d exceeds max allowed token size %d, clipping the search doc.",
                         mesg_token_size,
                         max_tokens,
                     )
-                    clipped_docs = cut_string(s=documents, n_tokens=doc_token_size - 10)
+                    clipped_docs = cut_string(
+                        s=documents, n_tokens=doc_token_size - 10, model=tokenizer
+                    )
                     user_content = [
                         {
                             "role": "user",
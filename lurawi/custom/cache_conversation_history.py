@@ -10,7 +10,8 @@ import re
 import simplejson as json
 
 from lurawi.custom_behaviour import CustomBehaviour
-from lurawi.utils import calc_token_size, logger
+from lurawi.token_counter import calc_token_size
+from lurawi.utils import logger
 
 
 class cache_conversation_history(CustomBehaviour):
@@ -32,6 +33,10 @@ class cache_conversation_history(CustomBehaviour):
         max_tokens (int, optional): The maximum allowed token size for the
                                     entire conversation history. If exceeded,
                                     older entries will be purged. Defaults to -1 (no limit).
+        tokenizer (str, optional): The model or tiktoken encoding name used
+                                   to count tokens, e.g. `gpt-4o` or `o200k_base`.
+                                   Defaults to the TokenizerEncoding environment
+                                   variable, or `cl100k_base`.
 
     Example:
     ["custom", { "name": "cache_conversation_history",
@@ -82,6 +87,8 @@ class cache_conversation_history(CustomBehaviour):
         if max_tokens is None:
             max_tokens = -1
 
+        tokenizer = self.parse_simple_input(key="tokenizer", check_for_type="str")
+
         if user_input and llm_output:
             llm_output = re.sub(
                 r"<think>.*?</think>", "", llm_output
@@ -102,11 +109,11 @@ class cache_conversation_history(CustomBehaviour):
 
         mesg_str = json.dumps(history)
         if max_tokens > 0:
-            mesg_token_size = calc_token_size(mesg_str)
+            mesg_token_size = calc_token_size(mesg_str, model=tokenizer)
             while history and mesg_token_size > max_tokens:
                 history = history[2:]  # gradually purge history
                 mesg_str = json.dumps(history)
-                mesg_token_size = calc_token_size(mesg_str)
+                mesg_token_size = calc_token_size(mesg_str, model=tokenizer)
 
         logger.debug("cache_conversation_history: final history list %s", history)
 
@@ -14,7 +14,9 @@ from chromadb.utils.embedding_functions import OpenAIEmbeddingFunction
 from chromadb import Documents, EmbeddingFunction, Embeddings
 
 from lurawi.custom_behaviour import CustomBehaviour
-from lurawi.utils import logger, cut_string
+from lurawi.executors import run_blocking
+from lurawi.token_counter import cut_string
+from lurawi.utils import logger
 
 
 class LlamaCppEmbeddingFunction(EmbeddingFunction):
@@ -108,8 +110,10 @@ class chromadb_search(CustomBehaviour):
             await self.failed()
             return
 
-        chroma_client = PersistentClient(
-            path=db_directory, settings=Settings(anonymized_telemetry=False)
+        chroma_client = await run_blocking(
+            PersistentClient,
+            path=db_directory,
+            settings=Settings(anonymized_telemetry=False),
         )
         embedding_model = self.parse_simple_input(
             key="embedding_model", check_for_type="str"
@@ -126,15 +130,19 @@ class chromadb_search(CustomBehaviour):
                 logger.error("chromadb_search: missing embedding model file")
                 await self.failed()
                 return
-            embedding_function = LlamaCppEmbeddingFunction(model_path=model_path)
+            embedding_function = await run_blocking(
+                LlamaCppEmbeddingFunction, model_path=model_path
+            )
         else:
             embedding_function = OpenAIEmbeddingFunction(
                 api_base=base_url, api_key=api_key, model_name=embedding_model
             )
 
         try:
-            vector_store = chroma_client.get_collection(
-                name=collection, embedding_function=embedding_function
+            vector_store = await run_blocking(
+                chroma_client.get_collection,
+                name=collection,
+                embedding_function=embedding_function,
             )
         except ValueError:
             logger.error(
@@ -151,8 +159,10 @@ class chromadb_search(CustomBehaviour):
             max_tokens = -1
 
         try:
-            results = vector_store.query(
-                query_texts=[search_text], include=["documents", "metadatas"]
+            results = await run_blocking(
+                vector_store.query,
+                query_texts=[search_text],
+                include=["documents", "metadatas"],
             )
 
             if doc_data:
@@ -9,12 +9,14 @@ import os
 import base64
 
 from io import BytesIO
-from PIL import Image
-from pdf2image import convert_from_path
+from typing import TYPE_CHECKING
 
 from lurawi.custom_behaviour import CustomBehaviour
 from lurawi.utils import logger, is_valid_url, adownload_file_to_temp
 
+if TYPE_CHECKING:
+    from PIL import Image
+
 SUPPORTED_FILE_TYPES = [
     "text",  # include txt, md, csv text file format
     "pdf",
@@ -70,7 +72,7 @@ class file_loader(CustomBehaviour):
             Exception: If there is an error reading the file.
         """
 
-        def _scale_image(image: Image.Image) -> Image.Image:
+        def _scale_image(image: "Image.Image") -> "Image.Image":
             """
             Scales a PIL image to be at or below 1024x1024 while maintaining its aspect ratio.
 
@@ -95,9 +97,12 @@ class file_loader(CustomBehaviour):
                 new_height = max_dim
                 new_width = int(width * (max_dim / height))
 
+            # pylint: disable=import-outside-toplevel
+            from PIL import Image
+
             return image.resize((new_width, new_height), Image.Resampling.LANCZOS)
 
-        def _encode_image_base64(image: Image) -> str:
+        def _encode_image_base64(image: "Image.Image") -> str:
             """
             Encodes a PIL Image object into a base64 string.
 
@@ -155,6 +160,9 @@ class file_loader(CustomBehaviour):
                 with open(file=file_location, mode="r", encoding="utf-8") as f:
                     self.kb[output_location] = [{"type": "text", "text": f"{f.read()}"}]
             elif file_type == "image":
+                # pylint: disable=import-outside-toplevel
+                from PIL import Image
+
                 image = Image.open(file_location)
                 self.kb[output_location] = [
                     {
@@ -165,6 +173,9 @@ class file_loader(CustomBehaviour):
                     }
                 ]
             elif file_type == "pdf":
+                # pylint: disable=import-outside-toplevel
+                from pdf2image import convert_from_path
+
                 images = convert_from_path(file_location, fmt="png")
                 # openai image upload str style
                 openai_image_messages = []
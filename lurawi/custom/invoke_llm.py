@@ -12,6 +12,7 @@ import simplejson as json
 
 from openai import AsyncOpenAI
 from lurawi.custom_behaviour import CustomBehaviour, DataStreamHandler
+from lurawi.load_monitor import loadMonitor
 from lurawi.utils import is_indev, logger, set_dev_stream_handler
 
 
@@ -208,6 +209,8 @@ class invoke_llm(CustomBehaviour):
 
         response = None
         logger.debug(f"final prompt to llm {prompt}")
+        loadMonitor.llm_calls_pending += 1
+        started = time.perf_counter()
         try:
             response = await client.chat.completions.create(
                 model=model,
@@ -217,15 +220,24 @@ class invoke_llm(CustomBehaviour):
                 stream=stream,
             )
         except Exception as err:
+            self.record_llm_call(model, time.perf_counter() - started, False, stream)
             logger.error("invoke_llm: failed to call Agent %s: %s", model, err)
             self.kb["ERROR_MESSAGE"] = str(err)
             await self.failed()
             self.kb["ERROR_MESSAGE"] = ""  # Clear error message after handling
             return
+        finally:
+            loadMonitor.llm_calls_pending -= 1
+
+        elapsed = time.perf_counter() - started
+        self.record_timing("llm-ttft" if stream else "llm", elapsed)
 
         if stream:
-            data_stream = DataStreamHandler(response=response, callback_custom=self)
-            if is_indev():
+            # the call is reported by the stream handler once the stream ends
+            data_stream = DataStreamHandler(
+                response=response, callback_custom=self, model=model, started=started
+            )
+            if is_indev() and "MessageChannel" not in self.kb["MODULES"]:
                 set_dev_stream_handler(data_stream)
                 resp = {
                     "stream_endpoint": f"http://localhost:{os.getenv('PORT', '8081')}/dev/stream"
@@ -234,6 +246,9 @@ class invoke_llm(CustomBehaviour):
             else:
                 await self.message(status=200, data=data_stream)
         else:
+            self.record_llm_call(
+                model, elapsed, True, usage=getattr(response, "usage", None)
+            )
             if "response" in self.details and isinstance(self.details["response"], str):
                 result_variable = self.details["response"]
                 if result_variable in self.kb and isinstance(
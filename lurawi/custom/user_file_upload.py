@@ -13,6 +13,7 @@ import json
 from typing import Dict
 from azure.storage.blob import BlobClient
 from lurawi.custom_behaviour import CustomBehaviour
+from lurawi.executors import run_blocking
 from lurawi.utils import logger
 
 # Supported file types for upload
@@ -213,7 +214,9 @@ class user_file_upload(CustomBehaviour):
             bool: True if the file was successfully downloaded and written, False otherwise.
         """
         try:
-            response = urllib.request.urlopen(attachment.content_url)
+            response = await run_blocking(
+                urllib.request.urlopen, attachment.content_url
+            )
             headers = response.info()
 
             file_content_type = (
@@ -237,7 +240,7 @@ class user_file_upload(CustomBehaviour):
                     return False
                 try:
                     # Assuming JSON content might be a buffer representation
-                    json_data = json.load(response)
+                    json_data = json.loads(await run_blocking(response.read))
                     if (
                         isinstance(json_data, dict)
                         and "type" in json_data
@@ -271,7 +274,7 @@ class user_file_upload(CustomBehaviour):
                         f"Uploaded file '{attachment.name}' has an unsupported content type '{file_content_type}'. Expected types: {', '.join(self.content_types)}."
                     )
                     return False
-                data = response.read()
+                data = await run_blocking(response.read)
 
             if data is None:
                 await self.message(
@@ -316,48 +319,9 @@ class user_file_upload(CustomBehaviour):
                         file_content_type,
                     )
 
-            local_filename = f"{base_filename}{file_extension}"
-            i = 1
-
-            if "AzureWebJobsStorage" in os.environ:
-                connect_string = os.environ["AzureWebJobsStorage"]
-                container_name = "botuploads"  # Standard container for uploads
-                blob_name = local_filename
-
-                blob = BlobClient.from_connection_string(
-                    conn_str=connect_string,
-                    container_name=container_name,
-                    blob_name=blob_name,
-                )
-                while blob.exists():
-                    local_filename = f"{base_filename}-{i}{file_extension}"
-                    blob_name = local_filename
-                    blob = BlobClient.from_connection_string(
-                        conn_str=connect_string,
-                        container_name=container_name,
-                        blob_name=blob_name,
-                    )
-                    i += 1
-                blob.upload_blob(
-                    data, overwrite=True
-                )  # Overwrite if it's the same name after conflict resolution
-                saved_path = f"azureblob://{container_name}/{blob_name}"
-            else:
-                # Save locally
-                upload_dir = os.path.join(
-                    os.getcwd(), "uploads"
-                )  # Create an 'uploads' directory
-                os.makedirs(upload_dir, exist_ok=True)  # Ensure directory exists
-
-                local_file_path = os.path.join(upload_dir, local_filename)
-                while os.path.exists(local_file_path):
-                    local_filename = f"{base_filename}-{i}{file_extension}"
-                    local_file_path = os.path.join(upload_dir, local_filename)
-                    i += 1
-
-                with open(local_file_path, "wb") as out_file:
-                    out_file.write(data)
-                saved_path = local_file_path
+            saved_path = await run_blocking(
+                self._write_file, base_filename, file_extension, data
+            )
 
         except Exception as e:
             logger.error(
@@ -374,3 +338,62 @@ class user_file_upload(CustomBehaviour):
         self.kb[self.data_key] = saved_path
         logger.info("user_file_upload: File saved to: %s", saved_path)
         return True
+
+    @staticmethod
+    def _write_file(base_filename: str, file_extension: str, data: bytes) -> str:
+        """
+        Saves the uploaded data under a file name that is not in use yet.
+
+        The storage SDK and file system calls block, so this runs on the I/O executor.
+
+        Args:
+            base_filename (str): The file name without extension.
+            file_extension (str): The file extension, including the dot.
+            data (bytes): The file content.
+
+        Returns:
+            str: The path of the saved file.
+        """
+        local_filename = f"{base_filename}{file_extension}"
+        i = 1
+
+        if "AzureWebJobsStorage" in os.environ:
+            connect_string = os.environ["AzureWebJobsStorage"]
+            container_name = "botuploads"  # Standard container for uploads
+            blob_name = local_filename
+
+            blob = BlobClient.from_connection_string(
+                conn_str=connect_string,
+                container_name=container_name,
+                blob_name=blob_name,
+            )
+            while blob.exists():
+                local_filename = f"{base_filename}-{i}{file_extension}"
+                blob_name = local_filename
+                blob = BlobClient.from_connection_string(
+                    conn_str=connect_string,
+                    container_name=container_name,
+                    blob_name=blob_name,
+                )
+                i += 1
+            blob.upload_blob(
+                data, overwrite=True
+            )  # Overwrite if it's the same name after conflict resolution
+            saved_path = f"azureblob://{container_name}/{blob_name}"
+        else:
+            # Save locally
+            upload_dir = os.path.join(
+                os.getcwd(), "uploads"
+            )  # Create an 'uploads' directory
+            os.makedirs(upload_dir, exist_ok=True)  # Ensure directory exists
+
+            local_file_path = os.path.join(upload_dir, local_filename)
+            while os.path.exists(local_file_path):
+                local_filename = f"{base_filename}-{i}{file_extension}"
+                local_file_path = os.path.join(upload_dir, local_filename)
+                i += 1
+
+            with open(local_file_path, "wb") as out_file:
+                out_file.write(data)
+            saved_path = local_file_path
+        return saved_path
@@ -10,20 +10,84 @@ The module enables behaviours to:
 - Register for and receive remote callback message updates
 - Handle suspension and restoration states
 - Log results and manage success/failure callbacks
+- Observe cooperative cancellation when their deadline expires
+- Run CPU-bound work in a worker process instead of on the event loop
 - Clean up resources when no longer needed
 
 Custom behaviours should inherit from the CustomBehaviour class and override
 the run() method to implement their specific logic.
 """
 
-from time import time
-from typing import List, Optional, Callable, Awaitable, Any, AsyncIterable
+from time import perf_counter, time
+from typing import Dict, List, Optional, Callable, Awaitable, Any, AsyncIterable
 
 from lurawi.callbackmsg_manager import RemoteCallbackMessageListener
+from lurawi.executors import cpuExecutor
+from lurawi.hooks import hookRegistry
+from lurawi.load_monitor import loadMonitor
 from lurawi.usermsg_manager import UserMessageListener
 from lurawi.utils import logger, check_type
 
 
+class CancellationToken:
+    """
+    Cooperative cancellation token of a running custom behaviour.
+
+    The token is cancelled when the custom behaviour's deadline expires or the
+    turn it runs in times out. Custom behaviours that continue working after
+    `run` returns, e.g. on a stream or a callback, should check `cancelled`
+    and stop without calling `succeeded` or `failed`.
+    """
+
+    def __init__(self):
+        """
+        Initialize a new, not cancelled CancellationToken.
+        """
+        self._cancelled = False
+        self._callbacks: List[Callable[[str], Any]] = []
+        self.reason = ""
+
+    @property
+    def cancelled(self) -> bool:
+        """
+        Check if the token has been cancelled.
+
+        Returns:
+            bool: True if cancelled, False otherwise
+        """
+        return self._cancelled
+
+    def add_callback(self, callback: Callable[[str], Any]):
+        """
+        Register a callback called with the cancellation reason on cancellation.
+
+        Args:
+            callback (Callable[[str], Any]): The callback to register
+        """
+        if self._cancelled:
+            callback(self.reason)
+        else:
+            self._callbacks.append(callback)
+
+    def cancel(self, reason: str = ""):
+        """
+        Cancel the token and notify registered callbacks.
+
+        Args:
+            reason (str, optional): The reason of the cancellation
+        """
+        if self._cancelled:
+            return
+        self._cancelled = True
+        self.reason = reason
+        for callback in self._callbacks:
+            try:
+                callback(reason)
+            except Exception as err:  # pylint: disable=broad-exception-caught
+                logger.error("cancellation callback failed: %s", err)
+        self._callbacks = []
+
+
 class CustomBehaviour(UserMessageListener, RemoteCallbackMessageListener):
     """
     Base class for implementing custom behaviours in the Lurawi system.
@@ -31,11 +95,19 @@ class CustomBehaviour(UserMessageListener, RemoteCallbackMessageListener):
     This class provides functionality for handling user messages and remote callback messages,
     managing suspension states, and handling success/failure callbacks.
 
+    A custom behaviour doing CPU-heavy work sets `cpu_bound` and implements the
+    static `process` method instead of `run`. `process` runs in a worker process
+    with the custom action arguments and the knowledge entries named in
+    `knowledge_inputs`, and the dict it returns is merged into the knowledge.
+
     Inherits from:
         UserMessageListener: For receiving user message updates
         RemoteCallbackMessageListener: For receiving remote callback message updates
     """
 
+    cpu_bound = False
+    knowledge_inputs: List[str] = []
+
     def __init__(self, kb: dict = {}, details: dict = {}):
         """
         Initialize a new CustomBehaviour instance.
@@ -54,6 +126,9 @@ class CustomBehaviour(UserMessageListener, RemoteCallbackMessageListener):
         self._registered_for_callback_message = False
         self._is_suspendable = False
         self._is_suspended = False
+        self.cancel_token = CancellationToken()
+        # running action tag, set by the activity manager for custom alets with an id
+        self.action_tag: str | None = None
 
         if "MESG_FUNC" in kb and callable(kb["MESG_FUNC"]):
             self.message = kb["MESG_FUNC"]
@@ -65,11 +140,72 @@ class CustomBehaviour(UserMessageListener, RemoteCallbackMessageListener):
         Main execution method for the behaviour.
 
         This method should be overridden by subclasses to implement
-        the specific behaviour logic.
+        the specific behaviour logic. For a `cpu_bound` behaviour, it runs
+        `process` in a worker process.
+
+        Returns:
+            None
+        """
+        if self.cpu_bound:
+            await self.run_process()
+
+    @staticmethod
+    def process(details: Dict, inputs: Dict) -> Dict:
+        """
+        CPU-bound work of a `cpu_bound` behaviour, run in a worker process.
+
+        The function runs in another process, so it has no access to the knowledge
+        base or the behaviour instance, and its arguments and result are pickled.
+
+        Args:
+            details (Dict): The arguments of the custom action
+            inputs (Dict): The knowledge inputs returned by `get_process_inputs`
+
+        Returns:
+            Dict: Knowledge entries to update with the result
+        """
+        return {}
+
+    def get_process_inputs(self) -> Dict:
+        """
+        Collect the knowledge inputs passed to `process`.
+
+        By default these are the knowledge entries named in `knowledge_inputs`.
+
+        Returns:
+            Dict: The knowledge inputs
+        """
+        return {key: self.kb[key] for key in self.knowledge_inputs if key in self.kb}
+
+    async def run_process(self):
+        """
+        Run `process` in a worker process and complete the behaviour with its result.
+
+        The returned knowledge outputs are merged into the knowledge base before the
+        behaviour succeeds. If `process` raises or the executor is full, the
+        behaviour fails with ERROR_MESSAGE set to the error.
 
         Returns:
             None
         """
+        try:
+            if type(self).process is CustomBehaviour.process:
+                raise TypeError("cpu_bound behaviour does not define process")
+            outputs = await cpuExecutor.run_custom(
+                type(self), self.details, self.get_process_inputs()
+            )
+        except Exception as err:  # pylint: disable=broad-exception-caught
+            logger.error("%s: process failed: %s", self.__class__.__name__, err)
+            self.kb["ERROR_MESSAGE"] = str(err)
+            await self.failed()
+            self.kb["ERROR_MESSAGE"] = ""
+            return
+
+        if self.cancel_token.cancelled:
+            return
+        if isinstance(outputs, dict):
+            self.kb.update(outputs)
+        await self.succeeded()
 
     def parse_simple_input(self, key: str, check_for_type: str, env_name: str = ""):
         """
@@ -218,7 +354,7 @@ class CustomBehaviour(UserMessageListener, RemoteCallbackMessageListener):
         """
         if self.on_success and callable(self.on_success):
             await self.on_success(
-                self.__class__.__name__,
+                self.action_tag or self.__class__.__name__,
                 action if action else self.details.get("success_action"),
             )
 
@@ -237,7 +373,7 @@ class CustomBehaviour(UserMessageListener, RemoteCallbackMessageListener):
         """
         if self.on_failure and callable(self.on_failure):
             await self.on_failure(
-                self.__class__.__name__,
+                self.action_tag or self.__class__.__name__,
                 action if action else self.details.get("failed_action"),
             )
 
@@ -252,6 +388,56 @@ class CustomBehaviour(UserMessageListener, RemoteCallbackMessageListener):
         """
         logger.warning("message dispatch is not implemented")
 
+    def record_timing(self, name: str, seconds: float):
+        """
+        Add time to a phase of the Server-Timing breakdown of the current turn.
+
+        Does nothing unless the turn is timed, see ServerTimingEnabled.
+
+        Args:
+            name (str): The phase name, e.g. `llm`.
+            seconds (float): The time spent in the phase.
+
+        Returns:
+            None
+        """
+        timings = self.kb.get("MODULES", {}).get("TurnTimings")
+        if timings is not None:
+            timings.add(name, seconds)
+
+    def record_llm_call(
+        self,
+        model: str,
+        elapsed: float,
+        succeeded: bool,
+        stream: bool = False,
+        usage: Any = None,
+    ):
+        """
+        Report a finished LLM call to the llm_call instrumentation hook.
+
+        Args:
+            model (str): The model name
+            elapsed (float): The call latency in seconds
+            succeeded (bool): Whether the call succeeded
+            stream (bool): Whether the response was streamed
+            usage (Any): The token usage reported by the LLM server, if any
+
+        Returns:
+            None
+        """
+        if hookRegistry.llm_call:
+            hookRegistry.emit(
+                "llm_call",
+                custom=self,
+                model=model,
+                stream=stream,
+                succeeded=succeeded,
+                elapsed=elapsed,
+                prompt_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+                completion_tokens=getattr(usage, "completion_tokens", 0) or 0,
+            )
+
     def log_result(self, data):
         """
         Log a result to the user inputs cache.
@@ -266,11 +452,9 @@ class CustomBehaviour(UserMessageListener, RemoteCallbackMessageListener):
             None
         """
         if "USER_INPUTS_CACHE" in self.kb:
-            self.kb["__MUTEX__"].acquire()
             if isinstance(data, str):
                 data = data.replace(",", "")
             self.kb["USER_INPUTS_CACHE"].append((data, time()))
-            self.kb["__MUTEX__"].release()
 
     def is_suspendable(self):
         """
@@ -397,15 +581,24 @@ class DataStreamHandler:
     """
 
     def __init__(
-        self, response, callback_custom: Optional[CustomBehaviour] = None
+        self,
+        response,
+        callback_custom: Optional[CustomBehaviour] = None,
+        model: str = "",
+        started: Optional[float] = None,
     ) -> None:
         """Initialize a new DataStreamHandler.
 
         Args:
             response: The streaming response object from the language model
+            callback_custom: The custom behaviour that made the call
+            model: The model name, to report the call once the stream ends
+            started: The perf_counter time the call was made
         """
         self._response = response
         self._callback_custom = callback_custom
+        self._model = model
+        self._started = started
 
     async def stream_generator(self) -> AsyncIterable[str]:
         """Generate formatted SSE data from streaming response.
@@ -413,18 +606,47 @@ class DataStreamHandler:
         Yields:
             str: Formatted SSE data chunks with HTML line breaks
         """
+        async for content in self.content_generator():
+            content = content.replace("\n", "<br/>")
+            yield f"data: {content}\n\n"
+
+    async def content_generator(self) -> AsyncIterable[str]:
+        """Generate the raw content chunks of the streaming response.
+
+        The complete content is stored in the knowledge of the callback custom
+        behaviour and its success action is invoked once the stream ends.
+
+        Yields:
+            str: Content chunks as received from the language model
+        """
         total_content = ""
+        usage = None
+        loadMonitor.llm_calls_pending += 1
         try:
             async for chunk in self._response:
+                if self._is_cancelled():
+                    return
+                usage = getattr(chunk, "usage", None) or usage
+                if not chunk.choices:
+                    continue
                 content = chunk.choices[0].delta.content or ""
                 if content:
-                    content = content.replace("\n", "<br/>")
                     total_content += content
-                    yield f"data: {content}\n\n"
+                    yield content
         except Exception as _:  # llamacpp server gives error at the end
             pass
-
-        if self._callback_custom:
+        finally:
+            loadMonitor.llm_calls_pending -= 1
+            if self._callback_custom and self._started is not None:
+                self._callback_custom.record_llm_call(
+                    self._model,
+                    perf_counter() - self._started,
+                    True,
+                    stream=True,
+                    usage=usage,
+                )
+
+        if self._callback_custom and not self._is_cancelled():
             custom_obj = self._callback_custom
             if "response" in custom_obj.details and isinstance(
                 custom_obj.details["response"], str
@@ -439,3 +661,14 @@ class DataStreamHandler:
             else:
                 custom_obj.kb["LLM_RESPONSE"] = total_content
             await custom_obj.succeeded()
+
+    def _is_cancelled(self) -> bool:
+        """Check if the callback custom behaviour has been cancelled.
+
+        Returns:
+            bool: True if the stream should stop
+        """
+        return (
+            self._callback_custom is not None
+            and self._callback_custom.cancel_token.cancelled
+        )
@@ -0,0 +1,271 @@
+"""
+Custom Behaviour Registry Module for the Lurawi System.
+
+This module resolves the custom behaviour classes used by `custom` action elements.
+A custom behaviour named `name` is the class `name` defined in the module
+`lurawi.custom.name`, either loaded from `LURAWI_WORKSPACE/custom/name.py` or
+imported from the installed package.
+
+Classes are resolved once, when the workflow engine loads behaviours (on the I/O
+executor, as imports block) or on first use, so playing a custom action is a
+dictionary lookup. In development mode, the source file of a resolved module is
+checked for changes at most once every CUSTOM_RELOAD_CHECK_INTERVAL seconds, and the
+module is only reloaded when its modification time has changed.
+
+The module creates a global CustomRegistry instance (customRegistry) that can be
+imported and used throughout the application.
+"""
+
+import importlib
+import importlib.util
+import os
+import sys
+import time
+from types import ModuleType
+from typing import Any, Dict
+
+from lurawi.custom_behaviour import CustomBehaviour
+from lurawi.utils import is_indev, logger
+
+CUSTOM_MODULE_PREFIX = "lurawi.custom."
+CUSTOM_RELOAD_CHECK_INTERVAL = 1.0
+
+
+class CustomEntry:
+    """
+    A resolved custom behaviour class and the module it was loaded from.
+    """
+
+    __slots__ = ("name", "module", "cls", "path", "from_workspace", "mtime", "checked")
+
+    def __init__(self, name: str, module: ModuleType, cls: type, from_workspace: bool):
+        """
+        Initializes a new CustomEntry.
+
+        Args:
+            name (str): The custom behaviour name.
+            module (ModuleType): The module defining the custom behaviour.
+            cls (type): The custom behaviour class.
+            from_workspace (bool): Whether the module was loaded from the workspace.
+        """
+        self.name = name
+        self.module = module
+        self.cls = cls
+        self.path = getattr(module, "__file__", None)
+        self.from_workspace = from_workspace
+        self.mtime = CustomRegistry.get_mtime(self.path)
+        self.checked = time.monotonic()
+
+
+class CustomRegistry:
+    """
+    Registry of resolved custom behaviour classes keyed by custom behaviour name.
+    """
+
+    def __init__(self):
+        """
+        Initializes a new CustomRegistry.
+        """
+        self._entries: Dict[str, CustomEntry] = {}
+        self._preloaded = None
+
+    @staticmethod
+    def get_mtime(path: str | None) -> float | None:
+        """
+        Get the modification time of a module source file.
+
+        Args:
+            path (str | None): The module source file.
+
+        Returns:
+            float | None: The modification time, or None if it is not available.
+        """
+        if not path:
+            return None
+        try:
+            return os.stat(path).st_mtime
+        except OSError:
+            return None
+
+    def resolve(self, name: str, workspace: str | None = None) -> type | None:
+        """
+        Get the class of a custom behaviour, loading its module on first use.
+
+        Args:
+            name (str): The custom behaviour name.
+            workspace (str | None): The LURAWI_WORKSPACE directory, if any.
+
+        Returns:
+            type | None: The custom behaviour class, or None if it cannot be loaded.
+        """
+        entry = self._entries.get(name)
+        if entry is None:
+            entry = self._load(name, workspace)
+            if entry is None:
+                return None
+            self._entries[name] = entry
+        elif is_indev():
+            self._reload_if_changed(entry)
+        return entry.cls
+
+    def preload(self, behaviours: Dict, workspace: str | None = None):
+        """
+        Resolve the custom behaviours used by a behaviours definition.
+
+        Args:
+            behaviours (Dict): The behaviours definition.
+            workspace (str | None): The LURAWI_WORKSPACE directory, if any.
+        """
+        if behaviours is self._preloaded:
+            return
+        self._preloaded = behaviours
+
+        names = set()
+        self._find_custom_names(behaviours.get("behaviours", []), names)
+        for name in names:
+            if name not in self._entries:
+                self.resolve(name, workspace)
+        logger.debug("custom registry: preloaded %s", sorted(names))
+
+    def clear(self):
+        """
+        Drop all resolved classes, e.g. after custom modules have been replaced.
+        """
+        self._entries = {}
+        self._preloaded = None
+
+    def _find_custom_names(self, node: Any, names: set):
+        """
+        Collect the names of custom behaviours from `custom` action elements.
+
+        Action elements are flat lists of command, argument pairs, which may hold
+        further action elements in their arguments (e.g. `success_action`).
+
+        Args:
+            node (Any): Part of a behaviours definition.
+            names (set): The collected custom behaviour names.
+        """
+        if isinstance(node, dict):
+            for value in node.values():
+                self._find_custom_names(value, names)
+        elif isinstance(node, list):
+            if node and isinstance(node[0], str):
+                for index in range(0, len(node) - 1, 2):
+                    if node[index] != "custom":
+                        continue
+                    arg = node[index + 1]
+                    name = arg.get("name") if isinstance(arg, dict) else arg
+                    if isinstance(name, str):
+                        names.add(name)
+            for value in node:
+                self._find_custom_names(value, names)
+
+    def _load(self, name: str, workspace: str | None) -> CustomEntry | None:
+        """
+        Load the module of a custom behaviour and get its class.
+
+        Args:
+            name (str): The custom behaviour name.
+            workspace (str | None): The LURAWI_WORKSPACE directory, if any.
+
+        Returns:
+            CustomEntry | None: The resolved class, or None if it cannot be loaded.
+        """
+        full_module_name = f"{CUSTOM_MODULE_PREFIX}{name}"
+        module = sys.modules.get(full_module_name)
+        from_workspace = False
+        try:
+            if module is None and workspace:
+                module_path = os.path.join(workspace, "custom", f"{name}.py")
+                if os.path.exists(module_path):
+                    module = self._exec_module_file(name, module_path)
+                    from_workspace = True
+            if module is None:
+                module = importlib.import_module(full_module_name)
+        except Exception as err:
+            logger.error("Failed to load custom module %s: %s", name, err)
+            return None
+
+        cls = self._get_class(name, module)
+        if cls is None:
+            return None
+        return CustomEntry(name, module, cls, from_workspace)
+
+    def _reload_if_changed(self, entry: CustomEntry):
+        """
+        Reload the module of a custom behaviour if its source file has changed.
+
+        A module that fails to reload keeps its previous class until it is changed
+        again.
+
+        Args:
+            entry (CustomEntry): The resolved custom behaviour.
+        """
+        now = time.monotonic()
+        if now - entry.checked < CUSTOM_RELOAD_CHECK_INTERVAL:
+            return
+        entry.checked = now
+
+        mtime = self.get_mtime(entry.path)
+        if mtime is None or mtime == entry.mtime:
+            return
+        entry.mtime = mtime
+
+        logger.info("custom registry: reloading changed module %s", entry.name)
+        try:
+            if entry.from_workspace:
+                module = self._exec_module_file(entry.name, entry.path)
+            else:
+                module = importlib.reload(entry.module)
+        except Exception as err:
+            logger.error("Failed to reload custom module %s: %s", entry.name, err)
+            return
+
+        cls = self._get_class(entry.name, module)
+        if cls is not None:
+            entry.module = module
+            entry.cls = cls
+
+    @staticmethod
+    def _exec_module_file(name: str, module_path: str) -> ModuleType:
+        """
+        Load a custom module from a source file and register it in sys.modules.
+
+        Args:
+            name (str): The custom behaviour name.
+            module_path (str): The module source file.
+
+        Returns:
+            ModuleType: The loaded module.
+        """
+        spec = importlib.util.spec_from_file_location(name, module_path)
+        if spec is None or spec.loader is None:
+            raise ImportError(f"cannot find spec for module {name} at {module_path}")
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        sys.modules[f"{CUSTOM_MODULE_PREFIX}{name}"] = module
+        return module
+
+    @staticmethod
+    def _get_class(name: str, module: ModuleType) -> type | None:
+        """
+        Get the custom behaviour class of a module.
+
+        Args:
+            name (str): The custom behaviour name.
+            module (ModuleType): The module defining the custom behaviour.
+
+        Returns:
+            type | None: The class, or None if it is not a CustomBehaviour.
+        """
+        cls = getattr(module, name, None)
+        if not isinstance(cls, type) or not issubclass(cls, CustomBehaviour):
+            logger.error(
+                "Custom script has to be an instance of CustomBehaviour. Ignoring %s",
+                name,
+            )
+            return None
+        return cls
+
+
+customRegistry = CustomRegistry()
@@ -0,0 +1,321 @@
+"""
+Executor Module for the Lurawi System.
+
+This module provides the shared executors used to keep blocking work off the main
+event loop, which serves the turns of all users.
+
+The module includes:
+- CpuExecutor: Runs CPU-bound functions, such as the `process` function of custom
+  behaviours declared `cpu_bound`, in a managed pool of worker processes with a
+  bounded number of queued tasks
+- IOExecutor: Runs blocking I/O calls, such as synchronous storage SDK and HTTP
+  clients, in a shared pool of threads
+- ExecutorQueueFullError: Raised when a task is submitted to a full executor
+- run_blocking: Awaits a blocking call on the shared I/O executor
+
+The module creates a global CpuExecutor instance (cpuExecutor). The size of its
+process pool is set by the CpuWorkerProcesses environment variable (defaults to the
+number of CPUs), and the number of tasks that may wait for a worker by the
+CpuTaskQueueSize environment variable (defaults to 4 tasks per worker).
+
+It also creates a global IOExecutor instance (ioExecutor), sized by the
+IOWorkerThreads environment variable (defaults to the number of CPUs + 4, at most
+32). The workflow engine installs it as the default executor of the main loop, so
+asyncio.to_thread and run_in_executor(None, ...) share the same threads.
+"""
+
+import asyncio
+import functools
+import importlib.util
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from types import ModuleType
+from typing import Any, Callable, Dict, Tuple
+
+from lurawi.utils import logger
+
+
+def get_env_int(name: str, default: int) -> int:
+    """
+    Get a positive integer setting from an environment variable.
+
+    Args:
+        name (str): The environment variable name.
+        default (int): Returned if the variable is not set or invalid.
+
+    Returns:
+        int: The setting value.
+    """
+    try:
+        value = int(os.environ.get(name, default))
+    except ValueError:
+        logger.warning("invalid %s, using default %d", name, default)
+        return default
+    return value if value > 0 else default
+
+
+class ExecutorQueueFullError(RuntimeError):
+    """
+    Raised when an executor has no room left for another task.
+    """
+
+
+# custom modules loaded by a worker process, keyed by module file
+_worker_modules: Dict[str, Tuple[float | None, ModuleType]] = {}
+
+
+def run_custom_process(
+    module_path: str, mtime: float | None, class_name: str, details: Dict, inputs: Dict
+) -> Dict:
+    """
+    Run the `process` function of a custom behaviour inside a worker process.
+
+    The custom module is loaded from its file once per worker, and loaded again if
+    the file has changed since, so workspace custom modules that cannot be
+    imported by name work the same as packaged ones.
+
+    Args:
+        module_path (str): The custom module file.
+        mtime (float | None): The modification time of the module file.
+        class_name (str): The custom behaviour class name.
+        details (Dict): The arguments of the custom action.
+        inputs (Dict): The knowledge inputs of the custom behaviour.
+
+    Returns:
+        Dict: The knowledge outputs returned by `process`.
+    """
+    cached = _worker_modules.get(module_path)
+    if cached is None or cached[0] != mtime:
+        spec = importlib.util.spec_from_file_location(
+            f"lurawi_worker.{class_name}", module_path
+        )
+        if spec is None or spec.loader is None:
+            raise ImportError(f"cannot find spec for module at {module_path}")
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        cached = (mtime, module)
+        _worker_modules[module_path] = cached
+    return getattr(cached[1], class_name).process(details, inputs)
+
+
+class CpuExecutor:
+    """
+    Runs CPU-bound functions in a pool of worker processes.
+
+    The pool is created on first use. Functions and their arguments are pickled to
+    the workers, so they must be module level functions taking and returning plain
+    data. Tasks beyond the number of workers wait in a bounded queue; once it is
+    full, further tasks are rejected with ExecutorQueueFullError rather than
+    piling up behind a saturated pool.
+
+    Workers are started with the forkserver method (spawn where it is not
+    available), so they do not inherit a fork of the server process with its
+    event loop, threads and sockets. A task counts as pending until its worker
+    has finished with it, even if the coroutine awaiting it was cancelled.
+    """
+
+    def __init__(self, max_workers: int = 0, max_queued: int = 0):
+        """
+        Initializes a new CpuExecutor.
+
+        Args:
+            max_workers (int): Number of worker processes, 0 to use the
+                               CpuWorkerProcesses setting.
+            max_queued (int): Number of tasks that may wait for a worker, 0 to
+                              use the CpuTaskQueueSize setting.
+        """
+        self.max_workers = max_workers or get_env_int(
+            "CpuWorkerProcesses", os.cpu_count() or 1
+        )
+        self.max_queued = max_queued or get_env_int(
+            "CpuTaskQueueSize", self.max_workers * 4
+        )
+        self._pool: ProcessPoolExecutor | None = None
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+
+    @property
+    def pending(self) -> int:
+        """
+        Returns:
+            int: The number of running and queued tasks.
+        """
+        return self._pending
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        """
+        Get the process pool, creating it on first use.
+
+        Returns:
+            ProcessPoolExecutor: The process pool.
+        """
+        if self._pool is None:
+            logger.info("CpuExecutor: starting %d worker processes", self.max_workers)
+            start_method = (
+                "forkserver"
+                if "forkserver" in multiprocessing.get_all_start_methods()
+                else "spawn"
+            )
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context(start_method),
+            )
+        return self._pool
+
+    def _task_done(self, _future: Future):
+        """
+        Release the pending slot of a task once its worker has finished with it.
+
+        Called from the pool's management thread.
+
+        Args:
+            _future (Future): The future of the finished task.
+        """
+        with self._pending_lock:
+            self._pending -= 1
+
+    async def run(self, func: Callable, *args) -> Any:
+        """
+        Run a function in a worker process and wait for its result.
+
+        Args:
+            func (Callable): The module level function to run.
+            *args: The arguments of the function.
+
+        Returns:
+            Any: The result of the function.
+
+        Raises:
+            ExecutorQueueFullError: If the queue of waiting tasks is full.
+        """
+        if self._pending >= self.max_workers + self.max_queued:
+            raise ExecutorQueueFullError(
+                f"cpu executor is full, {self._pending} tasks pending"
+            )
+
+        try:
+            future = self._get_pool().submit(func, *args)
+            with self._pending_lock:
+                self._pending += 1
+            future.add_done_callback(self._task_done)
+            return await asyncio.wrap_future(future)
+        except BrokenProcessPool:
+            logger.error("CpuExecutor: a worker process died, restarting the pool")
+            self.shutdown()
+            raise
+
+    async def run_custom(self, cls: type, details: Dict, inputs: Dict) -> Dict:
+        """
+        Run the `process` function of a custom behaviour class in a worker process.
+
+        Args:
+            cls (type): The custom behaviour class.
+            details (Dict): The arguments of the custom action.
+            inputs (Dict): The knowledge inputs of the custom behaviour.
+
+        Returns:
+            Dict: The knowledge outputs returned by `process`.
+        """
+        # workspace modules are not registered under their own name, so locate
+        # the module file from the code of process
+        module_path = cls.process.__code__.co_filename
+        try:
+            mtime = os.stat(module_path).st_mtime
+        except OSError:
+            mtime = None
+        return await self.run(
+            run_custom_process, module_path, mtime, cls.__name__, details, inputs
+        )
+
+    def shutdown(self):
+        """
+        Shut down the process pool; it is restarted on next use.
+        """
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+cpuExecutor = CpuExecutor()
+
+
+class IOExecutor:
+    """
+    Runs blocking I/O calls in a shared pool of threads.
+
+    Unlike CPU-bound work, blocking I/O releases the GIL while waiting, so threads
+    let the calls overlap without stalling the event loop.
+    """
+
+    def __init__(self, max_workers: int = 0):
+        """
+        Initializes a new IOExecutor.
+
+        Args:
+            max_workers (int): Number of threads, 0 to use the IOWorkerThreads
+                               setting.
+        """
+        self.max_workers = max_workers or get_env_int(
+            "IOWorkerThreads", min(32, (os.cpu_count() or 1) + 4)
+        )
+        self._pool: ThreadPoolExecutor | None = None
+
+    @property
+    def pool(self) -> ThreadPoolExecutor:
+        """
+        The thread pool, created on first use.
+
+        Returns:
+            ThreadPoolExecutor: The thread pool.
+        """
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="lurawi-io"
+            )
+        return self._pool
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        """
+        Run a blocking call in a thread and wait for its result.
+
+        Args:
+            func (Callable): The blocking function to call.
+            *args: The positional arguments of the call.
+            **kwargs: The keyword arguments of the call.
+
+        Returns:
+            Any: The result of the call.
+        """
+        if kwargs:
+            func = functools.partial(func, *args, **kwargs)
+            args = ()
+        return await asyncio.get_running_loop().run_in_executor(self.pool, func, *args)
+
+    def shutdown(self):
+        """
+        Shut down the thread pool without waiting for running calls.
+        """
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+ioExecutor = IOExecutor()
+
+
+async def run_blocking(func: Callable, *args, **kwargs) -> Any:
+    """
+    Run a blocking call on the shared I/O executor and wait for its result.
+
+    Args:
+        func (Callable): The blocking function to call.
+        *args: The positional arguments of the call.
+        **kwargs: The keyword arguments of the call.
+
+    Returns:
+        Any: The result of the call.
+    """
+    return await ioExecutor.run(func, *args, **kwargs)
@@ -0,0 +1,68 @@
+"""
+This module defines the GetMetrics handler for scraping the metrics of the
+workflow service in the Prometheus text exposition format.
+"""
+
+from fastapi import Request
+from fastapi.responses import PlainTextResponse
+from lurawi.executors import cpuExecutor
+from lurawi.load_monitor import loadMonitor
+from lurawi.metrics import metricsRegistry
+from lurawi.webhook_handler import WebhookHandler
+
+
+class GetMetrics(WebhookHandler):
+    """
+    Handles the retrieval of the workflow service metrics.
+
+    This handler provides a GET endpoint for Prometheus to scrape turn, action
+    and LLM call metrics, along with gauges of the current load. It is disabled
+    unless the MetricsEnabled environment variable is set to "1".
+    """
+
+    def __init__(self, server=None):
+        super(GetMetrics, self).__init__(server)
+        self.is_disabled = not metricsRegistry.enabled
+        self.route = "/metrics"
+        self.methods = ["GET"]
+
+    async def process_callback(self, payload: Request):
+        """
+        Processes the callback to render the current metrics.
+
+        Args:
+            payload (Request): The scrape request; it carries no parameters.
+
+        Returns:
+            PlainTextResponse: The metrics in the Prometheus text exposition format.
+        """
+        gauges = {
+            "lurawi_active_sessions": (
+                "Active conversation members.",
+                len(self.server.conversation_members) if self.server else 0,
+            ),
+            "lurawi_turns_in_flight": (
+                "Turns being run.",
+                loadMonitor.turns_in_flight,
+            ),
+            "lurawi_turns_queued": (
+                "Turns waiting for a previous turn of the same member.",
+                loadMonitor.turns_queued,
+            ),
+            "lurawi_llm_calls_pending": (
+                "LLM calls waiting for or streaming their response.",
+                loadMonitor.llm_calls_pending,
+            ),
+            "lurawi_cpu_tasks_pending": (
+                "Tasks running or queued on the CPU executor.",
+                cpuExecutor.pending,
+            ),
+            "lurawi_event_loop_lag_seconds": (
+                "Smoothed event loop lag.",
+                loadMonitor.loop_lag,
+            ),
+        }
+        return PlainTextResponse(
+            metricsRegistry.render(gauges),
+            media_type="text/plain; version=0.0.4; charset=utf-8",
+        )
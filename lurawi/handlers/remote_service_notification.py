@@ -6,7 +6,6 @@ notifications from remote services.
 import os
 from typing import Dict
 
-import requests
 from pydantic import BaseModel
 from lurawi.webhook_handler import WebhookHandler
 from lurawi.utils import is_indev, logger
@@ -20,6 +19,8 @@ class RemoteServiceNotificationPayload(BaseModel):
         success (bool): Indicates if the remote service operation was successful.
         access_key (str): The access key for authorization.
         uid (str): The unique identifier of the user associated with the notification.
+        session_id (str): Optional session identifier of the user, required to find
+                          the user session when session scoped members are enabled.
         method (str): The method or type of remote service operation.
         data (str | Dict): Method-specific data, can be a string or a dictionary.
     """
@@ -27,6 +28,7 @@ class RemoteServiceNotificationPayload(BaseModel):
     success: bool
     access_key: str
     uid: str
+    session_id: str = ""
     method: str
     data: str | Dict
 
@@ -57,6 +59,8 @@ class RemoteServiceNotificationHandler(WebhookHandler):
         else:
             local_ip = "127.0.0.1"
             if not is_indev():
+                import requests  # pylint: disable=import-outside-toplevel
+
                 METADATA_URI = os.environ["ECS_CONTAINER_METADATA_URI"]
                 container_metadata = requests.get(METADATA_URI).json()
                 local_ip = container_metadata["Networks"][0]["IPv4Addresses"][0]
@@ -73,12 +77,13 @@ class RemoteServiceNotificationHandler(WebhookHandler):
         {
             "access_key": "fjeoijoefvjae", # access key put as the same as activity id
             "uid": "220", # for which user
+            "session_id": "s1", # optional, for which user session
             "method": "guardrails_validator"
             "data" : Dict # method specific data
         }
         """
 
-        member = self.server.get_member(uid=payload.uid)
+        member = self.server.get_member(uid=payload.uid, session_id=payload.session_id)
         if not member:
             return self.write_http_response(
                 400,
@@ -82,5 +82,5 @@ class SystemOperationsHandler(WebhookHandler):
             behaviour = ""
             if isinstance(payload.value, str):
                 behaviour = payload.value
-            mesg = self.server.load_pending_behaviours(behaviour)
+            mesg = await self.server.load_pending_behaviours(behaviour)
             return self.write_http_response(200, {"status": "success", "message": mesg})
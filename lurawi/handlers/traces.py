@@ -0,0 +1,67 @@
+"""
+This module defines the GetTraces handler for retrieving the most recent slow or
+failed turn traces kept by the tracer.
+"""
+
+from fastapi import Depends
+from pydantic import BaseModel
+from lurawi.tracing import tracer
+from lurawi.utils import api_access_check
+from lurawi.webhook_handler import WebhookHandler
+
+
+class GetTracesPayload(BaseModel):
+    """
+    Query parameters of the GetTraces handler.
+    """
+
+    limit: int = 10
+    slow_only: bool = True
+
+
+class GetTraces(WebhookHandler):
+    """
+    Handles the retrieval of recent turn traces for diagnosing slow turns.
+
+    This handler provides a GET endpoint returning the last traces kept by the
+    tail-based sampling of the tracer, newest first. It is disabled unless the
+    TracingEnabled environment variable is set to "1".
+    """
+
+    def __init__(self, server=None):
+        super(GetTraces, self).__init__(server)
+        self.is_disabled = not tracer.enabled
+        self.route = "/traces"
+        self.methods = ["GET"]
+
+    async def process_callback(
+        self,
+        payload: GetTracesPayload = Depends(),
+        authorised: bool = Depends(api_access_check),
+    ):
+        """
+        Processes the callback to return the most recent kept traces.
+
+        Args:
+            payload (GetTracesPayload): The query parameters: `limit`, the maximum
+                number of traces to return, and `slow_only`, to only return traces
+                over TraceSlowTurnMs rather than also failed and sampled traces.
+            authorised (bool): Whether the request has a valid API key.
+
+        Returns:
+            JSONResponse: The traces, newest first.
+        """
+        if not authorised:
+            return self.write_http_response(
+                401, {"status": "failed", "message": "Unauthorised access."}
+            )
+
+        return self.write_http_response(
+            200,
+            {
+                "status": "success",
+                "traces": tracer.get_traces(
+                    limit=max(payload.limit, 0), slow_only=payload.slow_only
+                ),
+            },
+        )
@@ -0,0 +1,122 @@
+"""
+Instrumentation Hooks Module for the Lurawi System.
+
+This module lets plugins, such as metrics, tracing, auditing or profilers, observe
+the action runner without patching it. A plugin subscribes a callback to an event:
+
+- before_turn(manager): A turn is about to run
+- after_turn(manager, outcome, elapsed): A turn has finished, with its outcome
+  (`completed`, `busy`, `cancelled` or `error`)
+- before_alet(manager, tag, cmd): An action element is about to be played
+- after_alet(manager, tag, cmd, succeeded, elapsed): An action element has
+  succeeded or failed
+- custom_start(manager, tag, custom): The `run` of a custom behaviour starts
+- custom_end(manager, tag, custom, elapsed): The `run` of a custom behaviour has
+  returned; the custom may still be waiting, e.g. for a remote callback
+- remote_callback(manager, method, elapsed): A remote callback has been processed
+- llm_call(custom, model, stream, succeeded, elapsed, prompt_tokens,
+  completion_tokens): An LLM call has finished; a streamed call finishes when its
+  stream has been consumed
+
+`manager` is the ActivityManager of the conversation member, `tag` the running
+action tag (the command, or the custom behaviour name), and `elapsed` is in
+seconds. Callbacks are called with keyword arguments, run on the event loop and
+must not block; an exception raised by a callback is logged and ignored.
+
+The subscribers of each event are held in a tuple attribute named after the
+event, declared in HookRegistry.__init__ for every name in HOOK_EVENTS, so the action runner checks `if hookRegistry.before_alet:` and skips the
+hook when nothing is subscribed.
+
+The module creates a global HookRegistry instance (hookRegistry) that can be
+imported and used throughout the application.
+"""
+
+from typing import Callable
+
+from lurawi.utils import logger
+
+HOOK_EVENTS = (
+    "before_turn",
+    "after_turn",
+    "before_alet",
+    "after_alet",
+    "custom_start",
+    "custom_end",
+    "remote_callback",
+    "llm_call",
+)
+
+
+class HookRegistry:
+    """
+    Subscribers of the instrumentation events of the action runner.
+    """
+
+    def __init__(self):
+        """
+        Initializes a new HookRegistry without subscribers.
+        """
+        self.before_turn: tuple = ()
+        self.after_turn: tuple = ()
+        self.before_alet: tuple = ()
+        self.after_alet: tuple = ()
+        self.custom_start: tuple = ()
+        self.custom_end: tuple = ()
+        self.remote_callback: tuple = ()
+        self.llm_call: tuple = ()
+
+    def subscribe(self, event: str, callback: Callable):
+        """
+        Subscribe a callback to an event; subscribing it again has no effect.
+
+        Args:
+            event (str): The event name, one of HOOK_EVENTS.
+            callback (Callable): Called with the keyword arguments of the event.
+
+        Raises:
+            ValueError: If the event does not exist.
+        """
+        if event not in HOOK_EVENTS:
+            raise ValueError(f"unknown hook event {event}")
+        callbacks = getattr(self, event)
+        if callback not in callbacks:
+            setattr(self, event, callbacks + (callback,))
+
+    def unsubscribe(self, event: str, callback: Callable):
+        """
+        Unsubscribe a callback from an event.
+
+        Args:
+            event (str): The event name.
+            callback (Callable): The subscribed callback.
+        """
+        if event in HOOK_EVENTS:
+            setattr(
+                self,
+                event,
+                tuple(cb for cb in getattr(self, event) if cb != callback),
+            )
+
+    def emit(self, event: str, **kwargs):
+        """
+        Call the subscribers of an event.
+
+        Args:
+            event (str): The event name.
+            **kwargs: The event arguments.
+        """
+        for callback in getattr(self, event):
+            try:
+                callback(**kwargs)
+            except Exception as err:  # pylint: disable=broad-exception-caught
+                logger.error("hook %s: %s failed: %s", event, callback, err)
+
+    def clear(self):
+        """
+        Remove all subscribers.
+        """
+        for event in HOOK_EVENTS:
+            setattr(self, event, ())
+
+
+hookRegistry = HookRegistry()
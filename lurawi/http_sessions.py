@@ -0,0 +1,156 @@
+"""
+HTTP Session Module for the Lurawi System.
+
+This module keeps the aiohttp client sessions shared by the asynchronous HTTP helpers
+of lurawi.utils, so that calls to the same services every turn reuse pooled
+keep-alive connections and cached DNS lookups instead of paying a new TCP and TLS
+setup each time.
+
+A session is created per event loop on first use, as aiohttp sessions cannot be
+shared between loops. Each session has its own connection pool, with:
+- HttpPoolLimit connections in total (defaults to 100)
+- HttpPoolLimitPerHost connections per host (defaults to 20)
+- DNS lookups cached for HttpDnsCacheTtl seconds (defaults to 300)
+- Idle connections kept alive for HttpKeepAliveTimeout seconds (defaults to 30)
+
+Requests time out after HttpTimeout seconds (defaults to 300), or after
+HttpConnectTimeout seconds (defaults to 30) waiting for a connection. Cookies are
+not kept between requests, so calls made for different users stay independent, as
+they were with a session per call. Request headers are given per request.
+
+The module creates a global HttpSessionManager instance (httpSessions). The workflow
+service awaits `aclose` from the application shutdown handler, so the sessions and
+their connections are closed before the loop stops.
+"""
+
+import asyncio
+import logging
+import os
+from typing import TYPE_CHECKING, Dict
+
+if TYPE_CHECKING:
+    import aiohttp
+
+# the lurawi logger, configured by lurawi.utils; not imported from there, as
+# lurawi.utils uses this module for its HTTP helpers
+logger = logging.getLogger("lurawi")
+
+
+class HttpSessionManager:
+    """
+    Registry of the shared aiohttp client sessions, one per event loop.
+    """
+
+    def __init__(self):
+        """
+        Initializes a new HttpSessionManager from the HTTP environment variables.
+        """
+        self.limit = int(self._get_env_float("HttpPoolLimit", 100.0))
+        self.limit_per_host = int(self._get_env_float("HttpPoolLimitPerHost", 20.0))
+        self.dns_cache_ttl = int(self._get_env_float("HttpDnsCacheTtl", 300.0))
+        self.keepalive_timeout = self._get_env_float("HttpKeepAliveTimeout", 30.0)
+        self.timeout = self._get_env_float("HttpTimeout", 300.0)
+        self.connect_timeout = self._get_env_float("HttpConnectTimeout", 30.0)
+        self._sessions: Dict[asyncio.AbstractEventLoop, "aiohttp.ClientSession"] = {}
+
+    @staticmethod
+    def _get_env_float(name: str, default: float) -> float:
+        """
+        Get a non-negative number setting from an environment variable.
+
+        Args:
+            name (str): The environment variable name.
+            default (float): The value used when the variable is unset or invalid.
+
+        Returns:
+            float: The setting value.
+        """
+        try:
+            value = float(os.environ.get(name, default))
+        except ValueError:
+            logger.warning("http sessions: invalid %s, using %s", name, default)
+            return default
+        return value if value >= 0 else default
+
+    def get_session(self) -> "aiohttp.ClientSession":
+        """
+        Get the shared session of the running event loop, creating it on first use.
+
+        Returns:
+            aiohttp.ClientSession: The shared session.
+        """
+        loop = asyncio.get_running_loop()
+        session = self._sessions.get(loop)
+        if session is not None and not session.closed:
+            return session
+
+        import aiohttp  # pylint: disable=import-outside-toplevel
+
+        # forget the sessions of loops that have since been closed
+        for stale_loop in [lp for lp in self._sessions if lp.is_closed()]:
+            del self._sessions[stale_loop]
+
+        connector = aiohttp.TCPConnector(
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            ttl_dns_cache=self.dns_cache_ttl or None,
+            use_dns_cache=self.dns_cache_ttl > 0,
+            keepalive_timeout=self.keepalive_timeout,
+        )
+        session = aiohttp.ClientSession(
+            connector=connector,
+            cookie_jar=aiohttp.DummyCookieJar(),
+            timeout=aiohttp.ClientTimeout(
+                total=self.timeout or None, connect=self.connect_timeout or None
+            ),
+        )
+        self._sessions[loop] = session
+        return session
+
+    async def aclose(self):
+        """
+        Close the shared sessions and their pooled connections, waiting until done.
+
+        Sessions of other running loops, e.g. the Discord client's, are closed on
+        their own loop.
+        """
+        running_loop = asyncio.get_running_loop()
+        sessions, self._sessions = self._sessions, {}
+        for loop, session in sessions.items():
+            if session.closed or loop.is_closed():
+                continue
+            try:
+                if loop is running_loop:
+                    await session.close()
+                elif loop.is_running():
+                    await asyncio.wrap_future(
+                        asyncio.run_coroutine_threadsafe(session.close(), loop)
+                    )
+                else:
+                    logger.warning(
+                        "http sessions: unable to close a session of a stopped loop"
+                    )
+            except Exception as err:  # pylint: disable=broad-exception-caught
+                logger.error("http sessions: unable to close a session: %s", err)
+
+    def close(self):
+        """
+        Close the shared sessions of loops that are not running.
+
+        This is a fallback for the synchronous shutdown of the workflow engine.
+        Sessions of running loops are left to `aclose`, as they cannot be closed
+        and waited for from here.
+        """
+        for loop, session in list(self._sessions.items()):
+            if loop.is_running():
+                continue
+            del self._sessions[loop]
+            if session.closed or loop.is_closed():
+                continue
+            try:
+                loop.run_until_complete(session.close())
+            except Exception as err:  # pylint: disable=broad-exception-caught
+                logger.error("http sessions: unable to close a session: %s", err)
+
+
+httpSessions = HttpSessionManager()
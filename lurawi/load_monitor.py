@@ -0,0 +1,150 @@
+"""
+Load Monitor Module for the Lurawi System.
+
+This module tracks how saturated the workflow service is, so a load balancer can
+stop routing traffic to an instance that can no longer keep up.
+
+The monitor keeps:
+- The event loop lag, sampled by a task that measures how late its periodic
+  wake-ups are. A loop busy with CPU work or blocking calls wakes the sampler late,
+  as it does every other request handler.
+- Counters of in-flight turns, turns queued behind a previous turn of the same
+  member, and pending LLM calls, updated by the activity managers and customs.
+
+The readiness thresholds are set by the ReadinessMaxLoopLagMs environment variable
+(defaults to 500ms) and the ReadinessMaxPendingTurns environment variable, the
+maximum number of in-flight and queued turns (defaults to no limit).
+
+The module creates a global LoadMonitor instance (loadMonitor) that can be imported
+and used throughout the application.
+"""
+
+import asyncio
+import os
+from collections import deque
+from typing import Dict, List
+
+from lurawi.utils import logger
+
+LAG_SAMPLE_INTERVAL = 0.5
+LAG_WINDOW = 10
+LAG_SMOOTHING = 0.3
+
+
+class LoadMonitor:
+    """
+    Event loop lag sampler and load counters of the workflow service.
+    """
+
+    def __init__(self):
+        """
+        Initializes a new LoadMonitor.
+        """
+        self.turns_in_flight = 0
+        self.turns_queued = 0
+        self.llm_calls_pending = 0
+        self.loop_lag = 0.0
+        self._lag_samples: deque = deque(maxlen=LAG_WINDOW)
+        self._sampler: asyncio.Task | None = None
+
+        self.max_loop_lag_ms = self._get_env_float("ReadinessMaxLoopLagMs", 500.0)
+        self.max_pending_turns = int(
+            self._get_env_float("ReadinessMaxPendingTurns", 0.0)
+        )
+
+    @staticmethod
+    def _get_env_float(name: str, default: float) -> float:
+        """
+        Get a non-negative number setting from an environment variable.
+
+        Args:
+            name (str): The environment variable name.
+            default (float): Returned if the variable is not set or invalid.
+
+        Returns:
+            float: The setting value.
+        """
+        try:
+            value = float(os.environ.get(name, default))
+        except ValueError:
+            logger.warning("invalid %s, using default %s", name, default)
+            return default
+        return value if value >= 0 else default
+
+    def start(self):
+        """
+        Start sampling the lag of the running event loop.
+        """
+        if self._sampler is None or self._sampler.done():
+            self._sampler = asyncio.get_running_loop().create_task(self._sample_lag())
+
+    def stop(self):
+        """
+        Stop sampling the event loop lag.
+        """
+        if self._sampler is not None:
+            self._sampler.cancel()
+            self._sampler = None
+
+    async def _sample_lag(self):
+        """
+        Periodically measure how late the loop wakes up the sampler.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(LAG_SAMPLE_INTERVAL)
+            lag = max(loop.time() - start - LAG_SAMPLE_INTERVAL, 0.0)
+            self._lag_samples.append(lag)
+            self.loop_lag += LAG_SMOOTHING * (lag - self.loop_lag)
+
+    @property
+    def max_recent_loop_lag(self) -> float:
+        """
+        Returns:
+            float: The largest loop lag sampled in the recent window, in seconds.
+        """
+        return max(self._lag_samples, default=0.0)
+
+    @property
+    def pending_turns(self) -> int:
+        """
+        Returns:
+            int: The number of in-flight and queued turns.
+        """
+        return self.turns_in_flight + self.turns_queued
+
+    def get_status(self, active_sessions: int = 0) -> Dict:
+        """
+        Get the load of the service and whether it is ready for more traffic.
+
+        Args:
+            active_sessions (int): The number of active conversation members.
+
+        Returns:
+            Dict: The load figures, the `ready` flag and the reasons it is not ready.
+        """
+        reasons: List[str] = []
+        loop_lag_ms = self.loop_lag * 1000
+        if self.max_loop_lag_ms and loop_lag_ms > self.max_loop_lag_ms:
+            reasons.append(
+                f"loop lag {loop_lag_ms:.0f}ms exceeds {self.max_loop_lag_ms:.0f}ms"
+            )
+        if self.max_pending_turns and self.pending_turns > self.max_pending_turns:
+            reasons.append(
+                f"{self.pending_turns} pending turns exceed {self.max_pending_turns}"
+            )
+
+        return {
+            "ready": not reasons,
+            "reasons": reasons,
+            "loop_lag_ms": round(loop_lag_ms, 1),
+            "max_recent_loop_lag_ms": round(self.max_recent_loop_lag * 1000, 1),
+            "turns_in_flight": self.turns_in_flight,
+            "turns_queued": self.turns_queued,
+            "active_sessions": active_sessions,
+            "llm_calls_pending": self.llm_calls_pending,
+        }
+
+
+loadMonitor = LoadMonitor()
@@ -0,0 +1,350 @@
+"""
+Message Channel Module for the Lurawi System.
+
+This module provides outbound message channels that deliver every message of a
+user turn to the client as soon as it is sent, instead of only keeping the last
+response for the HTTP reply.
+
+The module includes:
+- MessageChannel: Base class for channels bound to an ActivityManager
+- TurnStreamChannel: Streams all messages and LLM tokens of a single turn as
+  Server-Sent Events (SSE) or newline-delimited JSON (NDJSON)
+- WebSocketChannel: Pushes all messages and LLM tokens over a persistent WebSocket
+  connection, including messages sent outside of a user turn
+- CallbackURLChannel: Posts messages to a client provided callback URL, used for
+  output produced after the turn's HTTP response has been returned
+"""
+
+import asyncio
+import os
+from typing import AsyncIterable, Callable, Dict
+from urllib.parse import urlparse
+
+import simplejson as json
+
+from fastapi import WebSocket
+
+from lurawi.custom_behaviour import DataStreamHandler
+from lurawi.utils import apost_payload_to_url, logger
+
+TURN_STREAM_FORMATS = {
+    "sse": "text/event-stream",
+    "ndjson": "application/x-ndjson",
+}
+
+
+class MessageChannel:
+    """
+    Base class for outbound message channels.
+
+    When a channel is attached to an ActivityManager, `send_message` and
+    `send_raw_message` push their payloads to the channel instead of
+    setting the turn response. Subclasses override `push_message` and
+    `push_stream` to deliver them to the client.
+
+    A persistent channel can deliver messages produced after the turn that
+    started them has ended, e.g. the continuation of a deferred `delay`.
+    """
+
+    persistent = False
+
+    async def push_message(self, status: int, payload: Dict):
+        """
+        Deliver a single message to the client.
+
+        Args:
+            status (int): The HTTP equivalent status code of the message.
+            payload (Dict): The message payload.
+        """
+        logger.warning("base MessageChannel: message dropped %s", payload)
+
+    async def push_stream(self, stream: DataStreamHandler, activity_id: str = ""):
+        """
+        Deliver an LLM token stream to the client.
+
+        Args:
+            stream (DataStreamHandler): The LLM stream handler.
+            activity_id (str): The activity id of the turn the stream belongs to.
+        """
+        async for _ in stream.content_generator():
+            pass
+
+    def close(self):
+        """
+        Signal that no more messages will be produced by the current turn.
+        """
+
+
+class TurnStreamChannel(MessageChannel):
+    """
+    Streams every message of a turn to the client as it is produced.
+
+    Messages and LLM token streams are queued in the order they are sent and
+    written out by `event_generator`, so LLM tokens are interleaved in order
+    with text messages sent before and after the LLM call.
+    """
+
+    def __init__(self, fmt: str = "sse", on_finished: Callable | None = None):
+        """
+        Initializes a new TurnStreamChannel.
+
+        Args:
+            fmt (str): Either "sse" or "ndjson".
+            on_finished (Callable, optional): Called once the stream has been
+                                              fully written to the client.
+        """
+        self._fmt = fmt if fmt in TURN_STREAM_FORMATS else "sse"
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._closed = False
+        self._on_finished = on_finished
+
+    @property
+    def media_type(self) -> str:
+        """
+        The media type of the streamed response.
+
+        Returns:
+            str: The MIME type for the selected stream format.
+        """
+        return TURN_STREAM_FORMATS[self._fmt]
+
+    async def push_message(self, status: int, payload: Dict):
+        """
+        Queue a message event.
+
+        Args:
+            status (int): The HTTP equivalent status code of the message.
+            payload (Dict): The message payload.
+        """
+        event = {"event": "message", "status_code": status}
+        event.update(payload)
+        self._queue.put_nowait(event)
+
+    async def push_stream(self, stream: DataStreamHandler, activity_id: str = ""):
+        """
+        Queue an LLM token stream; its tokens are written out in order.
+
+        Args:
+            stream (DataStreamHandler): The LLM stream handler.
+            activity_id (str): The activity id of the turn the stream belongs to.
+        """
+        self._queue.put_nowait((stream, activity_id))
+
+    def close(self):
+        """
+        Signal the end of the turn; the stream ends once the queue is drained.
+        """
+        self._closed = True
+        self._queue.put_nowait(None)
+
+    def _format(self, event: Dict) -> str:
+        """
+        Serialise an event in the selected stream format.
+
+        Args:
+            event (Dict): The event to serialise.
+
+        Returns:
+            str: The serialised event.
+        """
+        if self._fmt == "ndjson":
+            return f"{json.dumps(event)}\n"
+        return f"data: {json.dumps(event)}\n\n"
+
+    async def event_generator(self) -> AsyncIterable[str]:
+        """
+        Generate the serialised events of the turn.
+
+        The generator ends when the turn is closed and all queued messages and
+        streams have been written. Chained actions that run at the end of an LLM
+        stream are awaited inside the stream, so their messages are queued before
+        the end of the turn is checked.
+
+        Yields:
+            str: Serialised events.
+        """
+        try:
+            while not (self._closed and self._queue.empty()):
+                item = await self._queue.get()
+                if item is None:
+                    continue
+                if isinstance(item, dict):
+                    yield self._format(item)
+                    continue
+                stream, activity_id = item
+                async for content in stream.content_generator():
+                    yield self._format(
+                        {
+                            "event": "token",
+                            "activity_id": activity_id,
+                            "content": content,
+                        }
+                    )
+                yield self._format({"event": "stream_end", "activity_id": activity_id})
+            yield self._format({"event": "end"})
+        finally:
+            if self._on_finished:
+                self._on_finished()
+
+
+class WebSocketChannel(MessageChannel):
+    """
+    Pushes messages over a WebSocket connection bound to an ActivityManager.
+
+    The channel stays attached for the lifetime of the connection, so messages
+    sent by remote service callbacks and timer or externally triggered behaviours
+    are delivered to the client as soon as they are produced.
+    """
+
+    persistent = True
+
+    def __init__(self, websocket: WebSocket):
+        """
+        Initializes a new WebSocketChannel.
+
+        Args:
+            websocket (WebSocket): The accepted WebSocket connection.
+        """
+        self._websocket = websocket
+        self._send_lock = asyncio.Lock()
+        self._closed = False
+
+    async def send_event(self, event: Dict):
+        """
+        Send a single event to the client.
+
+        Args:
+            event (Dict): The event to send.
+        """
+        if self._closed:
+            return
+        async with self._send_lock:
+            try:
+                await self._websocket.send_text(json.dumps(event))
+            except Exception as err:
+                logger.warning("WebSocketChannel: unable to send event: %s", err)
+                self._closed = True
+
+    async def push_message(self, status: int, payload: Dict):
+        """
+        Send a message event.
+
+        Args:
+            status (int): The HTTP equivalent status code of the message.
+            payload (Dict): The message payload.
+        """
+        event = {"event": "message", "status_code": status}
+        event.update(payload)
+        await self.send_event(event)
+
+    async def push_stream(self, stream: DataStreamHandler, activity_id: str = ""):
+        """
+        Send the tokens of an LLM stream as they are received.
+
+        Args:
+            stream (DataStreamHandler): The LLM stream handler.
+            activity_id (str): The activity id of the turn the stream belongs to.
+        """
+        async for content in stream.content_generator():
+            await self.send_event(
+                {"event": "token", "activity_id": activity_id, "content": content}
+            )
+        await self.send_event({"event": "stream_end", "activity_id": activity_id})
+
+    def close(self):
+        """
+        Stop sending events, e.g. once the client has disconnected.
+        """
+        self._closed = True
+
+
+class CallbackURLChannel(MessageChannel):
+    """
+    Posts messages as JSON to a client provided callback URL.
+
+    LLM streams are posted as a single message once the stream has completed.
+    Only http(s) URLs whose host is listed in the CallbackURLAllowedHosts
+    environment variable (comma separated, `*.example.com` matches subdomains)
+    are accepted, so clients cannot make the server post to arbitrary hosts.
+    Callback URLs are refused when it is not set.
+    """
+
+    persistent = True
+
+    @staticmethod
+    def is_allowed(url: str) -> bool:
+        """
+        Check a callback URL against the CallbackURLAllowedHosts allowlist.
+
+        Args:
+            url (str): The callback URL.
+
+        Returns:
+            bool: True if messages may be posted to the URL.
+        """
+        allowed_hosts = [
+            host.strip().lower()
+            for host in os.environ.get("CallbackURLAllowedHosts", "").split(",")
+            if host.strip()
+        ]
+        try:
+            parsed = urlparse(url)
+        except ValueError:
+            return False
+        host = (parsed.hostname or "").lower()
+        if parsed.scheme not in ("http", "https") or not host:
+            return False
+        for allowed in allowed_hosts:
+            if host == allowed or (
+                allowed.startswith("*.") and host.endswith(allowed[1:])
+            ):
+                return True
+        logger.warning("CallbackURLChannel: callback host %s is not allowed", host)
+        return False
+
+    def __init__(self, url: str):
+        """
+        Initializes a new CallbackURLChannel.
+
+        Args:
+            url (str): The URL messages are posted to.
+        """
+        self._url = url
+
+    async def push_message(self, status: int, payload: Dict):
+        """
+        Post a message event to the callback URL.
+
+        Args:
+            status (int): The HTTP equivalent status code of the message.
+            payload (Dict): The message payload.
+        """
+        event = {"event": "message", "status_code": status}
+        event.update(payload)
+        status_code, _ = await apost_payload_to_url({}, self._url, event)
+        if status_code is None or status_code >= 300:
+            logger.warning(
+                "CallbackURLChannel: unable to post message to %s, status %s",
+                self._url,
+                status_code,
+            )
+
+    async def push_stream(self, stream: DataStreamHandler, activity_id: str = ""):
+        """
+        Post the complete content of an LLM stream as a single message.
+
+        Args:
+            stream (DataStreamHandler): The LLM stream handler.
+            activity_id (str): The activity id of the turn the stream belongs to.
+        """
+        chunks = []
+        async for chunk in stream.content_generator():
+            chunks.append(chunk)
+        await self.push_message(
+            200,
+            {
+                "status": "success",
+                "activity_id": activity_id,
+                "response": "".join(chunks),
+            },
+        )
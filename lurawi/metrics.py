@@ -0,0 +1,337 @@
+"""
+Metrics Module for the Lurawi System.
+
+This module collects latency histograms and counters of the workflow service and
+renders them in the Prometheus text exposition format, served by the /metrics
+webhook handler.
+
+The collected metrics are:
+- lurawi_turn_duration_seconds / lurawi_turns_total: Turn latency and outcome
+- lurawi_action_duration_seconds / lurawi_actions_total: Latency and outcome of
+  each action element, labelled by primitive command or custom behaviour name
+- lurawi_llm_duration_seconds / lurawi_llm_calls_total / lurawi_llm_tokens_total:
+  LLM call latency, outcome and token usage per model
+
+Gauges of the current load, such as active sessions and queued turns, are read from
+the load monitor when the metrics are rendered.
+
+Metrics are only collected when the MetricsEnabled environment variable is set to
+"1", in which case the workflow engine subscribes the metrics to the
+instrumentation hooks of the action runner; otherwise /metrics is not served.
+
+The module creates a global Metrics instance (metricsRegistry) that can be imported
+and used throughout the application.
+"""
+
+import os
+from bisect import bisect_left
+from typing import Dict, List, Tuple
+
+from lurawi.hooks import HookRegistry
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LLM_LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra="") -> str:
+    """
+    Format a label set in the Prometheus text exposition format.
+
+    Args:
+        names (Tuple[str, ...]): The label names.
+        values (Tuple[str, ...]): The label values.
+        extra (str): An already formatted label appended to the set, e.g. `le`.
+
+    Returns:
+        str: The label set, or an empty string if there are no labels.
+    """
+    labels = [
+        '{}="{}"'.format(
+            name,
+            str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"),
+        )
+        for name, value in zip(names, values)
+    ]
+    if extra:
+        labels.append(extra)
+    return "{" + ",".join(labels) + "}" if labels else ""
+
+
+def _format_value(value: float) -> str:
+    """
+    Format a sample value, without a fraction for whole numbers.
+    """
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    """
+    A monotonically increasing count per label set.
+    """
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        """
+        Initializes a new Counter.
+
+        Args:
+            name (str): The metric name.
+            help_text (str): The metric description.
+            labels (Tuple[str, ...]): The label names.
+        """
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1):
+        """
+        Increase the count of a label set.
+
+        Args:
+            *label_values (str): The label values, in the order of the label names.
+            amount (float): The increment.
+        """
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> List[str]:
+        """
+        Returns:
+            List[str]: The exposition lines of the counter.
+        """
+        lines = [
+            f"# HELP {self.name} {self.help_text}",
+            f"# TYPE {self.name} counter",
+        ]
+        for label_values, value in self._values.items():
+            lines.append(
+                f"{self.name}{_format_labels(self.labels, label_values)} "
+                f"{_format_value(value)}"
+            )
+        return lines
+
+
+class Histogram:
+    """
+    A distribution of observed values in fixed buckets per label set.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labels: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = LATENCY_BUCKETS,
+    ):
+        """
+        Initializes a new Histogram.
+
+        Args:
+            name (str): The metric name.
+            help_text (str): The metric description.
+            labels (Tuple[str, ...]): The label names.
+            buckets (Tuple[float, ...]): The sorted upper bounds of the buckets.
+        """
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        # per label set: the count of each bucket plus +Inf, and the sum
+        self._values: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *label_values: str):
+        """
+        Record an observed value of a label set.
+
+        Args:
+            value (float): The observed value.
+            *label_values (str): The label values, in the order of the label names.
+        """
+        series = self._values.get(label_values)
+        if series is None:
+            series = ([0] * (len(self.buckets) + 1), [0.0])
+            self._values[label_values] = series
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1][0] += value
+
+    def render(self) -> List[str]:
+        """
+        Returns:
+            List[str]: The exposition lines of the histogram.
+        """
+        lines = [
+            f"# HELP {self.name} {self.help_text}",
+            f"# TYPE {self.name} histogram",
+        ]
+        for label_values, (counts, total) in self._values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _format_value(bound)
+                labels = _format_labels(self.labels, label_values, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labels, label_values)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total[0])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Metrics:
+    """
+    The metrics of the workflow service.
+    """
+
+    def __init__(self):
+        """
+        Initializes a new Metrics collection.
+        """
+        self.enabled = os.environ.get("MetricsEnabled", "0") == "1"
+        self.turn_duration = Histogram(
+            "lurawi_turn_duration_seconds", "Latency of conversation turns."
+        )
+        self.turns = Counter(
+            "lurawi_turns_total", "Conversation turns by outcome.", ("outcome",)
+        )
+        self.action_duration = Histogram(
+            "lurawi_action_duration_seconds",
+            "Latency of action elements by primitive or custom behaviour.",
+            ("kind", "name"),
+        )
+        self.actions = Counter(
+            "lurawi_actions_total",
+            "Action elements by primitive or custom behaviour and outcome.",
+            ("kind", "name", "outcome"),
+        )
+        self.llm_duration = Histogram(
+            "lurawi_llm_duration_seconds",
+            "Latency of LLM calls by model.",
+            ("model",),
+            LLM_LATENCY_BUCKETS,
+        )
+        self.llm_calls = Counter(
+            "lurawi_llm_calls_total",
+            "LLM calls by model and outcome.",
+            ("model", "outcome"),
+        )
+        self.llm_tokens = Counter(
+            "lurawi_llm_tokens_total",
+            "LLM tokens by model and type.",
+            ("model", "type"),
+        )
+
+    def subscribe(self, hooks: HookRegistry):
+        """
+        Subscribe the metrics to the instrumentation hooks of the action runner.
+
+        Args:
+            hooks (HookRegistry): The hook registry.
+        """
+        hooks.subscribe("after_turn", self._on_after_turn)
+        hooks.subscribe("after_alet", self._on_after_alet)
+        hooks.subscribe("llm_call", self._on_llm_call)
+
+    def _on_after_turn(self, manager, outcome: str, elapsed: float):
+        """Record a finished turn."""
+        self.observe_turn(elapsed, outcome)
+
+    def _on_after_alet(
+        self, manager, tag: str, cmd: str, succeeded: bool, elapsed: float
+    ):
+        """Record a finished action element."""
+        self.observe_action(
+            "custom" if cmd == "custom" else "primitive", tag, elapsed, succeeded
+        )
+
+    def _on_llm_call(
+        self,
+        custom,
+        model: str,
+        stream: bool,
+        succeeded: bool,
+        elapsed: float,
+        prompt_tokens: int,
+        completion_tokens: int,
+    ):
+        """Record a finished LLM call."""
+        self.observe_llm_call(
+            model, elapsed, succeeded, prompt_tokens, completion_tokens
+        )
+
+    def observe_turn(self, elapsed: float, outcome: str):
+        """
+        Record a finished turn.
+
+        Args:
+            elapsed (float): The turn latency in seconds.
+            outcome (str): How the turn ended, e.g. `completed` or `busy`.
+        """
+        self.turn_duration.observe(elapsed)
+        self.turns.inc(outcome)
+
+    def observe_action(self, kind: str, name: str, elapsed: float, succeeded: bool):
+        """
+        Record a finished action element.
+
+        Args:
+            kind (str): `primitive` or `custom`.
+            name (str): The primitive command or custom behaviour name.
+            elapsed (float): The action latency in seconds.
+            succeeded (bool): Whether the action succeeded.
+        """
+        self.action_duration.observe(elapsed, kind, name)
+        self.actions.inc(kind, name, "success" if succeeded else "failure")
+
+    def observe_llm_call(
+        self,
+        model: str,
+        elapsed: float,
+        succeeded: bool,
+        prompt_tokens: int = 0,
+        completion_tokens: int = 0,
+    ):
+        """
+        Record a finished LLM call.
+
+        Args:
+            model (str): The model name.
+            elapsed (float): The call latency in seconds.
+            succeeded (bool): Whether the call succeeded.
+            prompt_tokens (int): The number of prompt tokens used.
+            completion_tokens (int): The number of completion tokens used.
+        """
+        self.llm_duration.observe(elapsed, model)
+        self.llm_calls.inc(model, "success" if succeeded else "failure")
+        if prompt_tokens:
+            self.llm_tokens.inc(model, "prompt", amount=prompt_tokens)
+        if completion_tokens:
+            self.llm_tokens.inc(model, "completion", amount=completion_tokens)
+
+    def render(self, gauges: Dict[str, Tuple[str, float]]) -> str:
+        """
+        Render all metrics in the Prometheus text exposition format.
+
+        Args:
+            gauges (Dict[str, Tuple[str, float]]): Current values read at render
+                time, keyed by metric name, with their help text.
+
+        Returns:
+            str: The metrics exposition.
+        """
+        lines = []
+        for name, (help_text, value) in gauges.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {_format_value(value)}")
+        for metric in (
+            self.turn_duration,
+            self.turns,
+            self.action_duration,
+            self.actions,
+            self.llm_duration,
+            self.llm_calls,
+            self.llm_tokens,
+        ):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+metricsRegistry = Metrics()
@@ -0,0 +1,100 @@
+"""
+Runtime Module for the Lurawi System.
+
+This module starts and stops the process wide services the workflow engine runs
+on, so the engine only has to bind its own state to the main event loop.
+
+The module includes:
+- start_runtime: Installs the shared I/O executor as the default executor of the
+  main loop, starts the load monitor and traffic capture, and preloads the
+  tokenizers and the custom behaviours of the workflow before requests are served
+- preload_custom_behaviours: Imports the custom behaviours of a behaviours
+  definition on the I/O executor
+- close_runtime: Awaits the close of the shared HTTP sessions
+- stop_runtime: Stops the load monitor, traffic capture and executors, from the
+  synchronous shutdown of the workflow engine
+"""
+
+import asyncio
+import os
+from typing import Dict
+
+from lurawi.custom_registry import customRegistry
+from lurawi.executors import cpuExecutor, ioExecutor, run_blocking
+from lurawi.http_sessions import httpSessions
+from lurawi.load_monitor import loadMonitor
+from lurawi.token_counter import preload_tokenizers
+from lurawi.traffic_capture import trafficCapture
+from lurawi.utils import logger
+
+
+async def preload_custom_behaviours(behaviours: Dict, workspace: str | None = None):
+    """
+    Import the custom behaviours used by a behaviours definition.
+
+    The modules are imported once on the I/O executor, instead of by the first
+    turn that uses them, which would stall the event loop for all users.
+
+    Args:
+        behaviours (Dict): The behaviours definition.
+        workspace (str | None): The workspace directory of custom modules.
+    """
+    await run_blocking(customRegistry.preload, behaviours, workspace)
+
+
+async def start_runtime(behaviours: Dict, workspace: str | None = None):
+    """
+    Start the shared services on the running (main) event loop.
+
+    The shared I/O executor becomes the default executor of the loop, and the
+    tokenizers listed in TokenizerPreload and the custom behaviours of the
+    workflow are loaded on it, so the first turns do not wait on them. When
+    LoopBlockWarnMs is set, the loop runs in asyncio debug mode and logs every
+    callback that blocks it for longer than the given number of milliseconds.
+
+    Args:
+        behaviours (Dict): The behaviours definition of the workflow.
+        workspace (str | None): The workspace directory of custom modules.
+    """
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ioExecutor.pool)
+    loadMonitor.start()
+    trafficCapture.start()
+    await loop.run_in_executor(ioExecutor.pool, preload_tokenizers)
+    if behaviours:
+        await preload_custom_behaviours(behaviours, workspace)
+
+    if "LoopBlockWarnMs" in os.environ:
+        try:
+            block_warn_ms = float(os.environ["LoopBlockWarnMs"])
+        except ValueError:
+            block_warn_ms = 0
+        if block_warn_ms > 0:
+            logger.warning(
+                "asyncio debug mode: logging loop blocks longer than %sms",
+                block_warn_ms,
+            )
+            loop.set_debug(True)
+            loop.slow_callback_duration = block_warn_ms / 1000
+
+
+async def close_runtime():
+    """
+    Close the shared HTTP sessions, waiting until their connections are closed.
+    """
+    await httpSessions.aclose()
+
+
+def stop_runtime():
+    """
+    Stop the shared services.
+
+    Writes the remaining captured traffic, closes the HTTP sessions of loops that
+    are not running (the others are closed by `close_runtime`) and shuts down
+    the executors.
+    """
+    loadMonitor.stop()
+    trafficCapture.stop()
+    httpSessions.close()
+    cpuExecutor.shutdown()
+    ioExecutor.shutdown()
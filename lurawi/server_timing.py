@@ -0,0 +1,109 @@
+"""
+Server Timing Module for the Lurawi System.
+
+This module breaks the latency of a /message turn into phases, reported to the
+client in a `Server-Timing` response header, so frontends and load test tools can
+attribute latency per request without access to the server logs.
+
+The phases are:
+- session: Looking up or creating the conversation member
+- queue: Waiting for the previous turn of the member to finish
+- custom.<name>: Each custom behaviour played in the turn, by name, recorded by
+  an after_alet hook
+- llm / llm-ttft: LLM calls, or the time until an LLM stream started
+- serialize: Encoding the response
+- total: The whole request, up to returning the response
+
+Phases are only recorded when the ServerTimingEnabled environment variable is set
+to "1". With ServerTimingInBody also set to "1", the phases are added to JSON
+responses as a `timings` field too.
+"""
+
+import re
+import time
+from typing import Dict
+
+import simplejson as json
+from fastapi.responses import JSONResponse
+
+_INVALID_TOKEN_CHARS = re.compile(r"[^A-Za-z0-9!#$%&'*+.^_`|~-]")
+
+
+class TurnTimings:
+    """
+    The phase durations of a turn, in the order they were first recorded.
+    """
+
+    def __init__(self, in_body: bool = False):
+        """
+        Initializes a new TurnTimings, starting the total time now.
+
+        Args:
+            in_body (bool): Whether to also add the phases to JSON responses.
+        """
+        self.started = time.perf_counter()
+        self.in_body = in_body
+        self.phases: Dict[str, float] = {}
+
+    def add(self, name: str, seconds: float):
+        """
+        Add time to a phase; repeated phases, e.g. a custom played twice, add up.
+
+        Args:
+            name (str): The phase name.
+            seconds (float): The time spent in the phase.
+        """
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def since_start(self) -> float:
+        """
+        Returns:
+            float: The seconds elapsed since the timings were started.
+        """
+        return time.perf_counter() - self.started
+
+    def to_dict(self) -> Dict[str, float]:
+        """
+        Returns:
+            Dict[str, float]: The phase durations in milliseconds, with the total.
+        """
+        timings = {name: round(value * 1000, 3) for name, value in self.phases.items()}
+        timings["total"] = round(self.since_start() * 1000, 3)
+        return timings
+
+    @staticmethod
+    def on_after_alet(manager, tag: str, cmd: str, succeeded: bool, elapsed: float):
+        """
+        The after_alet hook adding the time of custom behaviours to the timings of
+        the running turn, if it is timed.
+        """
+        if cmd != "custom":
+            return
+        timings = manager.knowledge["MODULES"].get("TurnTimings")
+        if timings is not None:
+            timings.add(f"custom.{tag}", elapsed)
+
+    def apply(self, response):
+        """
+        Add the Server-Timing header, and the `timings` field if enabled, to a
+        response.
+
+        Args:
+            response: The turn response.
+
+        Returns:
+            The response.
+        """
+        timings = self.to_dict()
+        if self.in_body and isinstance(response, JSONResponse):
+            content = json.loads(response.body)
+            if isinstance(content, dict):
+                content["timings"] = timings
+                response.body = response.render(content)
+                response.headers["content-length"] = str(len(response.body))
+
+        response.headers["Server-Timing"] = ", ".join(
+            f"{_INVALID_TOKEN_CHARS.sub('_', name)};dur={value}"
+            for name, value in timings.items()
+        )
+        return response
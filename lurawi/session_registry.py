@@ -0,0 +1,202 @@
+"""
+Session Registry Module for the Lurawi System.
+
+This module provides an asyncio native registry of conversation members
+(ActivityManager instances) that replaces a single dictionary guarded by a
+thread lock.
+
+The registry:
+- Splits members over a number of dictionary shards
+- Creates members atomically, so concurrent requests for the same new member
+  wait on a single creation future instead of a global lock
+- Marshals mutations from other threads (e.g. the timer or Discord threads)
+  onto the main event loop, which owns the registry
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Tuple
+
+from lurawi.utils import logger
+
+
+class SessionRegistry:
+    """
+    Registry of conversation members keyed by member id.
+
+    All lookups and mutations are expected to run on the main event loop, where
+    plain dictionary operations between awaits are atomic. Code running on other
+    threads uses `run_on_loop` to execute on the main loop.
+    """
+
+    def __init__(self, shards: int = 16):
+        """
+        Initializes a new SessionRegistry.
+
+        Args:
+            shards (int): Number of dictionary shards the members are split over.
+        """
+        self._shards: List[Dict[Hashable, Any]] = [{} for _ in range(max(shards, 1))]
+        self._creating: Dict[Hashable, asyncio.Future] = {}
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def bind_loop(self, loop: asyncio.AbstractEventLoop):
+        """
+        Bind the registry to the main event loop.
+
+        Args:
+            loop (asyncio.AbstractEventLoop): The event loop that owns the registry.
+        """
+        self._loop = loop
+
+    def _shard(self, key: Hashable) -> Dict[Hashable, Any]:
+        """
+        Get the shard a member id belongs to.
+
+        Args:
+            key (Hashable): The member id.
+
+        Returns:
+            Dict[Hashable, Any]: The dictionary shard of the member.
+        """
+        return self._shards[hash(key) % len(self._shards)]
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Get a member.
+
+        Args:
+            key (Hashable): The member id.
+            default (Any): Returned if the member does not exist.
+
+        Returns:
+            Any: The member, or default if it does not exist.
+        """
+        return self._shard(key).get(key, default)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._shard(key)
+
+    def __getitem__(self, key: Hashable) -> Any:
+        return self._shard(key)[key]
+
+    def __setitem__(self, key: Hashable, member: Any):
+        self._shard(key)[key] = member
+
+    def __delitem__(self, key: Hashable):
+        del self._shard(key)[key]
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self._shards)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Remove a member.
+
+        Args:
+            key (Hashable): The member id.
+            default (Any): Returned if the member does not exist.
+
+        Returns:
+            Any: The removed member, or default if it does not exist.
+        """
+        return self._shard(key).pop(key, default)
+
+    def keys(self) -> List[Hashable]:
+        """
+        Returns:
+            List[Hashable]: A snapshot of all member ids.
+        """
+        return [key for shard in self._shards for key in shard]
+
+    def values(self) -> List[Any]:
+        """
+        Returns:
+            List[Any]: A snapshot of all members.
+        """
+        return [member for shard in self._shards for member in shard.values()]
+
+    def items(self) -> List[Tuple[str, Any]]:
+        """
+        Returns:
+            List[Tuple[str, Any]]: A snapshot of all (member id, member) pairs.
+        """
+        return [item for shard in self._shards for item in shard.items()]
+
+    def clear(self):
+        """
+        Remove all members.
+        """
+        for shard in self._shards:
+            shard.clear()
+
+    async def get_or_create(
+        self, key: Hashable, factory: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """
+        Get a member, creating it with factory if it does not exist.
+
+        Only one factory call runs per member id. Concurrent callers for the same
+        new member wait for its creation, while other members remain accessible.
+        The member is only visible once the factory has completed.
+
+        Args:
+            key (Hashable): The member id.
+            factory (Callable[[], Awaitable[Any]]): Coroutine function creating
+                                                    and initialising the member.
+
+        Returns:
+            Any: The existing or newly created member.
+        """
+        member = self.get(key)
+        if member is not None:
+            return member
+
+        if key in self._creating:
+            return await asyncio.shield(self._creating[key])
+
+        future = asyncio.get_running_loop().create_future()
+        self._creating[key] = future
+        try:
+            member = await factory()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as err:
+            future.set_exception(err)
+            future.exception()  # mark retrieved, waiters get the exception re-raised
+            raise
+        finally:
+            del self._creating[key]
+
+        self[key] = member
+        future.set_result(member)
+        return member
+
+    async def run_on_loop(self, coro: Awaitable) -> Any:
+        """
+        Run a coroutine on the main event loop of the registry.
+
+        Coroutines from other threads are marshalled onto the main loop and
+        awaited from the calling loop; on the main loop they are awaited directly.
+
+        Args:
+            coro (Awaitable): The coroutine to run.
+
+        Returns:
+            Any: The result of the coroutine.
+        """
+        if self._loop is None or not self._loop.is_running():
+            return await coro
+
+        try:
+            current_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            current_loop = None
+
+        if current_loop is self._loop:
+            return await coro
+
+        logger.debug("session registry: marshal call onto the main loop")
+        return await asyncio.wrap_future(
+            asyncio.run_coroutine_threadsafe(coro, self._loop)
+        )
@@ -4,20 +4,39 @@ Timer Management Module for the Lurawi System.
 This module provides classes for creating and managing timers in an asynchronous environment.
 It enables scheduling of timed events with configurable intervals and repetitions.
 
+Timers are kept in a hierarchical timing wheel driven by a single tick callback on
+the main event loop, so adding and cancelling a timer is O(1) regardless of the
+number of timers, all timers due in a tick are fired as one batch, and timer
+callbacks run on the same loop as the request handlers.
+
 The module includes:
 - TimerClient: Base class for objects that want to receive timer events
 - TimerManager: Central manager for creating and tracking timers
-- BotTimer: Individual timer implementation
+- BotTimer: Individual repeating timer implementation
+- TimerWheel: The hierarchical timing wheel holding all scheduled timers
 
 The module creates a global TimerManager instance (timerManager) that can be imported
-and used throughout the application.
+and used throughout the application. Timers added before the main event loop runs are
+scheduled once the manager is bound to the loop, either explicitly at application
+startup or lazily on first use from within the loop.
 """
 
 import asyncio
-from typing import Dict
-from threading import Thread
+import inspect
+import itertools
+import math
+import threading
+from typing import Any, Awaitable, Callable, Dict, List
 from lurawi.utils import logger
 
+TICK_SECONDS = 0.1
+WHEEL_BITS = 6
+WHEEL_SIZE = 1 << WHEEL_BITS
+WHEEL_MASK = WHEEL_SIZE - 1
+WHEEL_LEVELS = 4
+# 64^4 ticks of 0.1s, about 19 days; longer timers are re-cascaded from the top level
+WHEEL_SPAN = 1 << (WHEEL_BITS * WHEEL_LEVELS)
+
 
 class TimerClient:
     """
@@ -64,76 +83,199 @@ class TimerClient:
         return
 
 
+class TimerEntry:  # pylint: disable=too-few-public-methods
+    """
+    A single scheduled expiry in the timing wheel.
+    """
+
+    __slots__ = ("tid", "expires", "callback", "slot")
+
+    def __init__(self, tid: int, callback: Callable[[], Any]):
+        """
+        Initializes a new TimerEntry.
+
+        Args:
+            tid (int): The timer id the entry belongs to.
+            callback (Callable[[], Any]): Called when the entry expires, may return
+                                          an awaitable that is run in the tick batch.
+        """
+        self.tid = tid
+        self.expires = 0
+        self.callback = callback
+        self.slot: Dict[int, "TimerEntry"] | None = None
+
+
+class TimerWheel:
+    """
+    Hierarchical timing wheel of `WHEEL_LEVELS` levels with `WHEEL_SIZE` slots each.
+
+    Level 0 slots hold entries expiring within the next `WHEEL_SIZE` ticks; each
+    higher level covers `WHEEL_SIZE` times the range of the level below. Entries in
+    a higher level slot are cascaded down when the wheel reaches that slot. Every
+    slot is a dict keyed by timer id, so insertion and removal are O(1).
+    """
+
+    def __init__(self):
+        """
+        Initializes an empty TimerWheel at tick 0.
+        """
+        self.current_tick = 0
+        self._levels: List[List[Dict[int, TimerEntry]]] = [
+            [{} for _ in range(WHEEL_SIZE)] for _ in range(WHEEL_LEVELS)
+        ]
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def insert(self, entry: TimerEntry):
+        """
+        Insert an entry by its absolute expiry tick.
+
+        Entries already due are placed in the current level 0 slot.
+
+        Args:
+            entry (TimerEntry): The entry to insert.
+        """
+        delta = max(entry.expires - self.current_tick, 0)
+        expires = self.current_tick + min(delta, WHEEL_SPAN - 1)
+        level = 0
+        while delta >= (1 << (WHEEL_BITS * (level + 1))) and level < WHEEL_LEVELS - 1:
+            level += 1
+        slot = self._levels[level][(expires >> (WHEEL_BITS * level)) & WHEEL_MASK]
+        slot[entry.tid] = entry
+        entry.slot = slot
+        self._count += 1
+
+    def remove(self, entry: TimerEntry):
+        """
+        Remove an entry from the wheel if it is scheduled.
+
+        Args:
+            entry (TimerEntry): The entry to remove.
+        """
+        if entry.slot is not None and entry.slot.pop(entry.tid, None) is not None:
+            self._count -= 1
+        entry.slot = None
+
+    def advance(self) -> List[TimerEntry]:
+        """
+        Advance the wheel by one tick.
+
+        Returns:
+            List[TimerEntry]: The entries expiring at the new current tick.
+        """
+        self.current_tick += 1
+        tick = self.current_tick
+        # cascade higher levels whose lower level has wrapped, top level first
+        cascade_levels = []
+        level = 1
+        while level < WHEEL_LEVELS and tick & ((1 << (WHEEL_BITS * level)) - 1) == 0:
+            cascade_levels.append(level)
+            level += 1
+        for level in reversed(cascade_levels):
+            index = (tick >> (WHEEL_BITS * level)) & WHEEL_MASK
+            entries = self._levels[level][index]
+            self._levels[level][index] = {}
+            self._count -= len(entries)
+            for entry in entries.values():
+                self.insert(entry)
+
+        due = self._levels[0][tick & WHEEL_MASK]
+        self._levels[0][tick & WHEEL_MASK] = {}
+        self._count -= len(due)
+        for entry in due.values():
+            entry.slot = None
+        return list(due.values())
+
+
 class TimerManager:
     """
     Centralized manager for creating, tracking, and controlling timers.
 
-    `TimerManager` operates an asynchronous event loop in a dedicated thread
-    to handle timer events efficiently without blocking the main application flow.
-    It provides an interface for adding, managing, and removing `BotTimer` instances.
+    `TimerManager` schedules all timers in a single `TimerWheel` that is driven by
+    one tick callback on the main event loop, and only while timers are pending.
+    It provides an interface for adding, managing, and removing `BotTimer`
+    instances and one-shot `call_later` callbacks.
     """
 
     def __init__(self) -> None:
         """
         Initializes a new TimerManager instance.
 
-        A new asyncio event loop is created and started in a separate thread.
-        Internal data structures for tracking timers are initialized, and a
-        unique ID counter for new timers is set up.
+        The manager is not bound to an event loop until `bind_loop` is called or a
+        timer is added from a running loop.
         """
-        self._run_thread: Thread | None = None
-        self._loop = asyncio.new_event_loop()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._loop_thread_id: int | None = None
+        self._wheel = TimerWheel()
+        self._start_time = 0.0
+        self._tick_handle: asyncio.TimerHandle | None = None
+        self._entries: Dict[int, TimerEntry] = {}
         self._timers: Dict[int, BotTimer] = {}
-        self._next_timer_id = 1
-        self._run_thread = Thread(target=self._start_run_thread)
-        self._run_thread.start()
+        self._unbound: List[tuple] = []  # (entry, delay) added before loop binding
+        self._batches = set()
+        self._timer_ids = itertools.count(1)
         logger.info("TimerManager initialised")
 
+    def bind_loop(self, loop: asyncio.AbstractEventLoop | None = None) -> None:
+        """
+        Bind the manager to the main event loop and schedule any pending timers.
+
+        Must be called from the thread running the loop.
+
+        Args:
+            loop (asyncio.AbstractEventLoop, optional): The main event loop. Defaults
+                                                        to the running loop.
+        """
+        loop = loop or asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        # timers scheduled on a previous loop are moved to the new loop
+        unbound, self._unbound = self._unbound, []
+        for entry in self._entries.values():
+            if entry.slot is not None:
+                remaining = entry.expires - self._wheel.current_tick
+                unbound.append((entry, max(remaining, 0) * TICK_SECONDS))
+        if self._tick_handle is not None:
+            self._tick_handle.cancel()
+            self._tick_handle = None
+
+        self._loop = loop
+        self._loop_thread_id = threading.get_ident()
+        self._start_time = loop.time()
+        self._wheel = TimerWheel()
+        for entry, delay in unbound:
+            self._schedule(entry, delay)
+
     def fini(self) -> None:
         """
         Finalizes and gracefully shuts down the TimerManager.
 
-        This method cancels all currently active timers and stops the underlying
-        asyncio event loop. It should be called when the `TimerManager` instance
-        is no longer required to ensure proper resource cleanup.
+        This method cancels all currently active timers and the tick callback.
+        It should be called when the `TimerManager` instance is no longer required
+        to ensure proper resource cleanup.
         """
         logger.info("Shutting down TimerManager")
-        if not self._run_thread:
-            return
-
-        for timer in list(
-            self._timers.values()
-        ):  # Iterate over a copy to allow modification
+        for timer in list(self._timers.values()):
             timer.cancel()
-
-        self._loop.call_soon_threadsafe(self._loop.stop)
+        for entry in list(self._entries.values()):
+            self._wheel.remove(entry)
+        if self._tick_handle is not None:
+            self._tick_handle.cancel()
+            self._tick_handle = None
         self._timers = {}
+        self._entries = {}
+        self._unbound = []
 
     def is_running(self) -> bool:
         """
-        Checks if the TimerManager's internal event loop thread is active.
+        Checks if the TimerManager is bound to a running event loop.
 
         Returns:
             bool: `True` if the timer manager is running, `False` otherwise.
         """
-        return self._run_thread is not None and self._run_thread.is_alive()
-
-    def _start_run_thread(self) -> None:
-        """
-        Internal method to start the asyncio event loop in a separate thread.
-
-        This method is executed by the dedicated thread created during
-        `TimerManager` initialization. It sets the event loop for the thread
-        and runs it indefinitely until explicitly stopped. Any exceptions
-        during the event loop's execution are logged.
-        """
-        try:
-            asyncio.set_event_loop(self._loop)
-            self._loop.run_forever()
-        except Exception as e:  # pylint: disable=broad-exception-caught
-            logger.error("Unable to run event loop, error %s", e)
-
-        self._run_thread = None
+        return self._loop is not None and self._loop.is_running()
 
     def add_timer(
         self,
@@ -161,11 +303,10 @@ class TimerManager:
         Returns:
             int: The unique ID assigned to the newly created timer.
         """
-        timer_id = self._next_timer_id
-        self._next_timer_id += 1
+        timer_id = next(self._timer_ids)
         self._timers[timer_id] = BotTimer(
             tid=timer_id,
-            loop=self._loop,
+            manager=self,
             client=client,
             init_start=init_start,
             interval=interval,
@@ -173,25 +314,59 @@ class TimerManager:
         )
         return timer_id
 
-    def add_task(self, coro) -> asyncio.Future:
+    def call_later(
+        self, delay: float, callback: Callable[..., Any | Awaitable[Any]], *args
+    ) -> int:
+        """
+        Schedules a one-shot callback.
+
+        The callback may be a plain function or a coroutine function; coroutines
+        are run as part of the tick batch in which the callback fires.
+
+        Args:
+            delay (float): Delay in seconds before the callback is called.
+            callback (Callable): The callback to call.
+            *args: Arguments passed to the callback.
+
+        Returns:
+            int: The unique ID of the scheduled callback, which can be cancelled
+                 with `del_timer`.
         """
-        Adds a coroutine to be executed within the timer manager's event loop.
+        timer_id = next(self._timer_ids)
 
-        This allows other asynchronous tasks to be scheduled and run in the
-        same event loop that manages the timers.
+        def fire():
+            self._entries.pop(timer_id, None)
+            return callback(*args)
+
+        self._schedule(TimerEntry(timer_id, fire), delay)
+        return timer_id
+
+    def add_task(self, coro) -> asyncio.Future | None:
+        """
+        Adds a coroutine to be executed within the main event loop.
 
         Args:
-            coro: The coroutine function or coroutine object to be executed.
+            coro: The coroutine object to be executed.
 
         Returns:
             asyncio.Future: A Future object representing the eventual result
                              of the coroutine's execution.
         """
+        if self._loop is None:
+            try:
+                self.bind_loop()
+            except RuntimeError:
+                logger.error("TimerManager: no event loop to run task")
+                coro.close()
+                return None
+
+        if self._on_loop_thread():
+            return self._loop.create_task(coro)
         return asyncio.run_coroutine_threadsafe(coro, self._loop)
 
     def del_timer(self, timer_id: int) -> None:
         """
-        Deletes and cancels a specific timer.
+        Deletes and cancels a specific timer or scheduled callback.
 
         If the timer with the given `timer_id` exists, it is cancelled and
         removed from the manager's tracking. An error is logged if the timer
@@ -200,13 +375,132 @@ class TimerManager:
         Args:
             timer_id (int): The unique ID of the timer to be deleted.
         """
-        if timer_id not in self._timers:
-            logger.error("Timer %d does not exist", timer_id)
+        if timer_id in self._timers:
+            self._timers.pop(timer_id).cancel()
             return
 
-        timer = self._timers[timer_id]
-        timer.cancel()
-        del self._timers[timer_id]
+        if timer_id in self._entries:
+            self._unschedule(self._entries[timer_id])
+            return
+
+        logger.error("Timer %d does not exist", timer_id)
+
+    def _on_loop_thread(self) -> bool:
+        """
+        Check if the caller runs on the thread of the bound event loop.
+
+        Returns:
+            bool: True if called from the loop thread.
+        """
+        return self._loop_thread_id == threading.get_ident()
+
+    def _schedule(self, entry: TimerEntry, delay: float) -> None:
+        """
+        Schedule an entry to expire after delay seconds.
+
+        Calls from other threads are marshalled onto the bound event loop.
+
+        Args:
+            entry (TimerEntry): The entry to schedule.
+            delay (float): Delay in seconds.
+        """
+        self._entries[entry.tid] = entry
+        if self._loop is None:
+            try:
+                self.bind_loop()
+            except RuntimeError:
+                self._unbound.append((entry, delay))
+                return
+
+        if not self._on_loop_thread():
+            self._loop.call_soon_threadsafe(self._insert, entry, delay)
+            return
+
+        self._insert(entry, delay)
+
+    def _insert(self, entry: TimerEntry, delay: float) -> None:
+        """
+        Insert an entry into the wheel, on the thread of the bound event loop.
+
+        Args:
+            entry (TimerEntry): The entry to insert.
+            delay (float): Delay in seconds.
+        """
+        if entry.tid not in self._entries:  # cancelled while being marshalled
+            return
+
+        now_tick = (self._loop.time() - self._start_time) / TICK_SECONDS
+        if len(self._wheel) == 0:
+            # nothing scheduled, skip the idle ticks
+            self._wheel.current_tick = max(self._wheel.current_tick, int(now_tick))
+        entry.expires = max(
+            math.ceil(now_tick + max(delay, 0) / TICK_SECONDS),
+            self._wheel.current_tick + 1,
+        )
+        self._wheel.insert(entry)
+        self._ensure_ticking()
+
+    def _unschedule(self, entry: TimerEntry) -> None:
+        """
+        Remove an entry from the wheel.
+
+        Args:
+            entry (TimerEntry): The entry to remove.
+        """
+        self._entries.pop(entry.tid, None)
+        if self._loop is not None and not self._on_loop_thread():
+            self._loop.call_soon_threadsafe(self._wheel.remove, entry)
+            return
+        self._wheel.remove(entry)
+
+    def _ensure_ticking(self) -> None:
+        """
+        Schedule the next tick callback if timers are pending.
+        """
+        if self._tick_handle is not None or len(self._wheel) == 0:
+            return
+        self._tick_handle = self._loop.call_at(
+            self._start_time + (self._wheel.current_tick + 1) * TICK_SECONDS,
+            self._on_tick,
+        )
+
+    def _on_tick(self) -> None:
+        """
+        Advance the wheel to the current time and fire all expired entries as one batch.
+        """
+        self._tick_handle = None
+        target_tick = int((self._loop.time() - self._start_time) / TICK_SECONDS)
+        pending = []
+        while self._wheel.current_tick < target_tick and len(self._wheel) > 0:
+            for entry in self._wheel.advance():
+                try:
+                    result = entry.callback()
+                except Exception as err:  # pylint: disable=broad-exception-caught
+                    logger.error("TimerManager: timer %d failed: %s", entry.tid, err)
+                    continue
+                if inspect.isawaitable(result):
+                    pending.append(result)
+
+        if len(self._wheel) == 0:
+            self._wheel.current_tick = max(self._wheel.current_tick, target_tick)
+
+        if pending:
+            batch = self._loop.create_task(self._run_batch(pending))
+            self._batches.add(batch)
+            batch.add_done_callback(self._batches.discard)
+        self._ensure_ticking()
+
+    async def _run_batch(self, pending: List[Awaitable]) -> None:
+        """
+        Run the coroutines of all timers fired in a tick concurrently.
+
+        Args:
+            pending (List[Awaitable]): The coroutines to run.
+        """
+        results = await asyncio.gather(*pending, return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error("TimerManager: timer callback failed: %s", result)
 
 
 class BotTimer:
@@ -215,25 +509,24 @@ class BotTimer:
 
     Each `BotTimer` is designed to fire repeatedly at specified intervals and
     is associated with a `TimerClient` that receives notifications when the
-    timer events occur.
+    timer events occur. The next interval starts once `on_timer` has completed.
     """
 
     def __init__(
         self,
         tid: int,
-        loop: asyncio.AbstractEventLoop,
+        manager: TimerManager,
         client: TimerClient,
         init_start: int = 0,
         interval: int = 1,
         repeats: int = -1,
     ):  # pylint: disable=too-many-arguments, too-many-positional-arguments
         """
-        Initializes a new BotTimer instance.
+        Initializes a new BotTimer instance and schedules its first event.
 
         Args:
             tid (int): The unique identifier for this timer.
-            loop (asyncio.AbstractEventLoop): The asyncio event loop on which
-                                              this timer's coroutine will run.
+            manager (TimerManager): The manager scheduling this timer.
             client (TimerClient): The client object that will receive `on_timer`
                                   and `on_timer_lapsed` callbacks.
             init_start (int, optional): The initial delay in seconds before the
@@ -244,38 +537,37 @@ class BotTimer:
                                      -1 indicates infinite repetitions. Defaults to -1.
         """
         self.id = tid
-        self._loop = loop
+        self._manager = manager
         self._client = client
-        self._init_start = init_start
         self._repeats = repeats
         self._interval = interval
         self._is_running = True
-        self._task = asyncio.run_coroutine_threadsafe(self._job(), self._loop)
+        self._entry = TimerEntry(tid, self._fire)
+        # pylint: disable=protected-access
+        self._manager._schedule(self._entry, init_start)
 
-    async def _job(self) -> None:
+    async def _fire(self) -> None:
         """
-        Internal asynchronous job that manages the timer's execution lifecycle.
-
-        This coroutine handles the initial delay, repeatedly calls the client's
-        `on_timer` method at the specified interval, manages the repetition count,
-        and finally invokes the client's `on_timer_lapsed` method when the
-        timer completes its cycle or is cancelled.
+        Notify the client and schedule the next event or complete the timer.
         """
-        if self._init_start > 0:
-            await asyncio.sleep(self._init_start)
+        if not self._is_running:
+            return
         await self._client.on_timer(self.id)
-        if self._repeats < 0:
-            while self._is_running:
-                await asyncio.sleep(self._interval)
-                await self._client.on_timer(self.id)
-        else:
-            while self._repeats > 0:
-                await asyncio.sleep(self._interval)
-                await self._client.on_timer(self.id)
+        if not self._is_running:
+            return
+
+        if self._repeats != 0:
+            if self._repeats > 0:
                 self._repeats -= 1
+            # pylint: disable=protected-access
+            self._manager._schedule(self._entry, self._interval)
+            return
 
-        await self._client.on_timer_lapsed(self.id)
         self._is_running = False
+        # pylint: disable=protected-access
+        self._manager._entries.pop(self.id, None)
+        self._manager._timers.pop(self.id, None)
+        await self._client.on_timer_lapsed(self.id)
 
     def is_active(self) -> bool:
         """
@@ -290,12 +582,11 @@ class BotTimer:
         """
         Cancels the timer, stopping any further scheduled events.
 
-        This method attempts to cancel the underlying asynchronous task and
-        marks the timer as inactive, preventing `on_timer` callbacks from
-        being invoked further.
+        This marks the timer as inactive and removes its pending event from the
+        timing wheel, preventing `on_timer` callbacks from being invoked further.
         """
-        self._task.cancel()
         self._is_running = False
+        self._manager._unschedule(self._entry)  # pylint: disable=protected-access
 
 
 # Global instance of TimerManager that can be imported and used throughout the application
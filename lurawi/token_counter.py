@@ -0,0 +1,195 @@
+"""
+Token Counter Module for the Lurawi System.
+
+This module counts and clips the tokens of texts with tiktoken, for the prompt
+building custom behaviours.
+
+Tokenizers are loaded on first use, or at startup for the models listed in the
+TokenizerPreload environment variable, from TIKTOKEN_CACHE_DIR, which defaults to
+the TokenizerDir environment variable or the bundled assets directory. The token
+counts of long texts are kept in an LRU cache of TokenCountCacheSize entries.
+
+calc_token_size and cut_string are also available from lurawi.utils.
+"""
+
+# pylint: disable=broad-exception-caught,import-outside-toplevel
+
+# tiktoken is imported by the functions that use it, so importing this module
+# does not slow down the cold start of the service.
+
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict
+
+# the lurawi logger, configured by lurawi.utils, which re-exports this module's helpers
+logger = logging.getLogger("lurawi")
+
+DEFAULT_TOKENIZER = "cl100k_base"
+BUNDLED_TOKENIZER_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.realpath(__file__))), "assets"
+)
+TOKEN_COUNT_CACHE_MIN_CHARS = 128
+
+_tokenizers: Dict[str, Any] = {}
+_tokenizer_lock = threading.Lock()
+_token_count_cache: OrderedDict = OrderedDict()
+_token_count_lock = threading.Lock()
+try:
+    _token_count_cache_size = max(int(os.environ.get("TokenCountCacheSize", 1024)), 0)
+except ValueError:
+    _token_count_cache_size = 1024
+
+
+def _resolve_tokenizer_name(model: str | None = None) -> str:
+    """Get the tiktoken encoding name for a model.
+
+    Args:
+        model: A model name, e.g. gpt-4o, or a tiktoken encoding name, e.g.
+            o200k_base. Defaults to the TokenizerEncoding environment variable,
+            or cl100k_base.
+
+    Returns:
+        str: The encoding name; the default one for unknown models.
+    """
+    default_name = os.environ.get("TokenizerEncoding", DEFAULT_TOKENIZER)
+    if not model or model == default_name:
+        return default_name
+    if model in _tokenizers:
+        return model
+
+    import tiktoken
+
+    if model in tiktoken.list_encoding_names():
+        return model
+    try:
+        return tiktoken.encoding_name_for_model(model)
+    except KeyError:
+        logger.debug("unknown tokenizer model %s, using %s", model, default_name)
+        return default_name
+
+
+def _get_tiktoken_tokenizer(tokenizer_name: str | None = None):
+    """Get a tiktoken tokenizer instance, loading it on first use.
+
+    The BPE files are read from TIKTOKEN_CACHE_DIR, which defaults to the
+    TokenizerDir environment variable or the bundled assets directory, so that
+    the tokenizers load without network access.
+
+    Args:
+        tokenizer_name: Name of the encoding to use, defaults to the
+            TokenizerEncoding environment variable, or cl100k_base
+
+    Returns:
+        tiktoken.Encoding: Tokenizer instance
+    """
+    tokenizer_name = tokenizer_name or os.environ.get(
+        "TokenizerEncoding", DEFAULT_TOKENIZER
+    )
+    tokenizer = _tokenizers.get(tokenizer_name)
+    if tokenizer is not None:
+        return tokenizer
+
+    with _tokenizer_lock:
+        if tokenizer_name not in _tokenizers:
+            if "TIKTOKEN_CACHE_DIR" not in os.environ:
+                tokenizer_dir = os.environ.get("TokenizerDir", BUNDLED_TOKENIZER_DIR)
+                if os.path.isdir(tokenizer_dir):
+                    os.environ["TIKTOKEN_CACHE_DIR"] = tokenizer_dir
+
+            import tiktoken
+
+            started = time.perf_counter()
+            _tokenizers[tokenizer_name] = tiktoken.get_encoding(tokenizer_name)
+            logger.info(
+                "tokenizer %s loaded in %.2fs",
+                tokenizer_name,
+                time.perf_counter() - started,
+            )
+    return _tokenizers[tokenizer_name]
+
+
+def preload_tokenizers():
+    """Load the tokenizers listed in the TokenizerPreload environment variable.
+
+    TokenizerPreload is a comma separated list of model or encoding names, and
+    defaults to the default encoding. Set it to an empty string to load the
+    tokenizers on first use instead. Loading them at startup keeps the first
+    turns of the service from waiting on the BPE files.
+    """
+    names = os.environ.get(
+        "TokenizerPreload", os.environ.get("TokenizerEncoding", DEFAULT_TOKENIZER)
+    )
+    for name in names.split(","):
+        name = name.strip()
+        if not name:
+            continue
+        try:
+            _get_tiktoken_tokenizer(_resolve_tokenizer_name(name))
+        except Exception as err:
+            logger.error("unable to preload tokenizer %s: %s", name, err)
+
+
+def calc_token_size(text: str, model: str | None = None) -> int:
+    """Calculate the number of tokens in a text string.
+
+    The counts of texts of TOKEN_COUNT_CACHE_MIN_CHARS characters or more are
+    kept in an LRU cache keyed by the hash of the text, so that system prompts
+    and documents repeated on every turn are only encoded once. The cache holds
+    TokenCountCacheSize counts (defaults to 1024, 0 disables it).
+
+    Args:
+        text: The text to tokenize
+        model: The model or encoding name, defaults to the default encoding
+
+    Returns:
+        int: Number of tokens in the text
+    """
+    tokenizer_name = _resolve_tokenizer_name(model)
+    tokenizer = _get_tiktoken_tokenizer(tokenizer_name)
+
+    if _token_count_cache_size == 0 or len(text) < TOKEN_COUNT_CACHE_MIN_CHARS:
+        return len(tokenizer.encode(text))
+
+    key = (
+        tokenizer_name,
+        hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest(),
+    )
+    with _token_count_lock:
+        count = _token_count_cache.get(key)
+        if count is not None:
+            _token_count_cache.move_to_end(key)
+            return count
+
+    count = len(tokenizer.encode(text))
+    with _token_count_lock:
+        _token_count_cache[key] = count
+        if len(_token_count_cache) > _token_count_cache_size:
+            _token_count_cache.popitem(last=False)
+    return count
+
+
+def cut_string(s, n_tokens=2500, model: str | None = None):
+    """Cut a string to a maximum number of tokens.
+
+    Args:
+        s: The string to cut
+        n_tokens: Maximum number of tokens to keep
+        model: The model or encoding name, defaults to the default encoding
+
+    Returns:
+        str: The original string if it's shorter than n_tokens,
+             otherwise the string cut to n_tokens
+    """
+    # cuts of string based on number of tokens
+    tokenizer = _get_tiktoken_tokenizer(_resolve_tokenizer_name(model))
+    encoded_string = tokenizer.encode(s)
+    if len(encoded_string) == 1:
+        return tokenizer.decode_single_token_bytes(encoded_string)
+    elif len(encoded_string) <= n_tokens:
+        return tokenizer.decode(encoded_string)
+    else:
+        return tokenizer.decode(encoded_string[:n_tokens])
@@ -0,0 +1,445 @@
+"""
+Tracing Module for the Lurawi System.
+
+This module records a trace of each conversation turn, made of a span for the turn,
+a span for each action element it plays, including chained actions, a span for
+each custom behaviour `run`, and a span for each remote callback received while
+the turn is running. The time between the end of a custom `run` span and the end
+of its action element span is spent waiting, e.g. for a remote callback.
+
+Traces are sampled once the turn has finished (tail-based sampling): a trace is
+kept if the turn took longer than TraceSlowTurnMs milliseconds (defaults to 1000)
+or any of its spans failed; other traces are kept with probability
+TraceSampleRate (defaults to 0). Kept traces go into a ring buffer of the last
+TraceBufferSize traces (defaults to 100), served by the /traces webhook handler,
+and are appended to TraceExportFile, if set, as JSON lines in the Lurawi format
+or, with TraceExportFormat set to "otlp", as OTLP JSON requests.
+
+Tracing is only enabled when the TracingEnabled environment variable is set to
+"1", in which case the workflow engine subscribes the tracer to the
+instrumentation hooks of the action runner.
+
+The module creates a global Tracer instance (tracer) that can be imported and used
+throughout the application.
+"""
+
+import os
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Dict, List
+
+import simplejson as json
+
+from lurawi.executors import ioExecutor
+from lurawi.hooks import HookRegistry
+from lurawi.utils import logger
+
+SPAN_OK = "ok"
+SPAN_ERROR = "error"
+SPAN_UNFINISHED = "unfinished"
+
+
+class Span:
+    """
+    A timed operation within a trace.
+    """
+
+    __slots__ = (
+        "span_id",
+        "parent_id",
+        "name",
+        "kind",
+        "start_time",
+        "start",
+        "end",
+        "status",
+        "attributes",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        kind: str,
+        parent_id: str | None,
+        attributes: Dict,
+        elapsed: float = 0.0,
+    ):
+        """
+        Initializes a new Span.
+
+        Args:
+            name (str): The span name, e.g. the action tag.
+            kind (str): The span kind, e.g. `turn`, `primitive` or `custom`.
+            parent_id (str | None): The parent span ID, None for the root span.
+            attributes (Dict): Additional span attributes.
+            elapsed (float): Seconds since the span started, 0 to start it now.
+        """
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.start_time = time.time() - elapsed
+        self.start = time.perf_counter() - elapsed
+        self.end: float | None = None
+        self.status = SPAN_OK
+        self.attributes = attributes
+
+    @property
+    def duration(self) -> float:
+        """
+        Returns:
+            float: The span duration in seconds, up to now if it has not ended.
+        """
+        return (self.end or time.perf_counter()) - self.start
+
+    def to_dict(self) -> Dict:
+        """
+        Returns:
+            Dict: The span as a JSON-serialisable dictionary.
+        """
+        return {
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start_time": self.start_time,
+            "duration_ms": round(self.duration * 1000, 3),
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+class Trace:
+    """
+    The spans of a conversation turn.
+    """
+
+    def __init__(self, name: str, attributes: Dict):
+        """
+        Initializes a new Trace and starts its root span.
+
+        Args:
+            name (str): The root span name.
+            attributes (Dict): The root span attributes.
+        """
+        self.trace_id = uuid.uuid4().hex
+        self.root = Span(name, "turn", None, attributes)
+        self.spans: List[Span] = [self.root]
+        self.finished = False
+        # open spans of the running action elements and custom runs, by tag
+        self.alet_spans: Dict[str, Span] = {}
+        self.run_spans: Dict[str, Span] = {}
+
+    def start_span(
+        self,
+        name: str,
+        kind: str,
+        parent: Span | None = None,
+        elapsed: float = 0.0,
+        **attributes,
+    ):
+        """
+        Start a span in this trace.
+
+        Args:
+            name (str): The span name.
+            kind (str): The span kind.
+            parent (Span | None): The parent span, defaults to the root span.
+            elapsed (float): Seconds since the span started, 0 to start it now.
+            **attributes: Additional span attributes.
+
+        Returns:
+            Span | None: The span, or None if the trace has already finished.
+        """
+        if self.finished:
+            return None
+        span = Span(name, kind, (parent or self.root).span_id, attributes, elapsed)
+        self.spans.append(span)
+        return span
+
+    def end_span(self, span: Span | None, status: str = SPAN_OK):
+        """
+        End a span of this trace; ignored once the trace has finished.
+
+        Args:
+            span (Span | None): The span to end.
+            status (str): The span status.
+        """
+        if span is None or self.finished or span.end is not None:
+            return
+        span.end = time.perf_counter()
+        span.status = status
+
+    @property
+    def failed(self) -> bool:
+        """
+        Returns:
+            bool: Whether any span of this trace failed.
+        """
+        return any(span.status == SPAN_ERROR for span in self.spans)
+
+    def to_dict(self) -> Dict:
+        """
+        Returns:
+            Dict: The trace as a JSON-serialisable dictionary.
+        """
+        return {
+            "trace_id": self.trace_id,
+            "start_time": self.root.start_time,
+            "duration_ms": round(self.root.duration * 1000, 3),
+            "failed": self.failed,
+            "spans": [span.to_dict() for span in self.spans],
+        }
+
+    def to_otlp(self) -> Dict:
+        """
+        Returns:
+            Dict: The trace as an OTLP JSON ExportTraceServiceRequest.
+        """
+        spans = []
+        for span in self.spans:
+            start_ns = int(span.start_time * 1e9)
+            otlp_span = {
+                "traceId": self.trace_id,
+                "spanId": span.span_id,
+                "name": span.name,
+                "kind": 1,  # SPAN_KIND_INTERNAL
+                "startTimeUnixNano": str(start_ns),
+                "endTimeUnixNano": str(start_ns + int(span.duration * 1e9)),
+                "attributes": [
+                    {"key": key, "value": {"stringValue": str(value)}}
+                    for key, value in {
+                        "lurawi.kind": span.kind,
+                        "lurawi.status": span.status,
+                        **span.attributes,
+                    }.items()
+                ],
+                "status": {"code": 2 if span.status == SPAN_ERROR else 1},
+            }
+            if span.parent_id:
+                otlp_span["parentSpanId"] = span.parent_id
+            spans.append(otlp_span)
+
+        return {
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": [
+                            {
+                                "key": "service.name",
+                                "value": {
+                                    "stringValue": os.getenv("PROJECT_NAME", "lurawi")
+                                },
+                            }
+                        ]
+                    },
+                    "scopeSpans": [{"scope": {"name": "lurawi"}, "spans": spans}],
+                }
+            ]
+        }
+
+
+class Tracer:
+    """
+    Starts turn traces and keeps the slow and failed ones.
+    """
+
+    def __init__(self):
+        """
+        Initializes a new Tracer from the tracing environment variables.
+        """
+        self.enabled = os.environ.get("TracingEnabled", "0") == "1"
+        self.slow_threshold = self._get_env_float("TraceSlowTurnMs", 1000.0) / 1000
+        self.sample_rate = self._get_env_float("TraceSampleRate", 0.0)
+        self.export_path = os.environ.get("TraceExportFile", "")
+        self.export_format = os.environ.get("TraceExportFormat", "jsonl").lower()
+        buffer_size = int(self._get_env_float("TraceBufferSize", 100.0)) or 100
+        self._traces: deque = deque(maxlen=buffer_size)
+        self._export_lock = threading.Lock()
+        # traces of the running turns, by activity manager
+        self._running: Dict[object, Trace] = {}
+
+    def subscribe(self, hooks: HookRegistry):
+        """
+        Subscribe the tracer to the instrumentation hooks of the action runner.
+
+        Args:
+            hooks (HookRegistry): The hook registry.
+        """
+        hooks.subscribe("before_turn", self._on_before_turn)
+        hooks.subscribe("after_turn", self._on_after_turn)
+        hooks.subscribe("before_alet", self._on_before_alet)
+        hooks.subscribe("after_alet", self._on_after_alet)
+        hooks.subscribe("custom_start", self._on_custom_start)
+        hooks.subscribe("custom_end", self._on_custom_end)
+        hooks.subscribe("remote_callback", self._on_remote_callback)
+
+    def _on_before_turn(self, manager):
+        """Start the trace of a turn."""
+        self._running[manager] = self.start_trace(
+            "turn", uid=manager.knowledge["USER_ID"]
+        )
+
+    def _on_after_turn(self, manager, outcome: str, elapsed: float):
+        """Finish the trace of a turn."""
+        trace = self._running.pop(manager, None)
+        if trace is None:
+            return
+        trace.root.attributes.update(
+            session_id=manager.knowledge.get("CURRENT_SESSION_ID") or "",
+            activity_id=manager.knowledge.get("CURRENT_TURN_CONTEXT") or "",
+            outcome=outcome,
+        )
+        self.finish_trace(trace, SPAN_OK if outcome == "completed" else SPAN_ERROR)
+
+    def _on_before_alet(self, manager, tag: str, cmd: str):
+        """Start the span of an action element."""
+        trace = self._running.get(manager)
+        if trace is not None:
+            trace.alet_spans[tag] = trace.start_span(
+                tag, "custom" if cmd == "custom" else "primitive"
+            )
+
+    def _on_after_alet(
+        self, manager, tag: str, cmd: str, succeeded: bool, elapsed: float
+    ):
+        """End the span of an action element."""
+        trace = self._running.get(manager)
+        if trace is not None:
+            trace.end_span(
+                trace.alet_spans.pop(tag, None), SPAN_OK if succeeded else SPAN_ERROR
+            )
+
+    def _on_custom_start(self, manager, tag: str, custom):
+        """Start the span of a custom behaviour run."""
+        trace = self._running.get(manager)
+        if trace is not None:
+            trace.run_spans[tag] = trace.start_span(
+                f"{tag}.run", "custom_run", trace.alet_spans.get(tag)
+            )
+
+    def _on_custom_end(self, manager, tag: str, custom, elapsed: float):
+        """End the span of a custom behaviour run."""
+        trace = self._running.get(manager)
+        if trace is not None:
+            trace.end_span(trace.run_spans.pop(tag, None))
+
+    def _on_remote_callback(self, manager, method: str, elapsed: float):
+        """Add the span of a processed remote callback."""
+        trace = self._running.get(manager)
+        if trace is not None:
+            trace.end_span(
+                trace.start_span(
+                    f"remote_callback.{method}", "remote_callback", elapsed=elapsed
+                )
+            )
+
+    @staticmethod
+    def _get_env_float(name: str, default: float) -> float:
+        """
+        Get a non-negative number setting from an environment variable.
+
+        Args:
+            name (str): The environment variable name.
+            default (float): Returned if the variable is not set or invalid.
+
+        Returns:
+            float: The setting value.
+        """
+        try:
+            value = float(os.environ.get(name, default))
+        except ValueError:
+            logger.warning("invalid %s, using default %s", name, default)
+            return default
+        return value if value >= 0 else default
+
+    def start_trace(self, name: str, **attributes) -> Trace | None:
+        """
+        Start the trace of a turn.
+
+        Args:
+            name (str): The root span name.
+            **attributes: The root span attributes.
+
+        Returns:
+            Trace | None: The trace, or None if tracing is disabled.
+        """
+        if not self.enabled:
+            return None
+        return Trace(name, attributes)
+
+    def finish_trace(self, trace: Trace | None, status: str = SPAN_OK):
+        """
+        Finish a trace and keep it if it is slow, failed or sampled.
+
+        Spans still open, e.g. actions continuing after the turn, are ended as
+        unfinished.
+
+        Args:
+            trace (Trace | None): The trace to finish.
+            status (str): The root span status.
+        """
+        if trace is None or trace.finished:
+            return
+        trace.end_span(trace.root, status)
+        for span in trace.spans:
+            trace.end_span(span, SPAN_UNFINISHED)
+        trace.finished = True
+
+        if (
+            trace.root.duration < self.slow_threshold
+            and not trace.failed
+            and random.random() >= self.sample_rate
+        ):
+            return
+
+        self._traces.append(trace)
+        if self.export_path:
+            record = (
+                trace.to_otlp() if self.export_format == "otlp" else trace.to_dict()
+            )
+            ioExecutor.pool.submit(self._export, record)
+
+    def _export(self, record: Dict):
+        """
+        Append a trace record to the export file, on an I/O executor thread.
+
+        Args:
+            record (Dict): The trace record.
+        """
+        try:
+            with (
+                self._export_lock,
+                open(self.export_path, "a", encoding="utf-8") as export_file,
+            ):
+                export_file.write(json.dumps(record) + "\n")
+        except OSError as err:
+            logger.error(
+                "tracer: unable to export trace to %s: %s", self.export_path, err
+            )
+
+    def get_traces(self, limit: int = 10, slow_only: bool = True) -> List[Dict]:
+        """
+        Get the most recent kept traces, newest first.
+
+        Args:
+            limit (int): The maximum number of traces.
+            slow_only (bool): Only return traces over the slow turn threshold.
+
+        Returns:
+            List[Dict]: The traces.
+        """
+        traces = []
+        for trace in reversed(self._traces):
+            if len(traces) >= limit:
+                break
+            if slow_only and trace.root.duration < self.slow_threshold:
+                continue
+            traces.append(trace.to_dict())
+        return traces
+
+
+tracer = Tracer()
@@ -0,0 +1,311 @@
+"""
+Traffic Capture Module for the Lurawi System.
+
+This module records the /message traffic of the workflow service, so it can be
+replayed against a local engine (see benchmarks/replay.py) to validate capacity
+against real traffic shapes.
+
+Each /message request is recorded as a JSON line with its arrival time, path,
+sanitized payload, response status and latency. The latency is measured until the
+last byte of the response has been sent, so streamed responses are timed in full.
+
+Payloads are sanitized before they are recorded:
+- `uid` and `name` are replaced by a keyed hash (HMAC-SHA256), so the turns of a
+  user can still be replayed in order. The key is the TrafficCaptureSalt
+  environment variable; when it is unset a random key is generated per process,
+  so pseudonyms then only stay stable until the server restarts
+- Values of keys listed in TrafficCaptureRedactKeys (comma separated, defaults to
+  api_key, authorization, password, secret and token) are redacted at any depth
+
+Records are batched in memory and appended on the I/O executor, every second or
+once CAPTURE_BATCH_SIZE records are waiting, so the event loop never writes files.
+The capture file is rotated once it exceeds TrafficCaptureMaxMB megabytes
+(defaults to 100), keeping TrafficCaptureBackups rotated files (defaults to 5).
+
+Capture is only enabled when the TrafficCaptureFile environment variable is set to
+the path of the capture file.
+
+The module creates a global TrafficCapture instance (trafficCapture) that can be
+imported and used throughout the application.
+"""
+
+import asyncio
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from typing import Any, List
+
+import simplejson as json
+
+from lurawi.executors import ioExecutor
+from lurawi.utils import logger
+
+CAPTURE_BATCH_SIZE = 100
+CAPTURE_FLUSH_INTERVAL = 1.0
+DEFAULT_REDACT_KEYS = "api_key,authorization,password,secret,token"
+REDACTED = "[REDACTED]"
+
+
+class TrafficCapture:
+    """
+    Batched writer of the captured /message traffic.
+    """
+
+    def __init__(self):
+        """
+        Initializes a new TrafficCapture from the capture environment variables.
+        """
+        self.path = os.environ.get("TrafficCaptureFile", "")
+        self.enabled = bool(self.path)
+        self.max_bytes = int(
+            self._get_env_float("TrafficCaptureMaxMB", 100.0) * 1024 * 1024
+        )
+        self.backups = int(self._get_env_float("TrafficCaptureBackups", 5.0))
+        self.redact_keys = frozenset(
+            key.strip().lower()
+            for key in os.environ.get(
+                "TrafficCaptureRedactKeys", DEFAULT_REDACT_KEYS
+            ).split(",")
+            if key.strip()
+        )
+        salt = os.environ.get("TrafficCaptureSalt", "")
+        self._hash_key = salt.encode("utf-8") if salt else secrets.token_bytes(32)
+        self._pending: List[str] = []
+        self._flusher: asyncio.Task | None = None
+        self._write_lock = threading.Lock()
+
+    @staticmethod
+    def _get_env_float(name: str, default: float) -> float:
+        """
+        Get a non-negative number setting from an environment variable.
+
+        Args:
+            name (str): The environment variable name.
+            default (float): The value used when the variable is unset or invalid.
+
+        Returns:
+            float: The setting value.
+        """
+        try:
+            value = float(os.environ.get(name, default))
+        except ValueError:
+            logger.warning("traffic capture: invalid %s, using %s", name, default)
+            return default
+        return value if value >= 0 else default
+
+    def hash_id(self, value: Any) -> str:
+        """
+        Args:
+            value (Any): A user id or name.
+
+        Returns:
+            str: A pseudonym of the value, keyed so it cannot be reversed by
+                 hashing candidate ids.
+        """
+        digest = hmac.new(
+            self._hash_key, str(value).encode("utf-8"), hashlib.sha256
+        ).hexdigest()
+        return "u" + digest[:16]
+
+    def sanitize(self, payload: Any, depth: int = 0) -> Any:
+        """
+        Pseudonymise the user and redact the secret values of a payload.
+
+        Args:
+            payload (Any): The request payload, or a part of it.
+            depth (int): The nesting depth of the part.
+
+        Returns:
+            Any: A sanitized copy of the payload.
+        """
+        if isinstance(payload, dict):
+            sanitized = {}
+            for key, value in payload.items():
+                if str(key).lower() in self.redact_keys:
+                    sanitized[key] = REDACTED
+                elif depth == 0 and key in ("uid", "name"):
+                    sanitized[key] = self.hash_id(value)
+                else:
+                    sanitized[key] = self.sanitize(value, depth + 1)
+            return sanitized
+        if isinstance(payload, list):
+            return [self.sanitize(value, depth + 1) for value in payload]
+        return payload
+
+    def record(
+        self,
+        path: str,
+        received: float,
+        body: bytes,
+        status: int,
+        latency: float,
+    ):
+        """
+        Queue a captured request for writing.
+
+        Args:
+            path (str): The request path.
+            received (float): The UNIX time the request was received.
+            body (bytes): The raw request body.
+            status (int): The response status.
+            latency (float): The seconds until the response was sent.
+        """
+        try:
+            payload = self.sanitize(json.loads(body)) if body else None
+        except ValueError:
+            payload = None
+        self._pending.append(
+            json.dumps(
+                {
+                    "ts": round(received, 6),
+                    "path": path,
+                    "status": status,
+                    "latency_ms": round(latency * 1000, 3),
+                    "request_bytes": len(body),
+                    "payload": payload,
+                }
+            )
+        )
+        if len(self._pending) >= CAPTURE_BATCH_SIZE:
+            self._flush()
+
+    def start(self):
+        """
+        Start flushing the captured requests periodically, if capture is enabled.
+        """
+        if not self.enabled:
+            return
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.get_running_loop().create_task(
+                self._flush_periodically()
+            )
+        logger.info("traffic capture: recording /message requests to %s", self.path)
+        if not os.environ.get("TrafficCaptureSalt"):
+            logger.warning(
+                "traffic capture: TrafficCaptureSalt is not set, user pseudonyms "
+                "change when the server restarts"
+            )
+
+    def stop(self):
+        """
+        Stop the periodic flush and write the remaining captured requests.
+        """
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+        lines, self._pending = self._pending, []
+        if lines:
+            self._write(lines)
+
+    async def _flush_periodically(self):
+        """
+        Flush the captured requests every CAPTURE_FLUSH_INTERVAL seconds.
+        """
+        while True:
+            await asyncio.sleep(CAPTURE_FLUSH_INTERVAL)
+            self._flush()
+
+    def _flush(self):
+        """
+        Hand the captured requests over to the I/O executor.
+        """
+        if not self._pending:
+            return
+        lines, self._pending = self._pending, []
+        ioExecutor.pool.submit(self._write, lines)
+
+    def _write(self, lines: List[str]):
+        """
+        Append captured requests to the capture file, rotating it when full.
+
+        Args:
+            lines (List[str]): The JSON lines of the requests.
+        """
+        try:
+            with self._write_lock:
+                self._rotate_if_full()
+                with open(self.path, "a", encoding="utf-8") as capture_file:
+                    capture_file.write("\n".join(lines) + "\n")
+        except OSError as err:
+            logger.error(
+                "traffic capture: unable to write %d requests to %s: %s",
+                len(lines),
+                self.path,
+                err,
+            )
+
+    def _rotate_if_full(self):
+        """
+        Rename a full capture file to <path>.1, shifting older rotated files.
+        """
+        if not self.max_bytes or not os.path.exists(self.path):
+            return
+        if os.path.getsize(self.path) < self.max_bytes:
+            return
+        if self.backups == 0:
+            os.remove(self.path)
+            return
+        for index in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{index}"):
+                os.replace(f"{self.path}.{index}", f"{self.path}.{index + 1}")
+        os.replace(self.path, f"{self.path}.1")
+
+
+trafficCapture = TrafficCapture()
+
+
+class TrafficCaptureMiddleware:
+    """
+    ASGI middleware recording the /message requests of the workflow service.
+    """
+
+    def __init__(self, app, capture: TrafficCapture = trafficCapture):
+        """
+        Initializes a new TrafficCaptureMiddleware.
+
+        Args:
+            app: The ASGI application.
+            capture (TrafficCapture): The capture writer.
+        """
+        self.app = app
+        self.capture = capture
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["method"] != "POST"
+            or not scope["path"].endswith("/message")
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        received = time.time()
+        started = time.perf_counter()
+        chunks: List[bytes] = []
+        status = 500
+
+        async def capture_receive():
+            message = await receive()
+            if message["type"] == "http.request":
+                chunks.append(message.get("body", b""))
+            return message
+
+        async def capture_send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, capture_receive, capture_send)
+        finally:
+            self.capture.record(
+                scope["path"],
+                received,
+                b"".join(chunks),
+                status,
+                time.perf_counter() - started,
+            )
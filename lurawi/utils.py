@@ -4,7 +4,6 @@ This module provides a collection of utility functions for various operations in
 - Authentication and access control
 - Encryption and decryption
 - Time formatting
-- Token calculation and string manipulation
 - Azure and AWS storage operations
 - HTTP request handling
 - JSON processing
@@ -15,6 +14,11 @@ and abstract away implementation details of various operations.
 """
 
 # pylint: disable=broad-exception-caught,global-statement,dangerous-default-value
+# pylint: disable=import-outside-toplevel
+
+# Heavy dependencies, such as the storage SDKs, aiohttp, requests and pycryptodome,
+# are imported by the functions that use them, so importing this module does not
+# slow down the cold start of the service.
 
 import re
 import base64
@@ -28,19 +32,16 @@ import tempfile
 from io import StringIO, BytesIO
 from typing import Dict
 
-import aiofiles as aiof
-import aiohttp
-import boto3
-import requests
 import simplejson as json
-import tiktoken
 
-from azure.storage.blob.aio import BlobClient as AsyncBlobClient
-from azure.storage.blob import BlobClient
-from Crypto.Cipher import AES
 from fastapi import Request
 from fastapi.responses import JSONResponse
 
+from lurawi.http_sessions import httpSessions
+
+# token helpers moved to lurawi.token_counter, re-exported for custom modules
+from lurawi.token_counter import calc_token_size, cut_string
+
 logger = logging.getLogger("lurawi")
 logger.addHandler(logging.StreamHandler())
 
@@ -49,7 +50,6 @@ logger.setLevel(os.environ.get("LOGLEVEL", "INFO"))
 no_auth = False
 ssl_verify = True
 in_dev = False
-_tiktokeniser = None
 _aws_sticky_cookie = None
 _dev_stream_handler = None
 
@@ -203,6 +203,8 @@ def _decrypt_content(key, content):
     tag = content[16:32]
     data = content[32:]
     try:
+        from Crypto.Cipher import AES
+
         cipher = AES.new(key, AES.MODE_EAX, nonce)
         text = cipher.decrypt_and_verify(data, tag)
     except Exception as e:
@@ -225,6 +227,8 @@ def _encrypt_content(key, content, infile=True):
         str or bytes: Path to temporary file containing encrypted content if infile=True,
                       otherwise encrypted content as bytes
     """
+    from Crypto.Cipher import AES
+
     # use the cipher to encrypt the padded message
     cipher = AES.new(key, AES.MODE_EAX)
     ciphertext, tag = cipher.encrypt_and_digest(content.encode("utf-8"))
@@ -271,64 +275,6 @@ def time2str(time_int):
     return timestr.lstrip()
 
 
-def _get_tiktoken_tokenizer(tokenizer_name="cl100k_base"):
-    """Get a tiktoken tokenizer instance.
-
-    Args:
-        tokenizer_name: Name of the tokenizer to use
-        logger: Optional logger instance (not used)
-        state: Optional state object (not used)
-
-    Returns:
-        tiktoken.Encoding: Tokenizer instance
-    """
-    tokenizer = tiktoken.get_encoding(tokenizer_name)
-    return tokenizer
-
-
-def calc_token_size(text: str) -> int:
-    """Calculate the number of tokens in a text string.
-
-    Args:
-        text: The text to tokenize
-
-    Returns:
-        int: Number of tokens in the text
-    """
-    global _tiktokeniser
-
-    if not _tiktokeniser:
-        _tiktokeniser = _get_tiktoken_tokenizer()
-    return len(_tiktokeniser.encode(text))
-
-
-def cut_string(s, n_tokens=2500):
-    """Cut a string to a maximum number of tokens.
-
-    Args:
-        s: The string to cut
-        n_tokens: Maximum number of tokens to keep
-        logger: Optional logger instance (not used)
-        state: Optional state object (not used)
-
-    Returns:
-        str: The original string if it's shorter than n_tokens,
-             otherwise the string cut to n_tokens
-    """
-    # cuts of string based on number of tokens
-    global _tiktokeniser
-
-    if not _tiktokeniser:
-        _tiktokeniser = _get_tiktoken_tokenizer()
-    encoded_string = _tiktokeniser.encode(s)
-    if len(encoded_string) == 1:
-        return _tiktokeniser.decode_single_token_bytes(encoded_string)
-    elif len(encoded_string) <= n_tokens:
-        return _tiktokeniser.decode(encoded_string)
-    else:
-        return _tiktokeniser.decode(encoded_string[:n_tokens])
-
-
 def get_stickyness_cookie():
     """Get the AWS sticky session cookie if available and not expired.
 
@@ -372,6 +318,8 @@ def get_content_from_azure_storage(
     if "AzureWebJobsStorage" in os.environ:
         connect_string = os.environ["AzureWebJobsStorage"]
         try:
+            from azure.storage.blob import BlobClient
+
             blob = BlobClient.from_connection_string(
                 conn_str=connect_string, container_name=container, blob_name=filepath
             )
@@ -401,10 +349,14 @@ async def aget_content_from_azure_storage(filepath, container="llmservicedata"):
     Returns:
         str or bytes or None: File content if successful, None otherwise
     """
+    import aiofiles as aiof
+
     content = None
     if "AzureWebJobsStorage" in os.environ:
         connect_string = os.environ["AzureWebJobsStorage"]
         try:
+            from azure.storage.blob.aio import BlobClient as AsyncBlobClient
+
             blob = AsyncBlobClient.from_connection_string(
                 conn_str=connect_string, container_name=container, blob_name=filepath
             )
@@ -436,6 +388,8 @@ def save_content_to_azure_storage(filepath, content_file, container="llmservice_
     if "AzureWebJobsStorage" in os.environ:
         connect_string = os.environ["AzureWebJobsStorage"]
         try:
+            from azure.storage.blob import BlobClient
+
             blob = BlobClient.from_connection_string(
                 conn_str=connect_string, container_name=container, blob_name=filepath
             )
@@ -477,9 +431,13 @@ async def asave_content_to_azure_storage(
     Returns:
         bool: True if content was saved successfully, False otherwise
     """
+    import aiofiles as aiof
+
     if "AzureWebJobsStorage" in os.environ:
         connect_string = os.environ["AzureWebJobsStorage"]
         try:
+            from azure.storage.blob.aio import BlobClient as AsyncBlobClient
+
             blob = AsyncBlobClient.from_connection_string(
                 conn_str=connect_string, container_name=container, blob_name=filepath
             )
@@ -532,6 +490,8 @@ def get_content_from_aws_s3(filepath, container="llamservice_data", as_binary=Fa
     """
     content = None
     if "AWS_ACCESS_KEY_ID" in os.environ and "AWS_SECRET_ACCESS_KEY" in os.environ:
+        import boto3
+
         s3_client = boto3.client("s3")
         try:
             blobio = None
@@ -569,18 +529,18 @@ async def aget_data_from_url(headers, url):
     url_status = 404
     try:
         result = None
-        async with aiohttp.ClientSession(headers=headers) as session:
-            while url_status == 404 and retries < 4:
-                async with session.get(url, ssl=ssl_verify) as r:
-                    url_status = r.status
-                    if url_status == 404:
-                        retries += 1
-                        continue
-                    try:
-                        result = await r.json()
-                    except Exception as _:
-                        result = None
-            return url_status, result
+        session = httpSessions.get_session()
+        while url_status == 404 and retries < 4:
+            async with session.get(url, headers=headers, ssl=ssl_verify) as r:
+                url_status = r.status
+                if url_status == 404:
+                    retries += 1
+                    continue
+                try:
+                    result = await r.json()
+                except Exception as _:
+                    result = None
+        return url_status, result
     except Exception as err:
         logger.error(
             "aget_data_from_url: failed to retrieve data from url %s: error %s",
@@ -607,27 +567,31 @@ async def apost_payload_to_url(
                (None, error) if an error occurred
     """
     try:
-        async with aiohttp.ClientSession(headers=headers) as session:
-            if use_put:
-                async with session.put(url, json=payload, ssl=ssl_verify) as r:
+        session = httpSessions.get_session()
+        if use_put:
+            async with session.put(
+                url, json=payload, headers=headers, ssl=ssl_verify
+            ) as r:
+                result = None
+                try:
+                    result = await r.json()
+                    if use_stickyness:
+                        _set_stickyness_cookie(r.cookies)
+                except Exception as _:
                     result = None
-                    try:
-                        result = await r.json()
-                        if use_stickyness:
-                            _set_stickyness_cookie(r.cookies)
-                    except Exception as _:
-                        result = None
-                    return r.status, result
-            else:
-                async with session.post(url, json=payload, ssl=ssl_verify) as r:
+                return r.status, result
+        else:
+            async with session.post(
+                url, json=payload, headers=headers, ssl=ssl_verify
+            ) as r:
+                result = None
+                try:
+                    result = await r.json()
+                    if use_stickyness:
+                        _set_stickyness_cookie(r.cookies)
+                except Exception as _:
                     result = None
-                    try:
-                        result = await r.json()
-                        if use_stickyness:
-                            _set_stickyness_cookie(r.cookies)
-                    except Exception as _:
-                        result = None
-                    return r.status, result
+                return r.status, result
     except Exception as err:
         logger.error(
             "apost_payload_to_url: failed to post json payload to url %s: error %s",
@@ -652,27 +616,31 @@ async def apost_data_to_url(headers, url, data, use_put=False, use_stickyness=Fa
                (None, error) if an error occurred
     """
     try:
-        async with aiohttp.ClientSession(headers=headers) as session:
-            if use_put:
-                async with session.put(url, data=data, ssl=ssl_verify) as r:
+        session = httpSessions.get_session()
+        if use_put:
+            async with session.put(
+                url, data=data, headers=headers, ssl=ssl_verify
+            ) as r:
+                result = None
+                try:
+                    result = await r.json()
+                    if use_stickyness:
+                        _set_stickyness_cookie(r.cookies)
+                except Exception as _:
                     result = None
-                    try:
-                        result = await r.json()
-                        if use_stickyness:
-                            _set_stickyness_cookie(r.cookies)
-                    except Exception as _:
-                        result = None
-                    return r.status, result
-            else:
-                async with session.post(url, data=data, ssl=ssl_verify) as r:
+                return r.status, result
+        else:
+            async with session.post(
+                url, data=data, headers=headers, ssl=ssl_verify
+            ) as r:
+                result = None
+                try:
+                    result = await r.json()
+                    if use_stickyness:
+                        _set_stickyness_cookie(r.cookies)
+                except Exception as _:
                     result = None
-                    try:
-                        result = await r.json()
-                        if use_stickyness:
-                            _set_stickyness_cookie(r.cookies)
-                    except Exception as _:
-                        result = None
-                    return r.status, result
+                return r.status, result
     except Exception as err:
         logger.error(
             "apost_data_to_url: failed to post data to url %s: error %s", url, err
@@ -693,10 +661,12 @@ async def apatch_data_to_url(headers, url, payload):
                (None, error) if an error occurred
     """
     try:
-        async with aiohttp.ClientSession(headers=headers) as session:
-            async with session.patch(url, json=payload, ssl=ssl_verify) as r:
-                result = None
-                return r.status, result
+        session = httpSessions.get_session()
+        async with session.patch(
+            url, json=payload, headers=headers, ssl=ssl_verify
+        ) as r:
+            result = None
+            return r.status, result
     except Exception as err:
         logger.error(
             "apatch_data_to_url: failed to send patch data to url %s: error %s",
@@ -719,14 +689,16 @@ async def aremove_data_from_url(headers, url, payload):
                (None, error) if an error occurred.
     """
     try:
-        async with aiohttp.ClientSession(headers=headers) as session:
-            async with session.delete(url, json=payload, ssl=ssl_verify) as r:
+        session = httpSessions.get_session()
+        async with session.delete(
+            url, json=payload, headers=headers, ssl=ssl_verify
+        ) as r:
+            result = None
+            try:
+                result = await r.json()
+            except Exception as _:
                 result = None
-                try:
-                    result = await r.json()
-                except Exception as _:
-                    result = None
-                return r.status, result
+            return r.status, result
     except Exception as err:
         logger.error(
             "aremove_data_from_url: failed to remove data from url %s: error %s",
@@ -749,6 +721,8 @@ def post_payload_to_url(url, payload, headers=None, use_put=False):
         tuple: A tuple containing (status_code, json_response) if successful,
                or (None, error) if an error occurred.
     """
+    import requests
+
     if headers is None:
         headers = {"Content-Type": "application/json"}
     try:
@@ -783,6 +757,8 @@ def get_remote_file_size(url: str) -> int:
     Returns:
         int: The size of the file in bytes if successful, -1 otherwise.
     """
+    import requests
+
     try:
         response = requests.head(url, allow_redirects=True, timeout=10)
         content_length = response.headers.get("Content-Length")
@@ -793,6 +769,30 @@ def get_remote_file_size(url: str) -> int:
     return -1
 
 
+async def aget_remote_file_size(url: str) -> int:
+    """Asynchronously get the size of a remote file in bytes.
+
+    Args:
+        url: The URL of the remote file.
+
+    Returns:
+        int: The size of the file in bytes if successful, -1 otherwise.
+    """
+    import aiohttp
+
+    try:
+        session = httpSessions.get_session()
+        async with session.head(
+            url, allow_redirects=True, timeout=aiohttp.ClientTimeout(total=10)
+        ) as response:
+            content_length = response.headers.get("Content-Length")
+            if content_length is not None:
+                return int(content_length)
+    except Exception as e:
+        logger.error("aget_remote_file_size: error checking file size: %s", e)
+    return -1
+
+
 def write_http_response(status, body_dict, headers={}):
     """Create a FastAPI JSONResponse.
 
@@ -923,8 +923,11 @@ async def adownload_file_to_temp(url: str) -> str:
         aiohttp.ClientError: If there's an issue with the HTTP request (e.g., connection error, bad status).
         IOError: If there's an issue writing the file to disk.
     """
+    import aiofiles as aiof
+    import aiohttp
+
     temp_file_path = None  # Initialize to None for cleanup in case of early failure
-    file_size = get_remote_file_size(url=url)
+    file_size = await aget_remote_file_size(url=url)
 
     if file_size < 0 or file_size > MAX_FILE_SIZE_BYTES:
         raise ValueError("file size exceeded maximum allowed 10MB")
@@ -949,20 +952,20 @@ async def adownload_file_to_temp(url: str) -> str:
         )
 
         total_size = 0
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url) as response:
-                response.raise_for_status()  # Raise an exception for bad status codes (4xx or 5xx)
-
-                # Open the temporary file asynchronously in binary write mode
-                async with aiof.open(temp_file_path, mode="wb") as f:
-                    # Stream the download in chunks
-                    async for chunk in response.content.iter_chunked(8192):
-                        total_size += len(chunk)
-                        if total_size > MAX_FILE_SIZE_BYTES:
-                            await f.close()
-                            os.remove(temp_file_path)
-                            raise ValueError("file size exceeded maximum allowed 10MB")
-                        await f.write(chunk)
+        session = httpSessions.get_session()
+        async with session.get(url) as response:
+            response.raise_for_status()  # Raise an exception for bad status codes (4xx or 5xx)
+
+            # Open the temporary file asynchronously in binary write mode
+            async with aiof.open(temp_file_path, mode="wb") as f:
+                # Stream the download in chunks
+                async for chunk in response.content.iter_chunked(8192):
+                    total_size += len(chunk)
+                    if total_size > MAX_FILE_SIZE_BYTES:
+                        await f.close()
+                        os.remove(temp_file_path)
+                        raise ValueError("file size exceeded maximum allowed 10MB")
+                    await f.write(chunk)
 
         logger.info("File downloaded successfully to: %s", temp_file_path)
         return temp_file_path
@@ -0,0 +1,49 @@
+"""
+WebSocket Authentication Module for the Lurawi System.
+
+This module checks the access key of WebSocket connections to the workflow service.
+Clients send the key in the X-LURAWI-API-KEY header, or, as browsers cannot set
+headers on WebSocket connections, as a subprotocol after WEBSOCKET_SUBPROTOCOL.
+"""
+
+import os
+
+from fastapi import WebSocket
+
+from lurawi import utils
+
+WEBSOCKET_SUBPROTOCOL = "lurawi"
+
+
+def websocket_access_check(websocket: WebSocket, project: str = "") -> bool:
+    """Check if a WebSocket connection is authorized.
+
+    Verifies that the X-LURAWI-API-KEY header matches the project access key.
+    Browser clients, which cannot set headers, offer the WEBSOCKET_SUBPROTOCOL
+    subprotocol followed by the access key in the Sec-WebSocket-Protocol header.
+    The api_key query parameter is only accepted when the WebSocketQueryApiKey
+    environment variable is set to 1, as query strings end up in access logs.
+
+    Args:
+        websocket: The FastAPI WebSocket object
+        project: Optional project name (not currently used)
+
+    Returns:
+        bool: True if the connection is authorized, False otherwise
+    """
+    if utils.no_auth:
+        return True
+
+    api_key = websocket.headers.get("X-LURAWI-API-KEY")
+
+    if not api_key:
+        subprotocols = websocket.scope.get("subprotocols", [])
+        if WEBSOCKET_SUBPROTOCOL in subprotocols:
+            api_key = next(
+                (p for p in subprotocols if p != WEBSOCKET_SUBPROTOCOL), None
+            )
+
+    if not api_key and os.environ.get("WebSocketQueryApiKey", "0") == "1":
+        api_key = websocket.query_params.get("api_key")
+
+    return api_key is not None and api_key == utils.project_access_key
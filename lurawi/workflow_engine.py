@@ -14,29 +14,48 @@ activities, maintaining conversation state, loading behaviours and knowledge,
 and routing events to appropriate handlers.
 """
 
+import asyncio
 import importlib
 import inspect
 import time
 import os
 
 from io import StringIO
-from threading import Lock as mutex
-from typing import Dict, Any
+from typing import TYPE_CHECKING, Dict, Any, Tuple
 
 import simplejson as json
-import boto3
 
-from azure.core.exceptions import ResourceNotFoundError
-from azure.storage.blob import BlobClient
-from discord import Message as DiscordMessage
-from fastapi import Depends
-from fastapi.responses import JSONResponse
+from fastapi import Depends, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel, Extra
 
 from lurawi.activity_manager import ActivityManager
+from lurawi.executors import run_blocking
+from lurawi.hooks import hookRegistry
+from lurawi.load_monitor import loadMonitor
+from lurawi.metrics import metricsRegistry
+from lurawi.server_timing import TurnTimings
+from lurawi.tracing import tracer
+from lurawi.message_channel import (
+    TURN_STREAM_FORMATS,
+    CallbackURLChannel,
+    TurnStreamChannel,
+    WebSocketChannel,
+)
 from lurawi.remote_service import RemoteService
+from lurawi.runtime import (
+    close_runtime,
+    preload_custom_behaviours,
+    start_runtime,
+    stop_runtime,
+)
+from lurawi.session_registry import SessionRegistry
 from lurawi.timer_manager import TimerClient, timerManager
 from lurawi.utils import logger, api_access_check, write_http_response
+from lurawi.websocket_auth import websocket_access_check, WEBSOCKET_SUBPROTOCOL
+
+if TYPE_CHECKING:
+    from discord import Message as DiscordMessage
 
 STANDARD_LURAWI_CONFIGS = [
     "PROJECT_NAME",
@@ -56,6 +75,8 @@ class WorkflowInputPayload(BaseModel, extra=Extra.allow):
     name: str  # Name of the user/entity
     session_id: str = ""  # Optional session identifier
     activity_id: str = ""  # Optional activity identifier
+    response_mode: str = ""  # Optional turn streaming mode: "sse" or "ndjson"
+    callback_url: str = ""  # Optional URL for messages sent after the response
     data: Dict[str, Any] = {}  # Additional data payload
 
     @property
@@ -92,7 +113,7 @@ class WorkflowEngine(TimerClient):
         super().__init__()
         self.startup_time = time.time()
 
-        self.conversation_members = {}
+        self.conversation_members = SessionRegistry()
 
         self.knowledge = {}
         self.load_knowledge("default_knowledge")
@@ -112,7 +133,42 @@ class WorkflowEngine(TimerClient):
             self.auto_purge_timer = timerManager.add_timer(
                 self, init_start=3600, interval=3600
             )
-        self._mutex = mutex()
+
+        if (
+            "EarlyResponseFlush" in os.environ
+            and os.environ["EarlyResponseFlush"] == "1"
+        ):
+            self.knowledge["EARLY_RESPONSE_FLUSH"] = True
+
+        # one activity manager per (uid, session_id) pair with a shared per-user
+        # knowledge segment, so concurrent sessions of a user are not serialised.
+        self.session_scoped_members = (
+            "SessionScopedMembers" in os.environ
+            and os.environ["SessionScopedMembers"] == "1"
+        )
+        self.user_shared_knowledge: Dict[str, Dict] = {}
+
+        # break /message turns into phases in a Server-Timing response header
+        self.server_timing = (
+            "ServerTimingEnabled" in os.environ
+            and os.environ["ServerTimingEnabled"] == "1"
+        )
+        self.server_timing_in_body = (
+            "ServerTimingInBody" in os.environ
+            and os.environ["ServerTimingInBody"] == "1"
+        )
+
+        # instrumentation plugins subscribe to the hooks of the action runner,
+        # which skips the hooks nobody subscribed to
+        self.hooks = hookRegistry
+        if metricsRegistry.enabled:
+            metricsRegistry.subscribe(self.hooks)
+        if tracer.enabled:
+            tracer.subscribe(self.hooks)
+        if self.server_timing:
+            self.hooks.subscribe("after_alet", TurnTimings.on_after_alet)
+
+        self._streamed_turns = set()
         self.remote_services: Dict[str, RemoteService] = {}
         self._init_remote_services()
         self.start_remote_services()
@@ -135,18 +191,33 @@ class WorkflowEngine(TimerClient):
         kbase_path = kbase + ".json"
         try:
             if "AzureWebJobsStorage" in os.environ:
+                from azure.core.exceptions import (  # pylint: disable=import-outside-toplevel
+                    ResourceNotFoundError,
+                )
+                from azure.storage.blob import (  # pylint: disable=import-outside-toplevel
+                    BlobClient,
+                )
+
                 connect_string = os.environ["AzureWebJobsStorage"]
                 blob = BlobClient.from_connection_string(
                     conn_str=connect_string,
                     container_name="lurawidata",
                     blob_name=kbase_path,
                 )
-                json_data = json.loads(blob.download_blob().content_as_text())
+                try:
+                    json_data = json.loads(blob.download_blob().content_as_text())
+                except ResourceNotFoundError:
+                    logger.warning(
+                        "load_knowledge: no knowledge file %s is provided.", kbase
+                    )
+                    return True
             elif (
                 "UseAWSS3" in os.environ
                 and "AWS_ACCESS_KEY_ID" in os.environ
                 and "AWS_SECRET_ACCESS_KEY" in os.environ
             ):
+                import boto3  # pylint: disable=import-outside-toplevel
+
                 s3_client = boto3.client("s3")
                 blobio = StringIO()
                 s3_client.download_fileobj("lurawidata", kbase_path, blobio)
@@ -165,9 +236,6 @@ class WorkflowEngine(TimerClient):
                     "load_knowledge: no knowledge file %s is provided.", kbase
                 )
                 return True
-        except ResourceNotFoundError:
-            logger.warning("load_knowledge: no knowledge file %s is provided.", kbase)
-            return True
         except Exception as err:
             logger.error(
                 "load_knowledge: unable to load knowledge file %s from blob storage:%s",
@@ -219,6 +287,10 @@ class WorkflowEngine(TimerClient):
 
         try:
             if "AzureWebJobsStorage" in os.environ:
+                from azure.storage.blob import (  # pylint: disable=import-outside-toplevel
+                    BlobClient,
+                )
+
                 connect_string = os.environ["AzureWebJobsStorage"]
                 blob = BlobClient.from_connection_string(
                     conn_str=connect_string,
@@ -230,6 +302,8 @@ class WorkflowEngine(TimerClient):
                 "AWS_ACCESS_KEY_ID" in os.environ
                 and "AWS_SECRET_ACCESS_KEY" in os.environ
             ):
+                import boto3  # pylint: disable=import-outside-toplevel
+
                 s3_client = boto3.client("s3")
                 blobio = StringIO()
                 s3_client.download_fileobj("lurawidata", behaviour_file, blobio)
@@ -267,12 +341,14 @@ class WorkflowEngine(TimerClient):
         logger.info("load_behaviours: behaviours file %s is loaded!", behaviour_file)
         return loaded_behaviours
 
-    def load_pending_behaviours(self, behaviour):
+    async def load_pending_behaviours(self, behaviour):
         """Load behaviours into a pending state for gradual adoption.
 
         Loads behaviours into a pending state and notifies conversation members
         to prepare for the behaviour change. When all members have acknowledged,
-        the pending behaviours become active.
+        the pending behaviours become active. The behaviour and knowledge files
+        are read, and the custom behaviours they use imported, on the I/O
+        executor, as blob storage and S3 clients and module imports block.
 
         Args:
             behaviour: Base name of the behaviour file to load
@@ -280,7 +356,9 @@ class WorkflowEngine(TimerClient):
         Returns:
             str: Status message indicating success or failure
         """
-        self.pending_behaviours = self.load_behaviours(behaviour)
+        self.pending_behaviours = await run_blocking(self.load_behaviours, behaviour)
+        if self.pending_behaviours:
+            await self.preload_custom_behaviours(self.pending_behaviours)
         self.pending_behaviours_load_cnt = len(self.conversation_members)
         if self.pending_behaviours:
             if self.pending_behaviours_load_cnt > 0:
@@ -298,7 +376,17 @@ class WorkflowEngine(TimerClient):
             replymsg = "New Bot behaviours is corrupted, ignore."
         return replymsg
 
-    async def on_discord_event(self, user_name: str, message: DiscordMessage):
+    async def preload_custom_behaviours(self, behaviours: Dict):
+        """Import the custom behaviours used by a behaviours definition on the I/O executor.
+
+        Args:
+            behaviours: The behaviours definition
+        """
+        await preload_custom_behaviours(
+            behaviours, self.knowledge.get("LURAWI_WORKSPACE")
+        )
+
+    async def on_discord_event(self, user_name: str, message: "DiscordMessage"):
         """Handle incoming Discord events.
 
         Processes Discord messages by either updating an existing conversation
@@ -318,29 +406,40 @@ class WorkflowEngine(TimerClient):
                 user_data["image_attachment_url"] = attachment.url
                 break
 
-        self._mutex.acquire()
-        if discord_id in self.conversation_members:
-            activity_manager = self.conversation_members[discord_id]
-            self._mutex.release()
-            await activity_manager.continue_workflow(context=message, data=user_data)
-        else:
-            activity_manager = ActivityManager(
-                uid=discord_id,
-                name=user_name,
-                behaviour=(
-                    self.pending_behaviours
-                    if self.pending_behaviours
-                    else self.behaviours
-                ),
-                knowledge=self.knowledge,
-                system_service=self.remote_services,
+        # discord events arrive on the discord client thread, while the member
+        # registry and the turns are owned by the main loop. The whole turn runs on
+        # the main loop, and its replies are sent back on the discord client loop.
+        await self.conversation_members.run_on_loop(
+            self._run_discord_turn(
+                discord_id, user_name, message, user_data, asyncio.get_running_loop()
             )
+        )
 
-            self.conversation_members[discord_id] = activity_manager
-            self._mutex.release()
+    async def _run_discord_turn(
+        self,
+        discord_id: str,
+        user_name: str,
+        message: "DiscordMessage",
+        user_data: Dict,
+        discord_loop: asyncio.AbstractEventLoop,
+    ):
+        """Run the turn of a Discord message on the main loop.
 
-            await activity_manager.init()
+        Args:
+            discord_id: Discord ID of the user
+            user_name: Name of the Discord user
+            message: Discord message object containing the event data
+            user_data: The turn input data
+            discord_loop: The event loop of the Discord client
+        """
+        activity_manager, created = await self._get_or_create_member(
+            discord_id, user_name
+        )
+        activity_manager.discord_loop = discord_loop
+        if created:
             await activity_manager.start_user_workflow(context=message, data=user_data)
+        else:
+            await activity_manager.continue_workflow(context=message, data=user_data)
 
     async def on_event(
         self,
@@ -364,36 +463,54 @@ class WorkflowEngine(TimerClient):
                 401, {"status": "failed", "message": "Unauthorised access."}
             )
 
-        memberid = payload.uid
-        self._mutex.acquire()
-        if memberid in self.conversation_members:
-            activity_manager = self.conversation_members[memberid]
-            self._mutex.release()
-        else:
-            activity_manager = ActivityManager(
-                uid=memberid,
-                name=payload.name,
-                behaviour=(
-                    self.pending_behaviours
-                    if self.pending_behaviours
-                    else self.behaviours
-                ),
-                knowledge=self.knowledge,
-                system_service=self.remote_services,
+        if payload.callback_url and not CallbackURLChannel.is_allowed(
+            payload.callback_url
+        ):
+            return JSONResponse(
+                status_code=400,
+                content={
+                    "status": "failed",
+                    "message": "callback_url is not allowed.",
+                },
+            )
+
+        timings = (
+            TurnTimings(in_body=self.server_timing_in_body)
+            if self.server_timing and not payload.response_mode
+            else None
+        )
+        activity_manager, _ = await self._get_or_create_member(
+            payload.uid, payload.name, payload.session_id
+        )
+        if timings is not None:
+            timings.add("session", timings.since_start())
+
+        if activity_manager.channel is not None:
+            return JSONResponse(
+                status_code=429,
+                content={
+                    "status": "failed",
+                    "message": "System is busy, please try later.",
+                },
             )
-            self.conversation_members[memberid] = activity_manager
-            self._mutex.release()
-            await activity_manager.init()
 
-        response = False
         if payload.activity_id:
-            response = await activity_manager.continue_workflow(
+            turn = activity_manager.continue_workflow(
                 activity_id=payload.activity_id, data=payload.data
             )
         else:
-            response = await activity_manager.start_user_workflow(
+            turn = activity_manager.start_user_workflow(
                 session_id=payload.session_id, data=payload.data
             )
+
+        if payload.response_mode:
+            return self._stream_turn(
+                activity_manager, turn, payload.response_mode, payload.callback_url
+            )
+
+        response = await activity_manager.run_turn(
+            turn, timings, callback_url=payload.callback_url
+        )
         if response:
             return activity_manager.get_response()
         else:
@@ -405,6 +522,220 @@ class WorkflowEngine(TimerClient):
                 },
             )
 
+    def member_key(self, uid: str, session_id: str = "") -> str | Tuple[str, str]:
+        """Get the conversation member key of a user session.
+
+        Members are keyed by user ID, or by a (user ID, session ID) tuple when
+        session scoped members are enabled and a session ID is given, so that
+        user IDs and session IDs containing any character cannot collide.
+
+        Args:
+            uid: User ID of the member
+            session_id: Optional session ID of the member
+
+        Returns:
+            str | Tuple[str, str]: The key of the member in conversation_members
+        """
+        if self.session_scoped_members and session_id:
+            return (uid, session_id)
+        return uid
+
+    async def _get_or_create_member(
+        self, uid: str, name: str, session_id: str = ""
+    ) -> Tuple[ActivityManager, bool]:
+        """Retrieve a conversation member, creating it if it does not exist.
+
+        Args:
+            uid: User ID of the member
+            name: User name of the member
+            session_id: Optional session ID of the member
+
+        Returns:
+            Tuple[ActivityManager, bool]: The ActivityManager for the user session,
+            and whether this call created it
+        """
+        memberid = self.member_key(uid, session_id)
+        created = False
+
+        async def create_member() -> ActivityManager:
+            nonlocal created
+            created = True
+            activity_manager = ActivityManager(
+                uid=uid,
+                name=name,
+                behaviour=(
+                    self.pending_behaviours
+                    if self.pending_behaviours
+                    else self.behaviours
+                ),
+                knowledge=self.knowledge,
+                system_service=self.remote_services,
+            )
+            if self.session_scoped_members:
+                activity_manager.knowledge["USER_SHARED_KNOWLEDGE"] = (
+                    self.user_shared_knowledge.setdefault(uid, {})
+                )
+            await activity_manager.init()
+            return activity_manager
+
+        activity_manager = await self.conversation_members.get_or_create(
+            memberid, create_member
+        )
+        return activity_manager, created
+
+    async def on_websocket(
+        self,
+        websocket: WebSocket,
+        authorised: bool = Depends(websocket_access_check),
+    ):
+        """Handle a persistent WebSocket conversation.
+
+        The connection is bound to the ActivityManager of the `uid` (and optional
+        `session_id`) query parameters for its lifetime. Each JSON message received is a turn with optional
+        `session_id`, `activity_id` and `data` fields. All outbound messages,
+        including those from remote service callbacks and externally triggered
+        behaviours, are pushed over the socket as they are produced.
+
+        Args:
+            websocket: The WebSocket connection
+            authorised: Flag indicating if the connection is authorized
+        """
+        uid = websocket.query_params.get("uid")
+        if not authorised or not uid:
+            await websocket.close(code=1008)
+            return
+
+        # browser clients authenticate with a subprotocol, which must be echoed back
+        subprotocol = (
+            WEBSOCKET_SUBPROTOCOL
+            if WEBSOCKET_SUBPROTOCOL in websocket.scope.get("subprotocols", [])
+            else None
+        )
+        await websocket.accept(subprotocol=subprotocol)
+        activity_manager, _ = await self._get_or_create_member(
+            uid,
+            websocket.query_params.get("name", uid),
+            websocket.query_params.get("session_id", ""),
+        )
+        if activity_manager.channel is not None:
+            await websocket.send_text(
+                json.dumps(
+                    {
+                        "event": "message",
+                        "status_code": 429,
+                        "status": "failed",
+                        "message": "User is already connected.",
+                    }
+                )
+            )
+            await websocket.close(code=1013)
+            return
+
+        channel = WebSocketChannel(websocket)
+        activity_manager.attach_channel(channel)
+        try:
+            while True:
+                try:
+                    turn_input = json.loads(await websocket.receive_text())
+                except ValueError:
+                    await channel.push_message(
+                        400, {"status": "failed", "message": "Invalid turn payload."}
+                    )
+                    continue
+
+                if not isinstance(turn_input, dict):
+                    turn_input = {"data": {"message": str(turn_input)}}
+                data = turn_input.get("data", {})
+                if turn_input.get("activity_id"):
+                    turn = activity_manager.continue_workflow(
+                        activity_id=turn_input["activity_id"], data=data
+                    )
+                else:
+                    turn = activity_manager.start_user_workflow(
+                        session_id=turn_input.get("session_id", ""), data=data
+                    )
+
+                if not await activity_manager.run_turn(turn):
+                    await channel.push_message(
+                        429,
+                        {
+                            "status": "failed",
+                            "message": "System is busy, please try later.",
+                        },
+                    )
+                activity_manager.finish_turn()
+                await channel.send_event(
+                    {
+                        "event": "end",
+                        "activity_id": activity_manager.knowledge[
+                            "CURRENT_TURN_CONTEXT"
+                        ],
+                    }
+                )
+        except WebSocketDisconnect:
+            logger.debug("websocket for user %s disconnected", uid)
+        except Exception as err:  # pylint: disable=broad-exception-caught
+            logger.error("websocket for user %s failed: %s", uid, err)
+        finally:
+            channel.close()
+            activity_manager.detach_channel(channel)
+
+    def _stream_turn(
+        self,
+        activity_manager: ActivityManager,
+        turn,
+        mode: str,
+        callback_url: str = "",
+    ):
+        """Run a user turn with every message streamed to the client.
+
+        Attaches a TurnStreamChannel to the activity manager for the duration of
+        the turn, so all messages and LLM token streams of the turn are sent as
+        Server-Sent Events or newline-delimited JSON as soon as they are produced.
+
+        Args:
+            activity_manager: The activity manager of the user
+            turn: The turn coroutine to run
+            mode: The stream format, either "sse" or "ndjson"
+            callback_url: The callback URL of the turn, if any
+
+        Returns:
+            StreamingResponse: The streamed turn events
+        """
+        if mode not in TURN_STREAM_FORMATS:
+            logger.warning("unknown response_mode %s, use sse instead", mode)
+
+        channel = TurnStreamChannel(
+            fmt=mode, on_finished=lambda: activity_manager.detach_channel(channel)
+        )
+        activity_manager.attach_channel(channel)
+
+        async def run_streamed_turn():
+            try:
+                if not await activity_manager.run_turn(turn, callback_url=callback_url):
+                    await channel.push_message(
+                        429,
+                        {
+                            "status": "failed",
+                            "message": "System is busy, please try later.",
+                        },
+                    )
+            except Exception as err:
+                logger.error("streamed turn failed: %s", err)
+            finally:
+                activity_manager.finish_turn()
+                channel.close()
+
+        task = asyncio.create_task(run_streamed_turn())
+        self._streamed_turns.add(task)
+        task.add_done_callback(self._streamed_turns.discard)
+
+        return StreamingResponse(
+            channel.event_generator(),
+            headers={"X-Accel-Buffering": "no"},
+            media_type=channel.media_type,
+        )
+
     async def on_code_update(self, payload: BehaviourCodePayload):
         """Update behaviour code dynamically.
 
@@ -431,32 +762,33 @@ class WorkflowEngine(TimerClient):
             return write_http_response(
                 400, {"status": "failed", "message": "missing default in code updates."}
             )
+        await self.preload_custom_behaviours(loaded_behaviours)
         logger.info("on_code_update: purging all existing users.")
-        self._mutex.acquire()
-
         for member in self.conversation_members.values():
             member.fini()
-        self.conversation_members = {}
-        self._mutex.release()
+        self.conversation_members.clear()
+        self.user_shared_knowledge = {}
         self.behaviours = loaded_behaviours
 
         return write_http_response(200, {"status": "success"})
 
-    def get_member(self, uid: str) -> ActivityManager | None:
+    def get_member(self, uid: str, session_id: str = "") -> ActivityManager | None:
         """Retrieve a conversation member by user ID.
 
         Args:
             uid: User ID to look up
+            session_id: Optional session ID, used when session scoped members are enabled
 
         Returns:
             ActivityManager for the user if found, None otherwise
         """
-        if uid in self.conversation_members:
-            return self.conversation_members[uid]
+        memberid = self.member_key(uid, session_id)
+        if memberid in self.conversation_members:
+            return self.conversation_members[memberid]
         return None
 
     async def on_executing_behaviour_for_uid(  # pylint: disable=dangerous-default-value
-        self, uid: str, behaviour: str, knowledge: Dict = {}
+        self, uid: str, behaviour: str, knowledge: Dict = {}, session_id: str = ""
     ) -> bool:
         """Execute a specific behaviour for a given user.
 
@@ -464,12 +796,13 @@ class WorkflowEngine(TimerClient):
             uid: User ID to execute the behaviour for
             behaviour: Name of the behaviour to execute
             knowledge: Additional knowledge to provide to the behaviour
+            session_id: Optional session ID, used when session scoped members are enabled
 
         Returns:
             bool: True if behaviour was executed successfully, False otherwise
         """
-        if uid in self.conversation_members:
-            activity_manager = self.conversation_members[uid]
+        activity_manager = self.get_member(uid, session_id)
+        if activity_manager:
             return await activity_manager.execute_behaviour(behaviour, knowledge)
 
         logger.error("unable to find uid %s for behaviour execution", uid)
@@ -486,13 +819,53 @@ class WorkflowEngine(TimerClient):
             status_code=200, content={"status": "success", "result": result}
         )
 
+    async def readiness_check(self):
+        """Report whether the workflow engine is ready for more traffic.
+
+        The engine is not ready when the event loop lag or the number of pending
+        turns exceeds its readiness threshold, so load balancers can route new
+        traffic to other instances until it has caught up.
+
+        Returns:
+            JSONResponse with the current load, status 200 if ready or 503 if not
+        """
+        result = loadMonitor.get_status(active_sessions=len(self.conversation_members))
+        if result["ready"]:
+            return JSONResponse(
+                status_code=200, content={"status": "success", "result": result}
+            )
+        logger.warning("readiness check failed: %s", ", ".join(result["reasons"]))
+        return JSONResponse(
+            status_code=503, content={"status": "failed", "result": result}
+        )
+
+    async def on_startup(self):
+        """Bind the workflow engine and timers to the main event loop at application startup.
+
+        The shared services are then started by `start_runtime`, which preloads the
+        tokenizers and custom behaviours before the service accepts requests.
+        """
+        loop = asyncio.get_running_loop()
+        self.conversation_members.bind_loop(loop)
+        timerManager.bind_loop(loop)
+        await start_runtime(self.behaviours, self.knowledge.get("LURAWI_WORKSPACE"))
+
+    async def on_app_shutdown(self):
+        """Close the shared HTTP sessions when the application shuts down.
+
+        Registered as a shutdown handler of the application, so the sessions are
+        closed on the main loop before it stops.
+        """
+        await close_runtime()
+
     def on_shutdown(self):
         """Clean up resources when the workflow engine is shutting down.
 
-        Finalizes the timer manager, notifies all conversation members of shutdown,
-        and stops all remote services.
+        Finalizes the timer manager, stops the shared services, notifies all
+        conversation members of shutdown, and stops all remote services.
         """
         timerManager.fini()
+        stop_runtime()
 
         for member in self.conversation_members.values():
             member.on_shutdown()
@@ -531,16 +904,27 @@ class WorkflowEngine(TimerClient):
         Identifies users who have been idle for more than 2400 seconds (40 minutes)
         and removes them from the active conversation members list.
         """
+        # the member registry is owned by the main loop, marshal calls from other threads.
+        await self.conversation_members.run_on_loop(self._purge_idle_users())
+
+    async def _purge_idle_users(self):
+        """Remove idle users on the loop that owns the member registry."""
         idle_users = []
-        self._mutex.acquire()
         for mid, member in self.conversation_members.items():
             if member.idleTime() > 2400:
                 idle_users.append(mid)
 
         for mid in idle_users:
-            self.conversation_members[mid].fini()
-            del self.conversation_members[mid]
-        self._mutex.release()
+            self.conversation_members.pop(mid).fini()
+
+        if self.user_shared_knowledge:
+            active_uids = {
+                member.knowledge["USER_ID"]
+                for member in self.conversation_members.values()
+            }
+            for uid in list(self.user_shared_knowledge):
+                if uid not in active_uids:
+                    del self.user_shared_knowledge[uid]
 
     def _init_remote_services(self):
         """Initialize remote services from the services directory.
@@ -16,6 +16,7 @@ import signal
 from fastapi import FastAPI, APIRouter
 from fastapi.middleware.cors import CORSMiddleware
 from lurawi.workflow_engine import WorkflowEngine
+from lurawi.traffic_capture import TrafficCaptureMiddleware, trafficCapture
 from lurawi.webhook_handler import WebhookHandler
 from lurawi.utils import logger, is_indev
 
@@ -51,8 +52,9 @@ class WorkflowService:
 
         This method:
         1. Creates a new FastAPI application
-        2. Configures CORS middleware
-        3. Adds API routes for workflow events, health checks, and code updates
+        2. Configures CORS middleware, and traffic capture if enabled
+        3. Adds API routes for workflow events, WebSocket conversations, health and
+           readiness checks, and code updates
         4. Registers webhook handlers
         5. Sets up signal handling for graceful shutdown
 
@@ -70,14 +72,22 @@ class WorkflowService:
             allow_methods=["*"],
             allow_headers=["*"],
         )
+        if trafficCapture.enabled:
+            self.app.add_middleware(TrafficCaptureMiddleware)
         self.router.add_api_route(
             "/{project}/message",
             endpoint=self.workflow_engine.on_event,
             methods=["POST"],
         )
+        self.router.add_api_websocket_route(
+            "/{project}/ws", endpoint=self.workflow_engine.on_websocket
+        )
         self.router.add_api_route(
             "/healthcheck", endpoint=self.workflow_engine.health_check, methods=["GET"]
         )
+        self.router.add_api_route(
+            "/readiness", endpoint=self.workflow_engine.readiness_check, methods=["GET"]
+        )
         if is_indev():
             self.router.add_api_route(
                 "/codeupdate",
@@ -85,7 +95,9 @@ class WorkflowService:
                 methods=["POST"],
             )
         self._register_webhook_handlers(self.router)
+        self.app.add_event_handler("startup", self.workflow_engine.on_startup)
         self.app.add_event_handler("startup", self.handle_signal)
+        self.app.add_event_handler("shutdown", self.workflow_engine.on_app_shutdown)
         self.app.include_router(self.router)
         return self.app
 
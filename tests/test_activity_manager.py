@@ -0,0 +1,179 @@
+"""
+Tests of the step run queue and the early response flush of
+lurawi.activity_manager.
+"""
+
+import asyncio
+import sys
+
+from lurawi.activity_manager import ActivityManager, RunQueue
+
+BEHAVIOURS = {
+    "default": "main",
+    "behaviours": [{"name": "main", "actions": [[["name", "idle"]]]}],
+}
+
+
+def _frame_depth() -> int:
+    frame, depth = sys._getframe(1), 0  # pylint: disable=protected-access
+    while frame is not None:
+        frame, depth = frame.f_back, depth + 1
+    return depth
+
+
+def _manager(**knowledge) -> ActivityManager:
+    return ActivityManager("uid", "name", BEHAVIOURS, knowledge)
+
+
+def test_run_queue_runs_queued_steps_before_earlier_ones():
+    queue = RunQueue()
+    queue.push("a", ())
+    queue.push("b", ())
+    assert queue.pop()[0] == "a"
+    # steps queued while a runs go ahead of b, in the order they were queued
+    queue.push("c", ())
+    queue.push("d", ())
+    assert [queue.pop()[0] for _ in range(len(queue))] == ["c", "d", "b"]
+
+
+def test_run_step_follows_nested_call_order():
+    manager = _manager()
+    order = []
+
+    async def step(name, *children):
+        order.append(name)
+        for child in children:
+            await manager.run_step(*child)
+
+    async def scenario():
+        await manager.run_step(
+            step,
+            "a",
+            (step, "b", (step, "d"), (step, "e")),
+            (step, "c", (step, "f")),
+        )
+
+    asyncio.run(scenario())
+    assert order == ["a", "b", "d", "e", "c", "f"]
+    assert not manager._run_queues  # pylint: disable=protected-access
+
+
+def test_run_step_keeps_the_await_stack_flat():
+    manager = _manager()
+    depths = []
+
+    async def chain(remaining):
+        depths.append(_frame_depth())
+        if remaining:
+            await manager.run_step(chain, remaining - 1)
+
+    # each step would add a frame if it awaited the next one directly
+    asyncio.run(manager.run_step(chain, 2000))
+    assert len(depths) == 2001
+    assert max(depths) == min(depths)
+
+
+def test_run_nested_steps_completes_before_returning():
+    manager = _manager()
+    order = []
+
+    async def step(name, *children):
+        order.append(name)
+        for child in children:
+            await manager.run_step(*child)
+
+    async def outer():
+        await manager.run_nested_steps(step, "nested", (step, "nested child"))
+        order.append("after nested")
+        await manager.run_step(step, "queued")
+        order.append("after queued")
+
+    asyncio.run(manager.run_step(outer))
+    assert order == ["nested", "nested child", "after nested", "after queued", "queued"]
+
+
+def test_run_turn_flushes_early_and_continues_in_background():
+    async def scenario():
+        manager = _manager(EARLY_RESPONSE_FLUSH=True)
+        finish = asyncio.Event()
+        steps = []
+
+        async def turn():
+            await manager.send_message(data={"response": "early"})
+            steps.append("responded")
+            await finish.wait()
+            steps.append("finished")
+            return True
+
+        result = await manager.run_turn(turn())
+        flushed = list(steps)
+        response = manager.get_response()
+        background = manager._background_turn  # pylint: disable=protected-access
+
+        finish.set()
+        await manager.wait_for_background_turn()
+        return result, flushed, response, background, steps, manager
+
+    result, flushed, response, background, steps, manager = asyncio.run(scenario())
+    assert result is True
+    assert flushed == ["responded"]
+    assert response is not None
+    assert background is not None and background.done()
+    assert steps == ["responded", "finished"]
+    assert manager._background_turn is None  # pylint: disable=protected-access
+
+
+def test_run_turn_drops_responses_sent_after_the_flush():
+    async def scenario():
+        manager = _manager(EARLY_RESPONSE_FLUSH=True)
+
+        async def turn():
+            await manager.send_message(data={"response": "early"})
+            await asyncio.sleep(0)
+            await manager.send_message(data={"response": "late"})
+            return True
+
+        await manager.run_turn(turn())
+        manager.get_response()
+        await manager.wait_for_background_turn()
+        await asyncio.sleep(0)
+        return manager.response
+
+    assert asyncio.run(scenario()) is None
+
+
+def test_run_turn_waits_for_the_turn_without_a_response():
+    async def scenario():
+        manager = _manager(EARLY_RESPONSE_FLUSH=True)
+
+        async def turn():
+            await asyncio.sleep(0.01)
+            return False
+
+        result = await manager.run_turn(turn())
+        return result, manager._background_turn  # pylint: disable=protected-access
+
+    assert asyncio.run(scenario()) == (False, None)
+
+
+def test_next_turn_waits_for_the_background_turn():
+    async def scenario():
+        manager = _manager(EARLY_RESPONSE_FLUSH=True)
+        order = []
+
+        async def first():
+            await manager.send_message(data={"response": "first"})
+            await asyncio.sleep(0.05)
+            order.append("first finished")
+            return True
+
+        async def second():
+            order.append("second started")
+            return True
+
+        await manager.run_turn(first())
+        manager.get_response()
+        await manager.run_turn(second())
+        return order
+
+    assert asyncio.run(scenario()) == ["first finished", "second started"]
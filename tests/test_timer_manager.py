@@ -0,0 +1,167 @@
+"""
+Tests of the timing wheel and the TimerManager of lurawi.timer_manager.
+"""
+
+import asyncio
+import random
+
+from lurawi.timer_manager import (
+    TICK_SECONDS,
+    WHEEL_BITS,
+    WHEEL_SIZE,
+    TimerClient,
+    TimerEntry,
+    TimerManager,
+    TimerWheel,
+)
+
+
+def _run_wheel(wheel: TimerWheel, ticks: int) -> dict:
+    """
+    Advance a wheel and collect the tick each entry fired at.
+    """
+    fired = {}
+    for _ in range(ticks):
+        for entry in wheel.advance():
+            assert entry.tid not in fired, f"timer {entry.tid} fired twice"
+            fired[entry.tid] = wheel.current_tick
+    return fired
+
+
+def _insert(wheel: TimerWheel, tid: int, expires: int) -> TimerEntry:
+    entry = TimerEntry(tid, lambda: None)
+    entry.expires = expires
+    wheel.insert(entry)
+    return entry
+
+
+def test_wheel_fires_on_level_boundaries():
+    wheel = TimerWheel()
+    level1 = WHEEL_SIZE
+    level2 = 1 << (WHEEL_BITS * 2)
+    level3 = 1 << (WHEEL_BITS * 3)
+    expiries = [
+        1,
+        WHEEL_SIZE - 1,
+        level1,
+        level1 + 1,
+        level2 - 1,
+        level2,
+        level2 + level1,
+        level3,
+        level3 + 17,
+    ]
+    for tid, expires in enumerate(expiries):
+        _insert(wheel, tid, expires)
+    assert len(wheel) == len(expiries)
+
+    fired = _run_wheel(wheel, level3 + 17)
+
+    assert fired == dict(enumerate(expiries))
+    assert len(wheel) == 0
+
+
+def test_wheel_cascades_entries_inserted_mid_rotation():
+    rng = random.Random(32)
+    wheel = TimerWheel()
+    expected = {}
+    tid = 0
+    # insert at random times, so entries land at every level and slot offset
+    for _ in range(20):
+        for _ in range(50):
+            expires = wheel.current_tick + rng.randint(1, 3 * (1 << (WHEEL_BITS * 2)))
+            _insert(wheel, tid, expires)
+            expected[tid] = expires
+            tid += 1
+        for entry_tid, tick in _run_wheel(wheel, rng.randint(1, 700)).items():
+            assert expected[entry_tid] == tick
+
+    remaining = max(expected.values()) - wheel.current_tick
+    _run_wheel(wheel, remaining)
+    assert len(wheel) == 0
+
+
+def test_wheel_fires_next_tick_entry_after_wrap():
+    wheel = TimerWheel()
+    _run_wheel(wheel, WHEEL_SIZE - 1)
+    _insert(wheel, 1, WHEEL_SIZE)
+    _insert(wheel, 2, WHEEL_SIZE + 1)
+    assert _run_wheel(wheel, 1) == {1: WHEEL_SIZE}
+    assert _run_wheel(wheel, 1) == {2: WHEEL_SIZE + 1}
+
+
+def test_wheel_remove_before_and_after_cascade():
+    wheel = TimerWheel()
+    kept = _insert(wheel, 1, 3 * WHEEL_SIZE + 5)
+    removed_early = _insert(wheel, 2, 3 * WHEEL_SIZE + 5)
+    removed_late = _insert(wheel, 3, 3 * WHEEL_SIZE + 6)
+
+    wheel.remove(removed_early)
+    assert len(wheel) == 2
+    # cascade the entries from level 1 into level 0, then remove one of them
+    _run_wheel(wheel, 3 * WHEEL_SIZE)
+    assert kept.slot is not None and removed_late.slot is not None
+    wheel.remove(removed_late)
+    wheel.remove(removed_late)  # removing twice has no effect
+    assert len(wheel) == 1
+    assert removed_late.slot is None
+
+    assert _run_wheel(wheel, 10) == {1: 3 * WHEEL_SIZE + 5}
+    assert len(wheel) == 0
+
+
+class _Client(TimerClient):
+    def __init__(self):
+        super().__init__()
+        self.fired = []
+        self.lapsed = []
+
+    async def on_timer(self, tid: int):
+        self.fired.append(tid)
+
+    async def on_timer_lapsed(self, tid: int):
+        self.lapsed.append(tid)
+
+
+def test_manager_call_later_order_and_cancel():
+    async def scenario():
+        manager = TimerManager()
+        manager.bind_loop()
+        calls = []
+
+        async def async_callback(name):
+            calls.append(name)
+
+        manager.call_later(3 * TICK_SECONDS, calls.append, "third")
+        manager.call_later(TICK_SECONDS, calls.append, "first")
+        manager.call_later(2 * TICK_SECONDS, async_callback, "second")
+        cancelled = manager.call_later(2 * TICK_SECONDS, calls.append, "cancelled")
+        manager.del_timer(cancelled)
+
+        await asyncio.sleep(5 * TICK_SECONDS)
+        manager.fini()
+        return calls
+
+    assert asyncio.run(scenario()) == ["first", "second", "third"]
+
+
+def test_manager_repeating_timer_lapses_and_cancels():
+    async def scenario():
+        manager = TimerManager()
+        manager.bind_loop()
+        client = _Client()
+        finite = manager.add_timer(client, init_start=0, interval=0.1, repeats=2)
+        endless = manager.add_timer(client, init_start=0, interval=0.1, repeats=-1)
+
+        await asyncio.sleep(8 * TICK_SECONDS)
+        manager.del_timer(endless)
+        endless_count = client.fired.count(endless)
+        await asyncio.sleep(3 * TICK_SECONDS)
+        manager.fini()
+        return client, finite, endless, endless_count
+
+    client, finite, endless, endless_count = asyncio.run(scenario())
+    # the first event plus two repeats
+    assert client.fired.count(finite) == 3
+    assert client.lapsed == [finite]
+    assert client.fired.count(endless) == endless_count >= 3